@@ -0,0 +1,188 @@
+import random
+import time
+
+import numpy as np
+
+from sutil.math.broadphase import DynamicAABBTree, SpatialHashGrid, SweepAndPrune
+from sutil.math.collision2d import (AABB2D, PreparedPolygon, aabb_aabb_col_array, point_poly_col, point_poly_col_array,
+                                    swept_aabb_toi_array)
+from sutil.math.vector import Vector2, Vector2Array
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def moving_boxes(n, extent, rng):
+    boxes = [AABB2D(Vector2(rng.uniform(0, extent), rng.uniform(0, extent)),
+                    Vector2(rng.uniform(1, 4), rng.uniform(1, 4))) for _ in range(n)]
+    velocities = [Vector2(rng.uniform(-0.5, 0.5), rng.uniform(-0.5, 0.5)) for _ in range(n)]
+    return boxes, velocities
+
+
+def brute_force(boxes):
+    bounds = [box.bounds for box in boxes]
+    count = 0
+    for i, a in enumerate(bounds):
+        for b in bounds[i + 1:]:
+            if a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]:
+                count += 1
+    return count
+
+
+def bench_broad_phase(n=50_000, frames=5):
+    rng = random.Random(0)
+    extent = (n * 40) ** 0.5
+    boxes, velocities = moving_boxes(n, extent, rng)
+
+    sample = 2000
+    brute = timed(lambda: brute_force(boxes[:sample]), 1) * (n / sample) ** 2
+    print(f"Finding overlapping pairs among {n} moving boxes")
+    print(f"  brute force     : {brute * 1000:9.0f} ms/frame (estimated from {sample} boxes)")
+
+    for name, index in (("spatial hash", SpatialHashGrid(4)), ("dynamic tree", DynamicAABBTree(margin=1))):
+        start = time.perf_counter()
+        for key, box in enumerate(boxes):
+            index.insert(key, box)
+        build = time.perf_counter() - start
+
+        update_time = pair_time = 0
+        for _ in range(frames):
+            for box, velocity in zip(boxes, velocities):
+                box.position += velocity
+            start = time.perf_counter()
+            for key, box in enumerate(boxes):
+                index.update(key, box)
+            update_time += time.perf_counter() - start
+            start = time.perf_counter()
+            pairs = sum(1 for _ in index.pairs())
+            pair_time += time.perf_counter() - start
+        frame = (update_time + pair_time) / frames
+        print(f"  {name:<15} : {frame * 1000:9.0f} ms/frame (build {build * 1000:.0f} ms, update "
+              f"{update_time * 1000 / frames:.0f} ms, pairs {pair_time * 1000 / frames:.0f} ms, "
+              f"{pairs} pairs)  {brute / frame:.0f}x")
+
+
+def bench_narrow_phase(n=50_000, vertices=64):
+    rng = np.random.default_rng(0)
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    radii = np.where(np.arange(vertices) % 2, 1.0, 0.5)
+    polygon = [Vector2(r * np.cos(a), r * np.sin(a)) for r, a in zip(radii.tolist(), angles.tolist())]
+    points = Vector2Array(*rng.uniform(-1, 1, size=(2, n)))
+    scalar_points = list(points)
+
+    loop = timed(lambda: [point_poly_col(p, polygon) for p in scalar_points], 1)
+    batch = timed(lambda: point_poly_col_array(points, polygon))
+    print(f"Testing {n} points against a {vertices} vertex polygon")
+    print(f"  per point : {loop * 1000:8.1f} ms")
+    print(f"  batched   : {batch * 1000:8.1f} ms  {loop / batch:.0f}x")
+
+
+def sweep_rebuild(boxes):
+    '''Sorts every box on x from scratch and sweeps for overlapping pairs'''
+    order = sorted(range(len(boxes)), key=lambda i: boxes[i][0])
+    pairs = set()
+    active = []
+    for i in order:
+        a = boxes[i]
+        active = [j for j in active if boxes[j][2] >= a[0]]
+        for j in active:
+            b = boxes[j]
+            if a[1] <= b[3] and b[1] <= a[3]:
+                pairs.add((j, i) if j < i else (i, j))
+        active.append(i)
+    return pairs
+
+
+def bench_sweep_and_prune(n=20_000, frames=20, moving=0.1):
+    rng = random.Random(0)
+    extent = (n * 40) ** 0.5
+    boxes, velocities = moving_boxes(n, extent, rng)
+    movers = rng.sample(range(n), int(n * moving))
+
+    sap = SweepAndPrune()
+    for key, box in enumerate(boxes):
+        sap.insert(key, box)
+    sap.step()
+    previous = sweep_rebuild([box.bounds for box in boxes])
+
+    incremental = rebuild = 0
+    changes = 0
+    for _ in range(frames):
+        for key in movers:
+            boxes[key].position += velocities[key] * 0.2
+        start = time.perf_counter()
+        for key in movers:
+            sap.update(key, boxes[key])
+        added, removed = sap.step()
+        incremental += time.perf_counter() - start
+        changes += len(added) + len(removed)
+
+        start = time.perf_counter()
+        current = sweep_rebuild([box.bounds for box in boxes])
+        added, removed = current - previous, previous - current
+        previous = current
+        rebuild += time.perf_counter() - start
+
+    print(f"Sweep and prune over {n} boxes, {len(movers)} moving, {changes / frames:.0f} pair changes/frame")
+    print(f"  full rebuild : {rebuild * 1000 / frames:8.1f} ms/frame")
+    print(f"  incremental  : {incremental * 1000 / frames:8.1f} ms/frame  {rebuild / incremental:.0f}x")
+
+
+def bench_continuous(n=100_000, substeps=16):
+    rng = np.random.default_rng(0)
+    bullets = Vector2Array(*rng.uniform(0, 100, size=(2, n)))
+    size = Vector2Array(np.full(n, 0.2), np.full(n, 0.2))
+    moves = Vector2Array(*rng.uniform(-40, 40, size=(2, n)))
+    walls = Vector2Array(*rng.uniform(0, 100, size=(2, n)))
+    wall_size = Vector2Array(np.full(n, 0.5), np.full(n, 10.0))
+
+    def substepped():
+        hit = np.zeros(n, dtype=bool)
+        for step in range(1, substeps + 1):
+            hit |= aabb_aabb_col_array(bullets + moves * (step / substeps), size, walls, wall_size)
+        return hit
+
+    discrete = timed(substepped)
+    swept = timed(lambda: swept_aabb_toi_array(bullets, size, moves, walls, wall_size))
+    missed = (np.isfinite(swept_aabb_toi_array(bullets, size, moves, walls, wall_size)) & ~substepped()).sum()
+    print(f"{n} fast boxes against a wall each")
+    print(f"  {substeps} discrete substeps : {discrete * 1000:8.1f} ms, still tunnels through {missed} walls")
+    print(f"  swept time of impact : {swept * 1000:8.1f} ms  {discrete / swept:.0f}x")
+
+
+def bench_prepared_polygons(zones=200, vertices=64, n=100_000, scalar_n=2000):
+    rng = np.random.default_rng(0)
+    polygons = []
+    for _ in range(zones):
+        center = rng.uniform(0, 100, 2)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+        radii = rng.uniform(2, 6, vertices)
+        polygons.append([Vector2(*(center + r * np.array([np.cos(a), np.sin(a)])).tolist())
+                         for r, a in zip(radii, angles)])
+    prepared = [PreparedPolygon(polygon) for polygon in polygons]
+    points = Vector2Array(*rng.uniform(0, 100, size=(2, n)))
+    scalar_points = list(points[:scalar_n])
+
+    loop = timed(lambda: [point_poly_col(p, polygon) for polygon in polygons for p in scalar_points], 1)
+    fast = timed(lambda: [zone.contains(p) for zone in prepared for p in scalar_points])
+    print(f"Testing points against {zones} zones of {vertices} vertices")
+    print(f"  point_poly_col          : {loop * 1e9 / (zones * scalar_n):8.0f} ns/test")
+    print(f"  PreparedPolygon.contains: {fast * 1e9 / (zones * scalar_n):8.0f} ns/test  {loop / fast:.0f}x")
+    loop = timed(lambda: [point_poly_col_array(points, polygon) for polygon in polygons], 1)
+    fast = timed(lambda: [zone.contains_array(points) for zone in prepared])
+    print(f"  point_poly_col_array    : {loop * 1e9 / (zones * n):8.1f} ns/test")
+    print(f"  contains_array          : {fast * 1e9 / (zones * n):8.1f} ns/test  {loop / fast:.0f}x")
+
+
+if __name__ == "__main__":
+    bench_broad_phase()
+    bench_narrow_phase()
+    bench_sweep_and_prune()
+    bench_continuous()
+    bench_prepared_polygons()
@@ -0,0 +1,274 @@
+from random import random, seed
+import os
+import pickle
+import time
+import tracemalloc
+
+from sutil.utils.ecs import *
+
+
+class A():
+    pass
+
+
+class B():
+    pass
+
+
+class C():
+    pass
+
+
+class D():
+    pass
+
+
+class E():
+    pass
+
+
+class F():
+    pass
+
+
+COMPONENT_TYPES = [A, B, C, D, E, F]
+
+
+class ObjectVelocity():
+    def __init__(self, dx=0, dy=0) -> None:
+        self.dx = dx
+        self.dy = dy
+
+
+class RecordVelocity(RecordComponent):
+    fields = {"dx": "f8", "dy": "f8"}
+
+
+class ObjectFrictionSystem(EntitySystem):
+    def on_engine_change(self, engine: EntityEngine):
+        self.entities = engine.fetch(EntityFamily().all(ObjectVelocity))
+
+    def update(self, engine: EntityEngine):
+        for entity in self.entities:
+            velocity = entity.get(ObjectVelocity)
+            velocity.dx *= 0.998
+            velocity.dy *= 0.998
+
+
+class RecordFrictionSystem(VectorizedSystem):
+    def on_engine_change(self, engine: EntityEngine):
+        self.entities = engine.fetch(EntityFamily().all(RecordVelocity))
+
+    def update_columns(self, engine: EntityEngine, columns):
+        velocity = columns[RecordVelocity]
+        velocity.dx *= 0.998
+        velocity.dy *= 0.998
+
+
+class Orbit(RecordComponent):
+    fields = {"x": "f8", "y": "f8"}
+
+
+class OrbitSystem(ChunkedSystem):
+    chunk_size = 8192
+
+    def on_engine_change(self, engine: EntityEngine):
+        self.entities = engine.fetch(EntityFamily().all(Orbit))
+
+    @staticmethod
+    def process_chunk(columns):
+        # Deliberately pure Python, the kind of work threads can't spread
+        orbit = columns[Orbit]
+        xs = orbit.x
+        ys = orbit.y
+        for i in range(len(xs)):
+            x = xs[i]
+            y = ys[i]
+            for _ in range(50):
+                x, y = y * 0.5 + 0.1, x * 0.5 - 0.1
+            xs[i] = x
+            ys[i] = y
+
+
+class ObjectTileSystem(EntitySystem):
+    def on_engine_change(self, engine: EntityEngine):
+        self.entities = engine.fetch(EntityFamily().all(ObjectVelocity))
+
+    def update(self, engine: EntityEngine):
+        for entity in self.entities:
+            entity.get(ObjectVelocity).dx += 1
+
+
+class ChangedTileSystem(ObjectTileSystem):
+    def on_engine_change(self, engine: EntityEngine):
+        self.entities = engine.fetch(EntityFamily().changed(ObjectVelocity))
+
+
+def set_matches(family: EntityFamily, entity: EntityObject) -> bool:
+    '''The set based matching EntityFamily used before bitmask signatures'''
+    keys = set(entity.components.keys())
+
+    if len(family.s_excluded & keys) != 0:
+        return False
+
+    if len(family.s_included & keys) == len(family.s_included) and len(family.s_electives) == 0:
+        return True
+
+    if len(family.s_electives & keys) > 0:
+        return True
+    return False
+
+
+def random_entities(n):
+    seed(0)
+    entities = []
+    for _ in range(n):
+        e = EntityObject()
+        for t in COMPONENT_TYPES:
+            if random() < 0.5:
+                e.attach(t())
+        entities.append(e)
+    return entities
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_family_matching(n=100_000):
+    entities = random_entities(n)
+    family = EntityFamily().all(A, B).exclude(C)
+
+    set_time, set_count = timed(lambda: sum(1 for e in entities if set_matches(family, e)))
+    mask_time, mask_count = timed(lambda: sum(1 for e in entities if family.matches(e)))
+    assert set_count == mask_count
+
+    print(f"Family matching over {n} entities ({mask_count} matches)")
+    print(f"  set  : {set_time * 1000:8.2f} ms  {n / set_time:12.0f} matches/s")
+    print(f"  mask : {mask_time * 1000:8.2f} ms  {n / mask_time:12.0f} matches/s")
+    print(f"  speedup: {set_time / mask_time:.1f}x")
+
+
+def build_engine(n, component_type, system, processes=0):
+    engine = EntityEngine(ARCHETYPE_STORAGE, processes=processes)
+    engine.systems = [system]
+    for i in range(n):
+        e = EntityObject()
+        e.attach(component_type(i, i))
+        engine.add_entity(e, False)
+    engine.notify_entity_change()
+    return engine
+
+
+def bench_vectorized_friction(n=1_000_000):
+    object_engine = build_engine(n, ObjectVelocity, ObjectFrictionSystem())
+    record_engine = build_engine(n, RecordVelocity, RecordFrictionSystem())
+
+    object_time, _ = timed(object_engine.update)
+    record_time, _ = timed(record_engine.update)
+
+    print(f"Friction system over {n} entities")
+    print(f"  objects : {object_time * 1000:8.2f} ms/frame")
+    print(f"  columns : {record_time * 1000:8.2f} ms/frame")
+    print(f"  speedup: {object_time / record_time:.1f}x")
+
+
+def bench_process_chunks(n=200_000):
+    cores = os.cpu_count()
+    print(f"Chunked pure Python system over {n} entities")
+    baseline = None
+    for processes in sorted({0, 2, cores}):
+        engine = build_engine(n, Orbit, OrbitSystem(), processes)
+        # Start the workers outside of the measurement
+        engine.update()
+
+        frame_time, _ = timed(engine.update)
+        engine.close()
+        baseline = baseline or frame_time
+        print(f"  processes={processes:<3}: {frame_time * 1000:8.2f} ms/frame  {baseline / frame_time:.1f}x")
+
+
+def measure_memory(fn):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def bench_entity_memory(n=100_000):
+    def object_world():
+        engine = EntityEngine(DICT_STORAGE)
+        for i in range(n):
+            e = EntityObject()
+            e.attach(ObjectVelocity(i, i))
+            engine.add_entity(e, False)
+        return engine
+
+    def handle_world():
+        engine = EntityEngine(SPARSE_STORAGE)
+        for i in range(n):
+            engine.spawn(RecordVelocity(i, i))
+        return engine
+
+    object_bytes, _ = measure_memory(object_world)
+    handle_bytes, _ = measure_memory(handle_world)
+    print(f"Memory of {n} entities with one velocity component")
+    print(f"  objects : {object_bytes / n:8.1f} bytes/entity")
+    print(f"  handles : {handle_bytes / n:8.1f} bytes/entity")
+    print(f"  ratio: {object_bytes / handle_bytes:.1f}x")
+
+    start = time.perf_counter()
+    engine = EntityEngine(SPARSE_STORAGE)
+    for i in range(1_000_000):
+        engine.spawn(RecordVelocity(i, i))
+    print(f"  spawning 1M handle entities: {time.perf_counter() - start:.2f} s")
+
+
+def bench_change_detection(n=10_000, changed=100):
+    print(f"Systems over {n} entities with {changed} changed per frame")
+    for system in (ObjectTileSystem(), ChangedTileSystem()):
+        engine = build_engine(n, ObjectVelocity, system)
+        engine.update()
+        entities = engine.entities[:changed]
+
+        def frame():
+            for entity in entities:
+                entity.get_mut(ObjectVelocity).dy += 1
+            engine.update()
+
+        frame_time, _ = timed(frame)
+        print(f"  {type(system).__name__:<18}: {frame_time * 1000:8.3f} ms/frame")
+
+
+def bench_snapshot(n=100_000):
+    engine = build_engine(n, RecordVelocity, RecordFrictionSystem())
+    pickle_time, pickled = timed(lambda: pickle.dumps(engine.storage, pickle.HIGHEST_PROTOCOL), 1)
+    full_time, full = timed(engine.snapshot, 1)
+
+    # Touch one percent of the rows like a quiet simulation frame would
+    velocity = next(iter(engine.storage.fetch_tables(EntityFamily().all(RecordVelocity)))).columns[RecordVelocity]
+    velocity.arrays["dx"][::100] += 1
+    delta_time, delta = timed(lambda: engine.snapshot(delta=True), 1)
+    restore_time, _ = timed(lambda: engine.restore(full), 1)
+
+    print(f"Snapshots of {n} entities")
+    print(f"  pickle  : {pickle_time * 1000:8.2f} ms  {len(pickled) / 1024:10.1f} KiB")
+    print(f"  full    : {full_time * 1000:8.2f} ms  {len(full) / 1024:10.1f} KiB")
+    print(f"  delta   : {delta_time * 1000:8.2f} ms  {len(delta) / 1024:10.1f} KiB")
+    print(f"  restore : {restore_time * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    bench_family_matching()
+    bench_entity_memory()
+    bench_vectorized_friction()
+    bench_process_chunks()
+    bench_change_detection()
+    bench_snapshot()
@@ -9,16 +9,12 @@ class IdentifierComponent():
         IdentifierComponent._instance_index += 1
 
 
-class PositionComponent():
-    def __init__(self, x=0, y=0) -> None:
-        self.x = x
-        self.y = y
+class PositionComponent(RecordComponent):
+    fields = {"x": "f8", "y": "f8"}
 
 
-class VelocityComponent():
-    def __init__(self, dx, dy) -> None:
-        self.dx = dx
-        self.dy = dy
+class VelocityComponent(RecordComponent):
+    fields = {"dx": "f8", "dy": "f8"}
 
 
 class MapTileComponent():
@@ -28,24 +24,24 @@ class MapTileComponent():
         self.time = 0
 
 
-class MoveSystem(EntitySystem):
+class MoveSystem(VectorizedSystem):
+    reads = (VelocityComponent,)
+    writes = (PositionComponent,)
+
     def on_engine_change(self, engine: EntityEngine):
         family = EntityFamily().all(VelocityComponent, PositionComponent)
         self.entities = engine.fetch(family)
-        pass
 
-    def update(self, engine: EntityEngine):
-        for entity in self.entities:
-            position_component: PositionComponent = entity.get(
-                PositionComponent)
-            velocity_component: VelocityComponent = entity.get(
-                VelocityComponent)
-            position_component.x += velocity_component.dx
-            position_component.y += velocity_component.dy
-            # print(f"Moved from ({position_component.x -velocity_component.dx}, {position_component.y - velocity_component.dy}) to ({position_component.x}, {position_component.y})")
+    def update_columns(self, engine: EntityEngine, columns):
+        position = columns[PositionComponent]
+        velocity = columns[VelocityComponent]
+        position.x += velocity.dx
+        position.y += velocity.dy
 
 
 class PrintNameSystem(EntitySystem):
+    writes = (IdentifierComponent,)
+
     def on_engine_change(self, engine: EntityEngine):
         family = EntityFamily().all(IdentifierComponent)
         self.entities = engine.fetch(family)
@@ -58,6 +54,9 @@ class PrintNameSystem(EntitySystem):
 
 
 class PositionRounderSystem(EntitySystem):
+    writes = (PositionComponent,)
+    tick_rate = 10
+
     def on_engine_change(self, engine: EntityEngine):
         family = EntityFamily().all(PositionComponent)
         self.entities = engine.fetch(family)
@@ -70,37 +69,60 @@ class PositionRounderSystem(EntitySystem):
             p_component.y = round(p_component.x)
 
 
-class FrictionSystem(EntitySystem):
+class FrictionSystem(VectorizedSystem):
+    writes = (VelocityComponent,)
+
     def on_engine_change(self, engine: EntityEngine):
         family = EntityFamily().all(VelocityComponent)
         self.entities = engine.fetch(family)
 
-    def update(self, engine: EntityEngine):
-        for entity in self.entities:
-            p_component: VelocityComponent = entity.get(
-                VelocityComponent)
-            p_component.dx *= 0.998
-            p_component.dy *= 0.998
+    def update_columns(self, engine: EntityEngine, columns):
+        velocity = columns[VelocityComponent]
+        velocity.dx *= 0.998
+        velocity.dy *= 0.998
 
 
 class TileUpdateSystem(EntitySystem):
+    writes = (MapTileComponent,)
+    # Each update handles a quarter of the tiles
+    slices = 4
+
     def on_engine_change(self, engine: EntityEngine):
         family = EntityFamily().all(MapTileComponent)
         self.entities = engine.fetch(family)
 
     def update(self, engine: EntityEngine):
-        for entity in self.entities:
+        for entity in self.sliced():
             tile_component: MapTileComponent = entity.get(
                 MapTileComponent)
-            tile_component.time += 1
+            tile_component.time += self.slices
+
+
+class TileCountSystem(EntitySystem):
+    reads = (MapTileComponent,)
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def on_engine_change(self, engine: EntityEngine):
+        family = EntityFamily().all(MapTileComponent)
+        self.entities = engine.fetch(family)
+
+    def on_added(self, engine: EntityEngine, entity: EntityObject):
+        self.count += 1
+
+    def on_removed(self, engine: EntityEngine, entity: EntityObject):
+        self.count -= 1
 
 
 if __name__ == "__main__":
     from random import randint, getrandbits
     import time
-    ecs_engine = EntityEngine()
+    ecs_engine = EntityEngine(ARCHETYPE_STORAGE, workers=4)
     ecs_engine.systems = [MoveSystem(), PrintNameSystem(),
-                          PositionRounderSystem(), FrictionSystem(), TileUpdateSystem()]
+                          PositionRounderSystem(), FrictionSystem(), TileUpdateSystem(),
+                          TileCountSystem()]
 
     for x in range(100):
         e = EntityObject()
@@ -116,16 +138,22 @@ if __name__ == "__main__":
 
     ecs_engine.notify_entity_change()
 
-    start = time.time()
-    n = 0
-    while time.time() - start < 1:
+    for phase in ecs_engine.schedule():
+        print("Phase:", [type(s).__name__ for s in phase])
+
+    ecs_engine.profiler = EngineProfiler()
+    start = time.perf_counter()
+    while time.perf_counter() - start < 1:
         ecs_engine.update()
-        n += 1
 
-    print(n/60)
+    print(f"{len(ecs_engine.profiler.frames)} frames in one second")
+    print(f"{ecs_engine.systems[-1].count} tiles")
+    print(ecs_engine.profiler.report())
+    ecs_engine.profiler.export_chrome_trace("ecs_trace.json")
+    ecs_engine.close()
 
     for e in ecs_engine.entities:
         print("Entity:")
-        print([v.__dict__ for v in e.components.values()])
+        print(list(e.components.values()))
         print()
         time.sleep(0.5)
@@ -0,0 +1,117 @@
+from collections import namedtuple
+from math import *
+import re
+import time
+
+import numpy as np
+
+from sutil.utils.expr_parser import calculate, compile_expression, is_float, to_rpn
+
+OpBehaviour = namedtuple('OpBehaviour', 'priority lmbd vectorized', defaults=(None,))
+
+operations = {
+    "+": OpBehaviour(0, lambda x, y: y+x),
+    "-": OpBehaviour(0, lambda x, y: y-x),
+    "/": OpBehaviour(1, lambda x, y: y/x),
+    "*": OpBehaviour(1, lambda x, y: y*x),
+    "^": OpBehaviour(2, lambda x, y: y**x),
+    "sin": OpBehaviour(99, lambda x: sin(x), np.sin),
+    "cos": OpBehaviour(99, lambda x: cos(x), np.cos),
+    "sqrt": OpBehaviour(99, lambda x: sqrt(x), np.sqrt),
+}
+
+# Formulas with their variables, the legacy path gets the values formatted into the string
+FORMULAS = [
+    ("a * x ^ 2 + b * x + c", "{a} * {x} ^ 2 + {b} * {x} + {c}"),
+    ("sqrt(x * x + y * y) / (1 + a)", "sqrt({x} * {x} + {y} * {y}) / (1 + {a})"),
+    ("sin(x) * cos(y) + a * (b - c) / 2", "sin({x}) * cos({y}) + {a} * ({b} - {c}) / 2"),
+]
+
+
+def legacy_tokenize(string, operations):
+    '''tokenize as it was, rebuilding the regex on every call'''
+    string = string.replace(" ", "")
+    float_regex = "\\d*\\.?\\d+|[\\(\\)]"
+    for key in operations.keys():
+        if len(key) == 1:
+            float_regex += "|" + "[\\" + key + "]"
+        else:
+            float_regex += "|" + key
+    rgx = re.compile(float_regex)
+    return [string[m.start():m.end()] for m in rgx.finditer(string)]
+
+
+def legacy_calculate(rpn_tokens, operations):
+    val_stack = []
+    for token in rpn_tokens:
+        if is_float(token):
+            val_stack.append(token)
+        elif token in list(operations.keys()):
+            args = []
+            for x in range(operations[token].lmbd.__code__.co_argcount):
+                args.append(float(val_stack.pop()))
+            val_stack.append(operations[token].lmbd(*args))
+    return val_stack[0]
+
+
+def legacy_calculate_string(string, operations):
+    return legacy_calculate(to_rpn(legacy_tokenize(string, operations), operations), operations)
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_compiled(n=20_000):
+    inputs = [dict(a=i * 0.5, b=1.25, c=3.0, x=i * 0.01 + 0.1, y=2.0) for i in range(n)]
+    print(f"Evaluating {n} inputs per formula")
+    for formula, template in FORMULAS:
+        assert isclose(legacy_calculate_string(template.format(**inputs[1]), operations),
+                       compile_expression(formula, operations).evaluate(inputs[1]))
+        legacy = timed(lambda: [legacy_calculate_string(template.format(**v), operations) for v in inputs], 1)
+        compiled = timed(lambda: [compile_expression(formula, operations).evaluate(v) for v in inputs])
+        print(f"  {formula:<36} legacy {legacy * 1e6 / n:6.1f} us  compiled {compiled * 1e6 / n:5.2f} us"
+              f"  {legacy / compiled:.0f}x")
+
+
+def bench_arrays(n=1_000_000, sample=10_000):
+    rng = np.random.default_rng(0)
+    columns = {name: rng.uniform(0.1, 2, n) for name in "abcxy"}
+    rows = [{name: float(column[i]) for name, column in columns.items()} for i in range(sample)]
+    print(f"Evaluating over {n} samples")
+    for formula, template in FORMULAS:
+        expression = compile_expression(formula, operations)
+        assert np.allclose(expression.evaluate_array(columns)[:100], [expression.evaluate(row) for row in rows[:100]])
+        # Per sample paths measured on a slice and scaled up
+        legacy = timed(lambda: [legacy_calculate_string(template.format(**v), operations) for v in rows], 1) * n / sample
+        loop = timed(lambda: [expression.evaluate(v) for v in rows], 1) * n / sample
+        arrays = timed(lambda: expression.evaluate_array(columns))
+        print(f"  {formula:<36} legacy {legacy:6.1f} s  compiled loop {loop:5.2f} s  arrays {arrays * 1000:5.1f} ms"
+              f"  {loop / arrays:.0f}x")
+
+
+def bench_generated(n=100_000):
+    inputs = [dict(a=i * 0.5, b=1.25, c=3.0, x=i * 0.01 + 0.1, y=2.0) for i in range(n)]
+    print(f"Calling the generated functions {n} times")
+    for formula, _ in FORMULAS:
+        expression = compile_expression(formula, operations)
+        function = expression.function
+        rows = [[v[name] for name in expression.variables] for v in inputs]
+        native = eval("lambda " + ", ".join(expression.variables) + ": " + formula.replace("^", "**"),
+                      {"sin": sin, "cos": cos, "sqrt": sqrt})
+        stack = timed(lambda: [expression.evaluate(v) for v in inputs])
+        generated = timed(lambda: [function(*row) for row in rows])
+        handwritten = timed(lambda: [native(*row) for row in rows])
+        print(f"  {formula:<36} stack machine {stack * 1e9 / n:6.0f} ns  generated {generated * 1e9 / n:5.0f} ns"
+              f"  {stack / generated:.1f}x  (hand written lambda {handwritten * 1e9 / n:4.0f} ns)")
+
+
+if __name__ == "__main__":
+    bench_compiled()
+    bench_arrays()
+    bench_generated()
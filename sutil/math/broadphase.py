@@ -0,0 +1,688 @@
+'''Broad phase collision detection for 2D axis-aligned boxes
+
+The indexes store an AABB2D per key and report the candidate pairs whose
+boxes overlap, the exact tests of collision2d are then only run on those
+'''
+
+from __future__ import annotations
+from bisect import bisect_right
+from math import floor, inf
+from typing import Callable, Dict, Hashable, Iterator, List, Set, Tuple
+
+from ..sorting import insertion_sort
+from .collision2d import AABB2D, _ray_entry
+from .vector import Vector2
+
+Bounds = Tuple[float, float, float, float]
+
+
+# region Helpers
+def _overlaps(a: Bounds, b: Bounds) -> bool:
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _contains(a: Bounds, b: Bounds) -> bool:
+    return a[0] <= b[0] and a[1] <= b[1] and b[2] <= a[2] and b[3] <= a[3]
+
+
+def _union(a: Bounds, b: Bounds) -> Bounds:
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+# endregion
+
+
+class BroadPhase:
+    '''Spatial index of AABB2D keyed by any hashable'''
+
+    def __init__(self) -> None:
+        self._boxes: Dict[Hashable, AABB2D] = {}
+        self._bounds: Dict[Hashable, Bounds] = {}
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._boxes
+
+    def aabb(self, key: Hashable) -> AABB2D:
+        return self._boxes[key]
+
+    def insert(self, key: Hashable, aabb: AABB2D) -> None:
+        raise NotImplementedError()
+
+    def update(self, key: Hashable, aabb: AABB2D) -> None:
+        '''Replaces the box of a key, raises KeyError and leaves the index as is for unknown keys'''
+        raise NotImplementedError()
+
+    def remove(self, key: Hashable) -> None:
+        raise NotImplementedError()
+
+    def pairs(self) -> Iterator[Tuple[Hashable, Hashable]]:
+        '''Every pair of keys whose boxes overlap, each pair once'''
+        raise NotImplementedError()
+
+    def query_point(self, point: Vector2) -> List[Hashable]:
+        raise NotImplementedError()
+
+    def query_region(self, region: AABB2D) -> List[Hashable]:
+        raise NotImplementedError()
+
+    def query_ray(self, origin: Vector2, direction: Vector2, max_distance: float = inf) -> List[Tuple[Hashable, float]]:
+        '''(key, t) of every box hit by origin + direction * t for t in [0, max_distance], nearest first'''
+        raise NotImplementedError()
+
+    def collisions(self, test: Callable[[Hashable, Hashable], bool] = None) -> Iterator[Tuple[Hashable, Hashable]]:
+        '''Runs the narrow phase test on the candidate pairs, AABB2D.collide by default'''
+        if test is None:
+            boxes = self._boxes
+            return ((a, b) for a, b in self.pairs() if boxes[a].collide(boxes[b]))
+        return ((a, b) for a, b in self.pairs() if test(a, b))
+
+
+class SpatialHashGrid(BroadPhase):
+    '''Uniform grid hashing every box into the cells it covers
+
+    Works best when the cell size is close to the size of the typical box,
+    updates that stay in the same cells only replace the bounds
+    '''
+
+    def __init__(self, cell_size: float) -> None:
+        super().__init__()
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], Dict[Hashable, None]] = {}
+        self._ranges: Dict[Hashable, Tuple[int, int, int, int]] = {}
+        # Grows only, bounds the cells a ray has to walk
+        self._extent = None
+
+    def _range(self, bounds: Bounds) -> Tuple[int, int, int, int]:
+        size = self.cell_size
+        return (floor(bounds[0] / size), floor(bounds[1] / size),
+                floor(bounds[2] / size), floor(bounds[3] / size))
+
+    def _add(self, key: Hashable, cells: Tuple[int, int, int, int]) -> None:
+        grid = self._cells
+        for x in range(cells[0], cells[2] + 1):
+            for y in range(cells[1], cells[3] + 1):
+                cell = grid.get((x, y))
+                if cell is None:
+                    grid[x, y] = cell = {}
+                cell[key] = None
+        extent = self._extent
+        self._extent = cells if extent is None else (
+            min(extent[0], cells[0]), min(extent[1], cells[1]), max(extent[2], cells[2]), max(extent[3], cells[3]))
+
+    def _discard(self, key: Hashable, cells: Tuple[int, int, int, int]) -> None:
+        grid = self._cells
+        for x in range(cells[0], cells[2] + 1):
+            for y in range(cells[1], cells[3] + 1):
+                cell = grid[x, y]
+                del cell[key]
+                if not cell:
+                    del grid[x, y]
+
+    def insert(self, key: Hashable, aabb: AABB2D) -> None:
+        if key in self._boxes:
+            raise KeyError(f"{key!r} is already in the grid")
+        bounds = aabb.bounds
+        self._boxes[key] = aabb
+        self._bounds[key] = bounds
+        self._ranges[key] = cells = self._range(bounds)
+        self._add(key, cells)
+
+    def update(self, key: Hashable, aabb: AABB2D) -> None:
+        old = self._ranges[key]
+        bounds = aabb.bounds
+        self._boxes[key] = aabb
+        self._bounds[key] = bounds
+        cells = self._range(bounds)
+        if cells != old:
+            self._discard(key, old)
+            self._add(key, cells)
+            self._ranges[key] = cells
+
+    def remove(self, key: Hashable) -> None:
+        self._discard(key, self._ranges.pop(key))
+        del self._boxes[key]
+        del self._bounds[key]
+
+    def pairs(self) -> Iterator[Tuple[Hashable, Hashable]]:
+        all_bounds = self._bounds
+        size = self.cell_size
+        for (x, y), cell in self._cells.items():
+            if len(cell) < 2:
+                continue
+            keys = list(cell)
+            bounds = [all_bounds[key] for key in keys]
+            for i in range(len(keys) - 1):
+                a = bounds[i]
+                for j in range(i + 1, len(keys)):
+                    b = bounds[j]
+                    if a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]:
+                        # Only the cell holding the lowest corner of the overlap reports it
+                        if floor(max(a[0], b[0]) / size) == x and floor(max(a[1], b[1]) / size) == y:
+                            yield keys[i], keys[j]
+
+    def query_point(self, point: Vector2) -> List[Hashable]:
+        size = self.cell_size
+        cell = self._cells.get((floor(point.x / size), floor(point.y / size)), ())
+        bounds = self._bounds
+        px, py = point.x, point.y
+        return [key for key in cell if bounds[key][0] <= px <= bounds[key][2] and bounds[key][1] <= py <= bounds[key][3]]
+
+    def query_region(self, region: AABB2D) -> List[Hashable]:
+        area = region.bounds
+        cells = self._range(area)
+        grid = self._cells
+        bounds = self._bounds
+        found = {}
+        for x in range(cells[0], cells[2] + 1):
+            for y in range(cells[1], cells[3] + 1):
+                for key in grid.get((x, y), ()):
+                    if key not in found and _overlaps(bounds[key], area):
+                        found[key] = None
+        return list(found)
+
+    def query_ray(self, origin: Vector2, direction: Vector2, max_distance: float = inf) -> List[Tuple[Hashable, float]]:
+        if self._extent is None:
+            return []
+        size = self.cell_size
+        ox, oy, dx, dy = origin.x, origin.y, direction.x, direction.y
+        extent = self._extent
+        world = (extent[0] * size, extent[1] * size, (extent[2] + 1) * size, (extent[3] + 1) * size)
+        t = _ray_entry(ox, oy, dx, dy, world, max_distance)
+        if t is None:
+            return []
+
+        # Walk the cells along the ray (Amanatides & Woo)
+        x = min(max(floor((ox + dx * t) / size), extent[0]), extent[2])
+        y = min(max(floor((oy + dy * t) / size), extent[1]), extent[3])
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        next_x = ((x + (dx > 0)) * size - ox) / dx if dx else inf
+        next_y = ((y + (dy > 0)) * size - oy) / dy if dy else inf
+        delta_x = size / abs(dx) if dx else inf
+        delta_y = size / abs(dy) if dy else inf
+
+        grid = self._cells
+        bounds = self._bounds
+        hits = {}
+        while extent[0] <= x <= extent[2] and extent[1] <= y <= extent[3] and t <= max_distance:
+            for key in grid.get((x, y), ()):
+                if key not in hits:
+                    hit = _ray_entry(ox, oy, dx, dy, bounds[key], max_distance)
+                    if hit is not None:
+                        hits[key] = hit
+            if next_x < next_y:
+                t = next_x
+                next_x += delta_x
+                x += step_x
+            else:
+                t = next_y
+                next_y += delta_y
+                y += step_y
+        return sorted(hits.items(), key=lambda hit: hit[1])
+
+
+class DynamicAABBTree(BroadPhase):
+    '''Bounding volume hierarchy with incremental inserts and removals
+
+    Leaves hold the boxes grown by margin, so moves that stay inside the
+    grown box don't touch the tree. Inserts pick the sibling with the
+    smallest perimeter increase and rotations keep the tree balanced.
+    '''
+
+    def __init__(self, margin: float = 0.1) -> None:
+        super().__init__()
+        self.margin = margin
+        self._root = -1
+        # Nodes are stored in parallel lists, a leaf has left == -1
+        self._fat: List[Bounds] = []
+        self._parent: List[int] = []
+        self._left: List[int] = []
+        self._right: List[int] = []
+        self._height: List[int] = []
+        self._key: List[Hashable] = []
+        self._free: List[int] = []
+        self._leaves: Dict[Hashable, int] = {}
+
+    # region Nodes
+    def _allocate(self) -> int:
+        if self._free:
+            node = self._free.pop()
+            self._parent[node] = self._left[node] = self._right[node] = -1
+            self._height[node] = 0
+            return node
+        self._fat.append(None)
+        self._parent.append(-1)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._height.append(0)
+        self._key.append(None)
+        return len(self._fat) - 1
+
+    def _release(self, node: int) -> None:
+        self._key[node] = None
+        self._free.append(node)
+
+    def _fatten(self, bounds: Bounds) -> Bounds:
+        margin = self.margin
+        return (bounds[0] - margin, bounds[1] - margin, bounds[2] + margin, bounds[3] + margin)
+
+    def _insert_leaf(self, leaf: int) -> None:
+        if self._root == -1:
+            self._root = leaf
+            self._parent[leaf] = -1
+            return
+
+        fat, left, right = self._fat, self._left, self._right
+        box = fat[leaf]
+        x0, y0, x1, y1 = box
+        node = self._root
+        while left[node] != -1:
+            # Half perimeters, the 2D stand-in for surface area
+            n = fat[node]
+            area = n[2] - n[0] + n[3] - n[1]
+            combined = ((n[2] if n[2] > x1 else x1) - (n[0] if n[0] < x0 else x0)
+                        + (n[3] if n[3] > y1 else y1) - (n[1] if n[1] < y0 else y0))
+            # Cost of a new parent here, and the cost pushed down to either child
+            cost = 2 * combined
+            inherited = 2 * (combined - area)
+            a, b = left[node], right[node]
+            c = fat[a]
+            cost_a = ((c[2] if c[2] > x1 else x1) - (c[0] if c[0] < x0 else x0)
+                      + (c[3] if c[3] > y1 else y1) - (c[1] if c[1] < y0 else y0)) + inherited
+            if left[a] != -1:
+                cost_a -= c[2] - c[0] + c[3] - c[1]
+            c = fat[b]
+            cost_b = ((c[2] if c[2] > x1 else x1) - (c[0] if c[0] < x0 else x0)
+                      + (c[3] if c[3] > y1 else y1) - (c[1] if c[1] < y0 else y0)) + inherited
+            if left[b] != -1:
+                cost_b -= c[2] - c[0] + c[3] - c[1]
+            if cost < cost_a and cost < cost_b:
+                break
+            node = a if cost_a < cost_b else b
+
+        sibling = node
+        old_parent = self._parent[sibling]
+        new_parent = self._allocate()
+        self._parent[new_parent] = old_parent
+        fat[new_parent] = _union(box, fat[sibling])
+        self._height[new_parent] = self._height[sibling] + 1
+        if old_parent == -1:
+            self._root = new_parent
+        elif left[old_parent] == sibling:
+            left[old_parent] = new_parent
+        else:
+            right[old_parent] = new_parent
+        left[new_parent] = sibling
+        right[new_parent] = leaf
+        self._parent[sibling] = new_parent
+        self._parent[leaf] = new_parent
+        self._refit(new_parent)
+
+    def _remove_leaf(self, leaf: int) -> None:
+        if leaf == self._root:
+            self._root = -1
+            return
+        parent = self._parent[leaf]
+        grandparent = self._parent[parent]
+        sibling = self._right[parent] if self._left[parent] == leaf else self._left[parent]
+        self._parent[sibling] = grandparent
+        self._release(parent)
+        if grandparent == -1:
+            self._root = sibling
+            return
+        if self._left[grandparent] == parent:
+            self._left[grandparent] = sibling
+        else:
+            self._right[grandparent] = sibling
+        self._refit(grandparent)
+
+    def _refit(self, node: int) -> None:
+        '''Rebalances and recomputes the bounds from node up to the root'''
+        fat, left, right, height = self._fat, self._left, self._right, self._height
+        parent = self._parent
+        while node != -1:
+            a, b = left[node], right[node]
+            if abs(height[a] - height[b]) > 1:
+                node = self._balance(node)
+                a, b = left[node], right[node]
+            height[node] = 1 + (height[a] if height[a] > height[b] else height[b])
+            fa, fb = fat[a], fat[b]
+            fat[node] = (fa[0] if fa[0] < fb[0] else fb[0], fa[1] if fa[1] < fb[1] else fb[1],
+                         fa[2] if fa[2] > fb[2] else fb[2], fa[3] if fa[3] > fb[3] else fb[3])
+            node = parent[node]
+
+    def _balance(self, a: int) -> int:
+        '''Rotates the taller grandchild of a up if a is unbalanced, returns the new subtree root'''
+        left, right, parent, height, fat = self._left, self._right, self._parent, self._height, self._fat
+        if left[a] == -1 or height[a] < 2:
+            return a
+        b, c = left[a], right[a]
+        balance = height[c] - height[b]
+        if -1 <= balance <= 1:
+            return a
+
+        # Rotate the taller child up, it keeps its own taller child
+        up, low = (c, b) if balance > 1 else (b, c)
+        f, g = left[up], right[up]
+        left[up] = a
+        parent[up] = parent[a]
+        parent[a] = up
+        if parent[up] == -1:
+            self._root = up
+        elif left[parent[up]] == a:
+            left[parent[up]] = up
+        else:
+            right[parent[up]] = up
+
+        keep, give = (f, g) if height[f] > height[g] else (g, f)
+        right[up] = keep
+        parent[give] = a
+        if balance > 1:
+            right[a] = give
+        else:
+            left[a] = give
+        fat[a] = _union(fat[low], fat[give])
+        height[a] = 1 + max(height[low], height[give])
+        fat[up] = _union(fat[a], fat[keep])
+        height[up] = 1 + max(height[a], height[keep])
+        return up
+    # endregion
+
+    @property
+    def height(self) -> int:
+        return self._height[self._root] if self._root != -1 else 0
+
+    def insert(self, key: Hashable, aabb: AABB2D) -> None:
+        if key in self._boxes:
+            raise KeyError(f"{key!r} is already in the tree")
+        bounds = aabb.bounds
+        self._boxes[key] = aabb
+        self._bounds[key] = bounds
+        leaf = self._allocate()
+        self._fat[leaf] = self._fatten(bounds)
+        self._key[leaf] = key
+        self._leaves[key] = leaf
+        self._insert_leaf(leaf)
+
+    def update(self, key: Hashable, aabb: AABB2D) -> None:
+        leaf = self._leaves[key]
+        bounds = aabb.bounds
+        self._boxes[key] = aabb
+        self._bounds[key] = bounds
+        # The leaf only moves once the box leaves its fat bounds
+        if not _contains(self._fat[leaf], bounds):
+            self._remove_leaf(leaf)
+            self._fat[leaf] = self._fatten(bounds)
+            self._insert_leaf(leaf)
+
+    def remove(self, key: Hashable) -> None:
+        leaf = self._leaves.pop(key)
+        self._remove_leaf(leaf)
+        self._release(leaf)
+        del self._boxes[key]
+        del self._bounds[key]
+
+    def pairs(self) -> Iterator[Tuple[Hashable, Hashable]]:
+        if self._root == -1:
+            return
+        fat, left, right, keys, bounds = self._fat, self._left, self._right, self._key, self._bounds
+        # Each internal node contributes its pairs across its two subtrees
+        inner = [self._root]
+        while inner:
+            node = inner.pop()
+            if left[node] == -1:
+                continue
+            inner.append(left[node])
+            inner.append(right[node])
+            crossing = [(left[node], right[node])]
+            while crossing:
+                a, b = crossing.pop()
+                fa, fb = fat[a], fat[b]
+                if not (fa[0] <= fb[2] and fb[0] <= fa[2] and fa[1] <= fb[3] and fb[1] <= fa[3]):
+                    continue
+                if left[a] == -1:
+                    if left[b] == -1:
+                        if _overlaps(bounds[keys[a]], bounds[keys[b]]):
+                            yield keys[a], keys[b]
+                    else:
+                        crossing.append((a, left[b]))
+                        crossing.append((a, right[b]))
+                elif left[b] == -1 or self._height[a] >= self._height[b]:
+                    crossing.append((left[a], b))
+                    crossing.append((right[a], b))
+                else:
+                    crossing.append((a, left[b]))
+                    crossing.append((a, right[b]))
+
+    def _query(self, hit: Callable[[Bounds], bool]) -> List[Hashable]:
+        found = []
+        if self._root == -1:
+            return found
+        fat, left, right, keys, bounds = self._fat, self._left, self._right, self._key, self._bounds
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if not hit(fat[node]):
+                continue
+            if left[node] == -1:
+                if hit(bounds[keys[node]]):
+                    found.append(keys[node])
+            else:
+                stack.append(left[node])
+                stack.append(right[node])
+        return found
+
+    def query_point(self, point: Vector2) -> List[Hashable]:
+        px, py = point.x, point.y
+        return self._query(lambda box: box[0] <= px <= box[2] and box[1] <= py <= box[3])
+
+    def query_region(self, region: AABB2D) -> List[Hashable]:
+        area = region.bounds
+        return self._query(lambda box: _overlaps(box, area))
+
+    def query_ray(self, origin: Vector2, direction: Vector2, max_distance: float = inf) -> List[Tuple[Hashable, float]]:
+        ox, oy, dx, dy = origin.x, origin.y, direction.x, direction.y
+        keys = self._query(lambda box: _ray_entry(ox, oy, dx, dy, box, max_distance) is not None)
+        bounds = self._bounds
+        hits = [(key, _ray_entry(ox, oy, dx, dy, bounds[key], max_distance)) for key in keys]
+        return sorted(hits, key=lambda hit: hit[1])
+
+
+class SweepAndPrune(BroadPhase):
+    '''Sort and sweep over the x and y intervals of the boxes
+
+    The endpoint lists stay sorted between frames and are re-sorted with an
+    insertion sort, which is close to linear when boxes move a little per
+    frame. Every swap of two endpoints of different boxes either starts or
+    ends an overlap on that axis, so step() reports only the pairs that
+    started or stopped overlapping since the previous step. Removals are
+    batched, the boxes removed since the last sort leave the endpoint lists
+    in a single O(n) pass.
+
+    Examples:
+        sap.update(key, moved_box)
+        added, removed = sap.step()
+    '''
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._ids: Dict[Hashable, int] = {}
+        self._keys: Dict[int, Hashable] = {}
+        self._next_id = 0
+        # Endpoints are [value, is max, id] so ties put a min before a max,
+        # touching boxes overlap like in _overlaps
+        self._endpoints: Dict[int, Tuple[list, list, list, list]] = {}
+        self._x: List[list] = []
+        self._y: List[list] = []
+        self._pairs: Dict[Tuple[int, int], None] = {}
+        self._added: Dict[Tuple[int, int], None] = {}
+        self._removed: Dict[Tuple[int, int], None] = {}
+        # Ids of removed boxes, their keys are kept until step reports their pairs
+        self._dead: List[int] = []
+        # Ids of boxes removed since the last sort, their endpoints are still listed
+        self._removing: Set[int] = set()
+        # Endpoints of boxes inserted since the last sort
+        self._new_x: List[list] = []
+        self._new_y: List[list] = []
+        self._dirty = False
+
+    def _begin(self, item: list, other: list) -> None:
+        a, b = item[2], other[2]
+        if a == b:
+            return
+        ea, eb = self._endpoints[a], self._endpoints[b]
+        if (ea[0][0] <= eb[1][0] and eb[0][0] <= ea[1][0]
+                and ea[2][0] <= eb[3][0] and eb[2][0] <= ea[3][0]):
+            pair = (a, b) if a < b else (b, a)
+            if pair not in self._pairs:
+                self._pairs[pair] = None
+                if pair in self._removed:
+                    del self._removed[pair]
+                else:
+                    self._added[pair] = None
+
+    def _end(self, pair: Tuple[int, int]) -> None:
+        if pair in self._pairs:
+            del self._pairs[pair]
+            if pair in self._added:
+                del self._added[pair]
+            else:
+                self._removed[pair] = None
+
+    def _swapped(self, item: list, other: list) -> None:
+        if item[1] == other[1]:
+            return
+        if item[1]:
+            # A max moved before a min, the intervals separated
+            a, b = item[2], other[2]
+            self._end((a, b) if a < b else (b, a))
+        else:
+            self._begin(item, other)
+
+    def _purge(self) -> None:
+        '''Drops the endpoints and pairs of the boxes removed since the last sort'''
+        removing = self._removing
+        self._x = [endpoint for endpoint in self._x if endpoint[2] not in removing]
+        self._y = [endpoint for endpoint in self._y if endpoint[2] not in removing]
+        self._new_x = [endpoint for endpoint in self._new_x if endpoint[2] not in removing]
+        self._new_y = [endpoint for endpoint in self._new_y if endpoint[2] not in removing]
+        for pair in [pair for pair in self._pairs if pair[0] in removing or pair[1] in removing]:
+            self._end(pair)
+        for id in removing:
+            del self._endpoints[id]
+        self._removing = set()
+
+    def _sort(self) -> None:
+        # The pairs of removed boxes end whatever their last moves were
+        if self._removing:
+            self._purge()
+        if self._dirty:
+            insertion_sort(self._x, self._swapped)
+            insertion_sort(self._y, self._swapped)
+            self._dirty = False
+        if self._new_x:
+            self._merge()
+
+    def _merge(self) -> None:
+        '''Sorts the new endpoints in and sweeps once for the pairs of the new boxes'''
+        new = {endpoint[2] for endpoint in self._new_x}
+        # Sorting two sorted runs is a merge
+        self._new_x.sort()
+        self._new_y.sort()
+        self._x += self._new_x
+        self._x.sort()
+        self._y += self._new_y
+        self._y.sort()
+        self._new_x = []
+        self._new_y = []
+
+        endpoints = self._endpoints
+        active = {}
+        for endpoint in self._x:
+            id = endpoint[2]
+            if endpoint[1]:
+                del active[id]
+                continue
+            fresh = id in new
+            for other in active:
+                if fresh or other in new:
+                    self._begin(endpoint, endpoints[other][0])
+            active[id] = None
+
+    def insert(self, key: Hashable, aabb: AABB2D) -> None:
+        if key in self._boxes:
+            raise KeyError(f"{key!r} is already in the sweep")
+        bounds = aabb.bounds
+        self._boxes[key] = aabb
+        self._bounds[key] = bounds
+        id = self._next_id
+        self._next_id += 1
+        self._ids[key] = id
+        self._keys[id] = key
+        endpoints = ([bounds[0], 0, id], [bounds[2], 1, id], [bounds[1], 0, id], [bounds[3], 1, id])
+        self._endpoints[id] = endpoints
+        self._new_x += endpoints[:2]
+        self._new_y += endpoints[2:]
+
+    def update(self, key: Hashable, aabb: AABB2D) -> None:
+        endpoints = self._endpoints[self._ids[key]]
+        bounds = aabb.bounds
+        self._boxes[key] = aabb
+        self._bounds[key] = bounds
+        endpoints[0][0] = bounds[0]
+        endpoints[1][0] = bounds[2]
+        endpoints[2][0] = bounds[1]
+        endpoints[3][0] = bounds[3]
+        self._dirty = True
+
+    def remove(self, key: Hashable) -> None:
+        '''Removes a box, its endpoints are dropped by the next sort'''
+        id = self._ids.pop(key)
+        self._dead.append(id)
+        self._removing.add(id)
+        del self._boxes[key]
+        del self._bounds[key]
+
+    def step(self) -> Tuple[List[Tuple[Hashable, Hashable]], List[Tuple[Hashable, Hashable]]]:
+        '''Re-sorts the endpoints, returns the pairs added and removed since the last step'''
+        self._sort()
+        keys = self._keys
+        added = [(keys[a], keys[b]) for a, b in self._added]
+        removed = [(keys[a], keys[b]) for a, b in self._removed]
+        self._added = {}
+        self._removed = {}
+        for id in self._dead:
+            del keys[id]
+        self._dead = []
+        return added, removed
+
+    def pairs(self) -> Iterator[Tuple[Hashable, Hashable]]:
+        self._sort()
+        keys = self._keys
+        return iter([(keys[a], keys[b]) for a, b in self._pairs])
+
+    def query_region(self, region: AABB2D) -> List[Hashable]:
+        self._sort()
+        area = region.bounds
+        bounds = self._bounds
+        found = []
+        # Only boxes starting before the region ends on x can overlap it
+        for endpoint in self._x[:bisect_right(self._x, [area[2], 0, inf])]:
+            if not endpoint[1]:
+                key = self._keys[endpoint[2]]
+                if _overlaps(bounds[key], area):
+                    found.append(key)
+        return found
+
+    def query_point(self, point: Vector2) -> List[Hashable]:
+        return self.query_region(AABB2D(point, Vector2()))
+
+    def query_ray(self, origin: Vector2, direction: Vector2, max_distance: float = inf) -> List[Tuple[Hashable, float]]:
+        ox, oy, dx, dy = origin.x, origin.y, direction.x, direction.y
+        hits = []
+        for key, box in self._bounds.items():
+            t = _ray_entry(ox, oy, dx, dy, box, max_distance)
+            if t is not None:
+                hits.append((key, t))
+        return sorted(hits, key=lambda hit: hit[1])
@@ -1,36 +1,118 @@
 from __future__ import annotations
-from typing import List
+from bisect import bisect_left, bisect_right
+from math import inf, sqrt
+from typing import List, Optional, Tuple
 from . import vector
-from .vector import Vector2
+from .vector import Vector2, Vector2Array
+
+try:
+    import numpy as np
+except ImportError:  # Only the batched tests need numpy
+    np = None
 
 
 class AABB2D():
     """A 2D Axis-Aligned Bounding Box
+
+    position is the minimum corner, the box spans position to position + dimension
     """
 
-    def __init__(self) -> None:
-        self.position = vector.Vector2
-        self.dimension = vector.Vector2
+    def __init__(self, position: Vector2 = None, dimension: Vector2 = None) -> None:
+        self.position = position if position is not None else Vector2()
+        self.dimension = dimension if dimension is not None else Vector2()
+
+    @property
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """(min x, min y, max x, max y)"""
+        return (self.position.x, self.position.y,
+                self.position.x + self.dimension.x, self.position.y + self.dimension.y)
 
     def collide(self, other: AABB2D) -> bool:
-        s_dx_s = self.position.x + self.dimension.x
-        s_dx_e = self.position.x
+        s_dx_s = self.position.x
+        s_dx_e = self.position.x + self.dimension.x
 
         o_dx_s = other.position.x
         o_dx_e = other.position.x + other.dimension.x
 
         overlap_x = min(s_dx_e, o_dx_e) > max(s_dx_s, o_dx_s)
 
-        s_dy_s = other.position.y - other.dimension.y
-        s_dy_e = other.position.y
+        s_dy_s = self.position.y
+        s_dy_e = self.position.y + self.dimension.y
 
-        o_dy_s = other.position.y - other.dimension.y
-        o_dy_e = other.position.y
+        o_dy_s = other.position.y
+        o_dy_e = other.position.y + other.dimension.y
 
         overlap_y = min(s_dy_e, o_dy_e) > max(s_dy_s, o_dy_s)
 
         return overlap_x and overlap_y
 
+    def __repr__(self) -> str:
+        return f"AABB2D({self.position}, {self.dimension})"
+
+
+def _ray_entry(ox: float, oy: float, dx: float, dy: float, box: Tuple[float, float, float, float], t_max: float):
+    """Distance along the ray where it enters the box, None if it misses"""
+    t0, t1 = 0.0, t_max
+    if dx == 0:
+        if ox < box[0] or ox > box[2]:
+            return None
+    else:
+        a, b = (box[0] - ox) / dx, (box[2] - ox) / dx
+        if a > b:
+            a, b = b, a
+        t0, t1 = max(t0, a), min(t1, b)
+    if dy == 0:
+        if oy < box[1] or oy > box[3]:
+            return None
+    else:
+        a, b = (box[1] - oy) / dy, (box[3] - oy) / dy
+        if a > b:
+            a, b = b, a
+        t0, t1 = max(t0, a), min(t1, b)
+    return t0 if t0 <= t1 else None
+
+
+def segment_aabb_toi(start: Vector2, end: Vector2, aabb: AABB2D) -> Optional[float]:
+    """Fraction of the segment where it enters the box, 0 if it starts inside, None if it misses"""
+    return _ray_entry(start.x, start.y, end.x - start.x, end.y - start.y, aabb.bounds, 1.0)
+
+
+def swept_aabb_toi(aabb: AABB2D, displacement: Vector2, other: AABB2D) -> Optional[float]:
+    """Fraction of the displacement after which the moving box first touches other
+
+    0 if they already overlap, None if they don't touch during the move.
+    Moves the min corner as a point against other grown by the moving box
+    """
+    x, y = aabb.position.x, aabb.position.y
+    w, h = aabb.dimension.x, aabb.dimension.y
+    grown = (other.position.x - w, other.position.y - h,
+             other.position.x + other.dimension.x, other.position.y + other.dimension.y)
+    return _ray_entry(x, y, displacement.x, displacement.y, grown, 1.0)
+
+
+def swept_circle_toi(center: Vector2, radius: float, displacement: Vector2,
+                     other_center: Vector2, other_radius: float) -> Optional[float]:
+    """Fraction of the displacement after which the moving circle first touches the other
+
+    0 if they already overlap, None if they don't touch during the move
+    """
+    mx = center.x - other_center.x
+    my = center.y - other_center.y
+    reach = radius + other_radius
+    c = mx * mx + my * my - reach * reach
+    if c <= 0:
+        return 0.0
+    a = displacement.x * displacement.x + displacement.y * displacement.y
+    b = mx * displacement.x + my * displacement.y
+    # Moving apart or standing still
+    if b >= 0 or a == 0:
+        return None
+    discriminant = b * b - a * c
+    if discriminant < 0:
+        return None
+    t = (-b - sqrt(discriminant)) / a
+    return t if t <= 1 else None
+
 
 def point_point_col(a: vector.Vector2, b: vector.Vector2) -> bool:
     return a == b
@@ -38,7 +120,7 @@ def point_point_col(a: vector.Vector2, b: vector.Vector2) -> bool:
 
 def point_circle_col(a: vector.Vector2, circle_pos: vector.Vector2, circle_radius: float) -> bool:
     delta = (a - circle_pos)
-    return delta.sqr_magnitude <= circle_radius
+    return delta.sqr_magnitude <= circle_radius * circle_radius
 
 
 def point_aabb_col(a: vector.Vector2, aabb: AABB2D) -> bool:
@@ -48,33 +130,20 @@ def point_aabb_col(a: vector.Vector2, aabb: AABB2D) -> bool:
 
 
 def point_poly_col(p: vector.Vector2, points: List[Vector2]) -> bool:
-    # Use even-odd rule
-    i = 0
-    j = len(points) - 1
-    collide = False
-    for index, value in enumerate(points):
-        pass
-    return collide
-
-
-def point_poly_col(p: vector.Vector2, points: List[Vector2]) -> bool:
+    # Use even-odd rule, casting a ray from the point towards +y
     last = points[-1]
     collision = False
     for current in points:
-        poly_dy = (last.y - current.y)
-        poly_dx = (last.x - current.x)
-        edge_slope = poly_dy/poly_dx
-
-        # Checks if the point is inside a 1D bounding box
-        # with the line on the x axis
-        inside_edge_x = min(current.x, last.x) <= p.x <= max(current.x, last.x)
-        if not inside_edge_x:
-            continue
+        # Checks if the point is inside a half open 1D bounding box
+        # with the line on the x axis, so shared vertices count once
+        # and vertical edges are skipped
+        if (current.x > p.x) != (last.x > p.x):
+            edge_slope = (last.y - current.y) / (last.x - current.x)
 
-        # Checks if the point is bellow the line
-        intersects = p.y <= current.y + edge_slope * (p.x - current.x)
-        if intersects:
-            collision = not collision
+            # Checks if the point is bellow the line
+            intersects = p.y <= current.y + edge_slope * (p.x - current.x)
+            if intersects:
+                collision = not collision
 
         last = current
 
@@ -86,4 +155,208 @@ def poly_to_aabb(points: List[Vector2]) -> AABB2D:
     bottom = min(p.y for p in points)
     top = max(p.y for p in points)
     right = max(p.x for p in points)
-    return AABB2D(Vector2(left, top), Vector2(right-left, top-bottom))
+    return AABB2D(Vector2(left, bottom), Vector2(right-left, top-bottom))
+
+
+# region Batched tests
+# Array versions of the tests above, for the candidate pairs of a broad phase.
+# Points, positions and dimensions are Vector2Array or (n, 2) arrays and every
+# test returns a boolean mask matching the scalar test element by element.
+
+
+def _columns(vectors) -> Tuple[np.ndarray, np.ndarray]:
+    if not isinstance(vectors, Vector2Array):
+        vectors = Vector2Array.from_array(vectors)
+    return vectors.x, vectors.y
+
+
+def aabb_aabb_col_array(positions_a, dimensions_a, positions_b, dimensions_b) -> np.ndarray:
+    """AABB2D.collide of every box of a with the box of b at the same index"""
+    ax, ay = _columns(positions_a)
+    aw, ah = _columns(dimensions_a)
+    bx, by = _columns(positions_b)
+    bw, bh = _columns(dimensions_b)
+    overlap_x = np.minimum(ax + aw, bx + bw) > np.maximum(ax, bx)
+    overlap_y = np.minimum(ay + ah, by + bh) > np.maximum(ay, by)
+    return overlap_x & overlap_y
+
+
+def point_circle_col_array(points, circle_positions, circle_radii) -> np.ndarray:
+    """point_circle_col of every point with the circle at the same index"""
+    px, py = _columns(points)
+    cx, cy = _columns(circle_positions)
+    dx = px - cx
+    dy = py - cy
+    radii = np.asarray(circle_radii, dtype=np.float64)
+    return dx * dx + dy * dy <= radii * radii
+
+
+def point_aabb_col_array(points, positions, dimensions) -> np.ndarray:
+    """point_aabb_col of every point with every box, shaped (points, boxes)"""
+    px, py = _columns(points)
+    bx, by = _columns(positions)
+    bw, bh = _columns(dimensions)
+    px, py = px[:, None], py[:, None]
+    return (bx <= px) & (px <= bx + bw) & (by <= py) & (py <= by + bh)
+
+
+def point_poly_col_array(points, polygon) -> np.ndarray:
+    """point_poly_col of every point with one polygon, one pass over the edges"""
+    px, py = _columns(points)
+    xs, ys = _columns(Vector2Array.from_vectors(polygon) if isinstance(polygon, list) else polygon)
+    inside = np.zeros(px.shape, dtype=bool)
+    last_x, last_y = xs[-1], ys[-1]
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        if x != last_x:
+            straddles = (x > px) != (last_x > px)
+            slope = (last_y - y) / (last_x - x)
+            inside ^= straddles & (py <= y + slope * (px - x))
+        last_x, last_y = x, y
+    return inside
+# endregion
+
+
+# region Batched time of impact
+# Times of impact of many pairs at once, inf where the pair doesn't touch
+
+
+def _ray_entry_array(ox, oy, dx, dy, x0, y0, x1, y1) -> np.ndarray:
+    t0 = np.zeros(np.broadcast(ox, dx, x0).shape)
+    t1 = np.ones_like(t0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for o, d, lo, hi in ((ox, dx, x0, x1), (oy, dy, y0, y1)):
+            a = (lo - o) / d
+            b = (hi - o) / d
+            # Parallel to the slab, inside it for any t or never
+            inside = (lo <= o) & (o <= hi)
+            t0 = np.maximum(t0, np.where(d == 0, np.where(inside, -inf, inf), np.minimum(a, b)))
+            t1 = np.minimum(t1, np.where(d == 0, np.where(inside, inf, -inf), np.maximum(a, b)))
+    return np.where(t0 <= t1, t0, inf)
+
+
+def segment_aabb_toi_array(starts, ends, positions, dimensions) -> np.ndarray:
+    """segment_aabb_toi of every segment with the box at the same index"""
+    sx, sy = _columns(starts)
+    ex, ey = _columns(ends)
+    bx, by = _columns(positions)
+    bw, bh = _columns(dimensions)
+    return _ray_entry_array(sx, sy, ex - sx, ey - sy, bx, by, bx + bw, by + bh)
+
+
+def swept_aabb_toi_array(positions, dimensions, displacements, other_positions, other_dimensions) -> np.ndarray:
+    """swept_aabb_toi of every moving box with the other box at the same index"""
+    x, y = _columns(positions)
+    w, h = _columns(dimensions)
+    dx, dy = _columns(displacements)
+    ox, oy = _columns(other_positions)
+    ow, oh = _columns(other_dimensions)
+    return _ray_entry_array(x, y, dx, dy, ox - w, oy - h, ox + ow, oy + oh)
+
+
+def swept_circle_toi_array(centers, radii, displacements, other_centers, other_radii) -> np.ndarray:
+    """swept_circle_toi of every moving circle with the other circle at the same index"""
+    cx, cy = _columns(centers)
+    dx, dy = _columns(displacements)
+    ox, oy = _columns(other_centers)
+    mx = cx - ox
+    my = cy - oy
+    reach = np.asarray(radii, dtype=np.float64) + np.asarray(other_radii, dtype=np.float64)
+    c = mx * mx + my * my - reach * reach
+    a = dx * dx + dy * dy
+    b = mx * dx + my * dy
+    discriminant = b * b - a * c
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (-b - np.sqrt(discriminant)) / a
+    hit = (b < 0) & (a != 0) & (discriminant >= 0) & (t <= 1)
+    return np.where(c <= 0, 0.0, np.where(hit, t, inf))
+# endregion
+
+
+# region Prepared polygons
+
+
+class PreparedPolygon:
+    """A static polygon indexed for many point_poly_col queries
+
+    The even-odd ray of point_poly_col goes towards +y, so only edges
+    spanning the x of the point can cross it. The vertex x coordinates cut
+    the polygon into vertical slabs that each list the edges spanning them,
+    a query finds its slab by bisection and only tests those edges.
+
+    Examples:
+        zone = PreparedPolygon(points)
+        zone.contains(Vector2(1, 2))
+        zone.contains_array(positions)  # Boolean mask
+    """
+
+    def __init__(self, points: List[Vector2]) -> None:
+        self.points = list(points)
+        self.aabb = poly_to_aabb(self.points)
+        self.bounds = self.aabb.bounds
+
+        # Non vertical edges as (x, y, slope) of their current vertex, like point_poly_col
+        self._edges: List[Tuple[float, float, float]] = []
+        spans = []
+        last = self.points[-1]
+        for current in self.points:
+            if current.x != last.x:
+                slope = (last.y - current.y) / (last.x - current.x)
+                self._edges.append((current.x, current.y, slope))
+                spans.append((min(current.x, last.x), max(current.x, last.x)))
+            last = current
+
+        # Slab i spans [xs[i], xs[i + 1]) and holds the edges covering it
+        self._xs = sorted({p.x for p in self.points})
+        self._slabs: List[List[Tuple[float, float, float]]] = [[] for _ in range(len(self._xs) - 1)]
+        for edge, (low, high) in zip(self._edges, spans):
+            for slab in range(bisect_left(self._xs, low), bisect_left(self._xs, high)):
+                self._slabs[slab].append(edge)
+        self._arrays = None
+
+    def contains(self, p: Vector2) -> bool:
+        """Same result as point_poly_col(p, points)"""
+        px, py = p.x, p.y
+        bounds = self.bounds
+        if not (bounds[0] <= px <= bounds[2] and bounds[1] <= py <= bounds[3]):
+            return False
+        slab = bisect_right(self._xs, px) - 1
+        if slab >= len(self._slabs):
+            return False
+        collision = False
+        for x, y, slope in self._slabs[slab]:
+            if py <= y + slope * (px - x):
+                collision = not collision
+        return collision
+
+    def _slab_arrays(self) -> Tuple[np.ndarray, ...]:
+        # The slabs flattened into one edge table with the range of each slab
+        if self._arrays is None:
+            counts = np.array([len(edges) for edges in self._slabs] + [0], dtype=np.intp)
+            starts = np.concatenate(([0], np.cumsum(counts[:-1])))
+            edges = np.array([edge for edges in self._slabs for edge in edges], dtype=np.float64).reshape(-1, 3)
+            self._arrays = (np.asarray(self._xs, dtype=np.float64), starts, counts, edges)
+        return self._arrays
+
+    def contains_array(self, points) -> np.ndarray:
+        """contains of every point, points being a Vector2Array or an (n, 2) array"""
+        px, py = _columns(points)
+        xs, starts, counts, edges = self._slab_arrays()
+        bounds = self.bounds
+        collision = np.zeros(px.shape, dtype=bool)
+        # Only the points inside the AABB reach the slabs
+        candidates = np.flatnonzero((bounds[0] <= px) & (px <= bounds[2]) & (bounds[1] <= py) & (py <= bounds[3]))
+        if not candidates.size:
+            return collision
+        px, py = px[candidates], py[candidates]
+        # Points on the last vertex land on the empty sentinel slab
+        slabs = np.searchsorted(xs, px, side="right") - 1
+        starts, counts = starts[slabs], counts[slabs]
+
+        inside = np.zeros(px.shape, dtype=bool)
+        for k in range(int(counts.max(initial=0))):
+            has_edge = counts > k
+            x, y, slope = edges[np.where(has_edge, starts + k, 0)].T
+            inside ^= has_edge & (py <= y + slope * (px - x))
+        collision[candidates] = inside
+        return collision
+# endregion
@@ -1,3 +1,14 @@
+from __future__ import annotations
+from bisect import bisect_right
+from typing import List, Sequence, Tuple, Union
+from .vector import Quaternion, QuaternionArray
+
+try:
+    import numpy as np
+except ImportError:  # Only the keyframe tracks need numpy
+    np = None
+
+
 def interp(a, b, t, d=1) -> float:
     return a + (b - a) * t**d
 
@@ -17,4 +28,157 @@ def delta_angle(a, b):
     delta = (b - a) % 360
     if delta > 180:
         delta -= 360
-    return delta
\ No newline at end of file
+    return delta
+
+
+# region Keyframe tracks
+
+
+class KeyframeTrack:
+    '''Values keyed at increasing times and sampled by linear interpolation
+
+    Sampling clamps to the first and last keys. The segment found by the
+    previous sample is checked first, then the one after it, so playing
+    forward costs O(1) and only jumps fall back to a binary search.
+
+    Examples:
+        track = KeyframeTrack([0, 0.5, 1], [[0, 0], [1, 2], [0, 0]])
+        track.sample(0.25)  # array([0.5, 1. ])
+    '''
+
+    def __init__(self, times: Sequence[float], values) -> None:
+        if np is None:
+            raise ImportError("Keyframe tracks require numpy")
+        self.times = np.asarray(times, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        if self.times.ndim != 1 or len(self.times) == 0 or len(self.values) != len(self.times):
+            raise ValueError("Expected at least one key and one value per key time")
+        if np.any(np.diff(self.times) < 0):
+            raise ValueError("Key times must be increasing")
+        # Plain floats keep the scalar search away from NumPy scalars
+        self.keys: List[float] = self.times.tolist()
+        self._last = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def duration(self) -> float:
+        return self.keys[-1] - self.keys[0]
+
+    def segment(self, time: float) -> int:
+        '''Returns the index of the key starting the segment that holds time'''
+        keys = self.keys
+        last = self._last
+        for index in (last, last + 1):
+            if index < len(keys) and keys[index] <= time and (index + 1 == len(keys) or time < keys[index + 1]):
+                self._last = index
+                return index
+        index = max(bisect_right(keys, time) - 1, 0)
+        self._last = index
+        return index
+
+    def sample(self, time: float):
+        '''Returns the value of the track at a time'''
+        index = self.segment(time)
+        keys = self.keys
+        if index + 1 == len(keys) or time <= keys[index]:
+            return self.key(index)
+        return self.interpolate(index, (time - keys[index]) / (keys[index + 1] - keys[index]))
+
+    def key(self, index: int):
+        return self.values[index]
+
+    def interpolate(self, index: int, t: float):
+        '''Blends the value of a key towards the next one'''
+        a = self.values[index]
+        return a + (self.values[index + 1] - a) * t
+
+    def blend(self, a: np.ndarray, b: np.ndarray, t: np.ndarray):
+        '''Blends rows of key values, one factor per row'''
+        return a + (b - a) * t.reshape(t.shape + (1,) * (a.ndim - 1))
+
+
+class QuaternionTrack(KeyframeTrack):
+    '''Rotations keyed as (x, y, z, w) rows and sampled by slerp, or nlerp when slerp is False'''
+
+    def __init__(self, times: Sequence[float], values, slerp: bool = True) -> None:
+        super().__init__(times, [(q.x, q.y, q.z, q.w) if isinstance(q, Quaternion) else q for q in values])
+        if self.values.ndim != 2 or self.values.shape[1] != 4:
+            raise ValueError("Expected quaternion keys")
+        self.slerp = slerp
+        self.rotations = [Quaternion(*row) for row in self.values.tolist()]
+
+    def key(self, index: int) -> Quaternion:
+        return self.rotations[index]
+
+    def interpolate(self, index: int, t: float) -> Quaternion:
+        a = self.rotations[index]
+        if self.slerp:
+            return a.slerp(self.rotations[index + 1], t)
+        return a.nlerp(self.rotations[index + 1], t)
+
+    def blend(self, a: np.ndarray, b: np.ndarray, t: np.ndarray) -> QuaternionArray:
+        a = QuaternionArray.from_array(a)
+        if self.slerp:
+            return a.slerp(QuaternionArray.from_array(b), t)
+        return a.nlerp(QuaternionArray.from_array(b), t)
+
+
+class TrackSet:
+    '''Samples many tracks of the same kind at once, such as the bones of a skeleton
+
+    The keys of every track are packed into one array with the tracks laid
+    end to end on a shifted time axis, a single searchsorted then finds the
+    segments of all the tracks. Segments of the previous sample are checked
+    first and only the tracks that left theirs are searched.
+    '''
+
+    def __init__(self, tracks: Sequence[KeyframeTrack]) -> None:
+        if len(tracks) == 0:
+            raise ValueError("Expected at least one track")
+        kinds = {(type(t), t.values.shape[1:], getattr(t, "slerp", None)) for t in tracks}
+        if len(kinds) != 1:
+            raise ValueError("Tracks must be of the same kind and value shape")
+        self.tracks = list(tracks)
+        counts = np.array([len(t) for t in tracks])
+        self.stops = np.cumsum(counts)
+        self.starts = self.stops - counts
+        self.times = np.concatenate([t.times for t in tracks])
+        self.values = np.concatenate([t.values for t in tracks])
+        self.first = self.times[self.starts]
+        self.last = self.times[self.stops - 1]
+
+        # Track i covers [i * span, i * span + duration] on the shifted axis
+        span = float(np.max(self.last - self.first)) + 1.0
+        self.offsets = np.arange(len(tracks)) * span - self.first
+        self.shifted = self.times + np.repeat(self.offsets, counts)
+        self._segments = self.starts.copy()
+
+    def __len__(self) -> int:
+        return len(self.tracks)
+
+    def segments(self, times) -> Tuple[np.ndarray, np.ndarray]:
+        '''Returns the key index starting the segment of every track and the clamped times'''
+        times = np.clip(np.broadcast_to(np.asarray(times, dtype=np.float64), self.first.shape), self.first, self.last)
+        segments = self._segments
+        following = np.minimum(segments + 1, self.stops - 1)
+        hit = (self.times[segments] <= times) & ((times < self.times[following]) | (following == segments))
+        if not hit.all():
+            missed = ~hit
+            found = np.searchsorted(self.shifted, times[missed] + self.offsets[missed], side="right") - 1
+            segments = segments.copy()
+            segments[missed] = np.clip(found, self.starts[missed], self.stops[missed] - 1)
+            self._segments = segments
+        return segments, times
+
+    def sample(self, times) -> Union[np.ndarray, QuaternionArray]:
+        '''Evaluates every track, times is one time for all tracks or one per track'''
+        segments, times = self.segments(times)
+        following = np.minimum(segments + 1, self.stops - 1)
+        start = self.times[segments]
+        length = self.times[following] - start
+        t = np.divide(times - start, length, out=np.zeros_like(times), where=length > 0)
+        return self.tracks[0].blend(self.values[segments], self.values[following], np.clip(t, 0.0, 1.0))
+
+# endregion
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from sutil.math.broadphase import DynamicAABBTree, SpatialHashGrid, SweepAndPrune, _overlaps, _ray_entry
+from sutil.math.collision2d import AABB2D, poly_to_aabb
+from sutil.math.vector import Vector2
+
+
+def random_box(rng, extent=100, size=6):
+    return AABB2D(Vector2(rng.uniform(0, extent), rng.uniform(0, extent)),
+                  Vector2(rng.uniform(0.5, size), rng.uniform(0.5, size)))
+
+
+def brute_pairs(boxes):
+    keys = list(boxes)
+    return {frozenset((a, b)) for i, a in enumerate(keys) for b in keys[i + 1:]
+            if _overlaps(boxes[a].bounds, boxes[b].bounds)}
+
+
+def test_aabb2d():
+    a = AABB2D(Vector2(0, 0), Vector2(2, 2))
+    assert a.collide(AABB2D(Vector2(1, 1), Vector2(2, 2)))
+    assert not a.collide(AABB2D(Vector2(1, 3), Vector2(2, 2)))
+    assert not a.collide(AABB2D(Vector2(3, 1), Vector2(2, 2)))
+    assert poly_to_aabb([Vector2(0, 1), Vector2(2, -1), Vector2(1, 3)]).bounds == (0, -1, 2, 3)
+
+
+def test_broad_phases_match_brute_force():
+    rng = random.Random(0)
+    for index in (SpatialHashGrid(8), DynamicAABBTree(margin=1), SweepAndPrune()):
+        boxes = {}
+        for key in range(300):
+            boxes[key] = random_box(rng)
+            index.insert(key, boxes[key])
+        for step in range(3):
+            for key in rng.sample(sorted(boxes), 100):
+                box = boxes[key]
+                boxes[key] = AABB2D(box.position + Vector2(rng.uniform(-3, 3), rng.uniform(-3, 3)), box.dimension)
+                index.update(key, boxes[key])
+            for key in rng.sample(sorted(boxes), 10):
+                index.remove(key)
+                del boxes[key]
+
+            found = [frozenset(pair) for pair in index.pairs()]
+            assert len(found) == len(set(found))
+            assert set(found) == brute_pairs(boxes)
+            assert {frozenset(pair) for pair in index.collisions()} == \
+                {pair for pair in brute_pairs(boxes) if boxes[min(pair)].collide(boxes[max(pair)])}
+
+        point = Vector2(50, 50)
+        assert sorted(index.query_point(point)) == sorted(
+            key for key, box in boxes.items() if _overlaps(box.bounds, (50, 50, 50, 50)))
+        region = AABB2D(Vector2(20, 30), Vector2(25, 10))
+        assert sorted(index.query_region(region)) == sorted(
+            key for key, box in boxes.items() if _overlaps(box.bounds, region.bounds))
+        for origin, direction in ((Vector2(-10, 37), Vector2(1, 0.2)), (Vector2(60, 120), Vector2(0, -1))):
+            hits = index.query_ray(origin, direction, 150)
+            expected = {key: _ray_entry(origin.x, origin.y, direction.x, direction.y, box.bounds, 150)
+                        for key, box in boxes.items()}
+            assert dict(hits) == {key: t for key, t in expected.items() if t is not None}
+            assert [t for _, t in hits] == sorted(t for _, t in hits)
+        if isinstance(index, DynamicAABBTree):
+            assert index.height < 20
+
+
+def test_sweep_and_prune_reports_changes():
+    rng = random.Random(1)
+    sap = SweepAndPrune()
+    boxes = {}
+    for key in range(200):
+        boxes[key] = random_box(rng, 60)
+        sap.insert(key, boxes[key])
+    added, removed = sap.step()
+    assert {frozenset(pair) for pair in added} == brute_pairs(boxes) and not removed
+
+    current = brute_pairs(boxes)
+    for frame in range(10):
+        for key in rng.sample(sorted(boxes), 30):
+            box = boxes[key]
+            boxes[key] = AABB2D(box.position + Vector2(rng.uniform(-2, 2), rng.uniform(-2, 2)), box.dimension)
+            sap.update(key, boxes[key])
+        if frame == 5:
+            sap.remove(7)
+            del boxes[7]
+            boxes[1000] = random_box(rng, 60, 20)
+            sap.insert(1000, boxes[1000])
+        added, removed = sap.step()
+        expected = brute_pairs(boxes)
+        assert {frozenset(pair) for pair in added} == expected - current
+        assert {frozenset(pair) for pair in removed} == current - expected
+        current = expected
+    assert sap.step() == ([], [])
+
+
+def test_update_of_unknown_key_leaves_index_unchanged():
+    for index in (SpatialHashGrid(8), DynamicAABBTree(), SweepAndPrune()):
+        index.insert(1, AABB2D(Vector2(0, 0), Vector2(2, 2)))
+        with pytest.raises(KeyError):
+            index.update(2, AABB2D(Vector2(1, 1), Vector2(2, 2)))
+        assert 2 not in index and len(index) == 1
+        assert list(index.pairs()) == []
+        assert index.update(1, AABB2D(Vector2(5, 5), Vector2(2, 2))) is None
+        assert index.query_point(Vector2(6, 6)) == [1]
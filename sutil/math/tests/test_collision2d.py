@@ -0,0 +1,107 @@
+from math import cos, pi, sin
+
+import numpy as np
+
+from sutil.math.collision2d import (AABB2D, PreparedPolygon, aabb_aabb_col_array, point_aabb_col, point_aabb_col_array,
+                                    point_circle_col, point_circle_col_array, point_poly_col,
+                                    point_poly_col_array, segment_aabb_toi, segment_aabb_toi_array,
+                                    swept_aabb_toi, swept_aabb_toi_array, swept_circle_toi,
+                                    swept_circle_toi_array)
+from sutil.math.vector import Vector2, Vector2Array
+
+
+def test_point_poly_col():
+    square = [Vector2(0, 0), Vector2(2, 0), Vector2(2, 2), Vector2(0, 2)]
+    assert point_poly_col(Vector2(1, 1), square)
+    assert not point_poly_col(Vector2(3, 1), square)
+    assert not point_poly_col(Vector2(1, 3), square)
+    # Concave, with the point lined up with a vertex
+    arrow = [Vector2(0, 0), Vector2(2, 1), Vector2(4, 0), Vector2(2, 4)]
+    assert point_poly_col(Vector2(2, 2), arrow)
+    assert not point_poly_col(Vector2(2, 0.5), arrow)
+
+
+def test_batched_tests_match_scalars():
+    rng = np.random.default_rng(0)
+    n = 500
+    points = Vector2Array(*rng.uniform(-1, 11, size=(2, n)))
+    positions = Vector2Array(*rng.uniform(0, 8, size=(2, n)))
+    dimensions = Vector2Array(*rng.uniform(0, 3, size=(2, n)))
+    others = Vector2Array(*rng.uniform(0, 8, size=(2, n)))
+    radii = rng.uniform(0, 3, n)
+    boxes = [AABB2D(positions[i], dimensions[i]) for i in range(n)]
+    other_boxes = [AABB2D(others[i], dimensions[n - 1 - i]) for i in range(n)]
+
+    assert aabb_aabb_col_array(positions, dimensions, others, dimensions[::-1]).tolist() == \
+        [a.collide(b) for a, b in zip(boxes, other_boxes)]
+    assert point_circle_col_array(points, others, radii).tolist() == \
+        [point_circle_col(points[i], others[i], radii[i]) for i in range(n)]
+    assert point_aabb_col_array(points, positions[:20], dimensions[:20].to_array()).tolist() == \
+        [[point_aabb_col(points[i], box) for box in boxes[:20]] for i in range(n)]
+
+    angles = np.sort(rng.uniform(0, 2 * pi, 40))
+    star = [Vector2(5 + (4 if i % 2 else 1.5) * cos(a), 5 + (4 if i % 2 else 1.5) * sin(a))
+            for i, a in enumerate(angles)]
+    star.append(Vector2(star[-1].x, star[0].y))
+    inside = point_poly_col_array(points.to_array(), star)
+    assert inside.tolist() == [point_poly_col(points[i], star) for i in range(n)]
+    assert inside.any() and not inside.all()
+
+
+def test_time_of_impact():
+    wall = AABB2D(Vector2(10, -5), Vector2(1, 10))
+    # A bullet moving 100 units per step would skip the wall with discrete tests
+    bullet = AABB2D(Vector2(0, 0), Vector2(0.5, 0.5))
+    assert not bullet.collide(wall) and not AABB2D(Vector2(100, 0), Vector2(0.5, 0.5)).collide(wall)
+    assert swept_aabb_toi(bullet, Vector2(100, 0), wall) == 9.5 / 100
+    assert swept_aabb_toi(bullet, Vector2(100, 200), wall) is None
+    assert swept_aabb_toi(bullet, Vector2(5, 0), wall) is None
+    assert segment_aabb_toi(Vector2(0, 0), Vector2(20, 0), wall) == 0.5
+    assert segment_aabb_toi(Vector2(10.5, 0), Vector2(20, 0), wall) == 0
+    assert swept_circle_toi(Vector2(0, 0), 1, Vector2(10, 0), Vector2(8, 0), 1) == 0.6
+    assert swept_circle_toi(Vector2(0, 0), 1, Vector2(-10, 0), Vector2(8, 0), 1) is None
+    assert swept_circle_toi(Vector2(0, 0), 1, Vector2(10, 0), Vector2(8, 3), 1) is None
+
+
+def test_batched_time_of_impact_matches_scalars():
+    rng = np.random.default_rng(1)
+    n = 500
+    positions = Vector2Array(*rng.uniform(0, 10, size=(2, n)))
+    dimensions = Vector2Array(*rng.uniform(0, 2, size=(2, n)))
+    moves = Vector2Array(*rng.uniform(-8, 8, size=(2, n)))
+    # Some axis aligned moves to cover the parallel slab case
+    moves.y[::7] = 0
+    others = Vector2Array(*rng.uniform(0, 10, size=(2, n)))
+    other_dimensions = Vector2Array(*rng.uniform(0, 3, size=(2, n)))
+    radii = rng.uniform(0, 1, n)
+
+    def scalar(t):
+        return np.inf if t is None else t
+
+    segments = segment_aabb_toi_array(positions, positions + moves, others, other_dimensions)
+    swept = swept_aabb_toi_array(positions, dimensions, moves, others, other_dimensions)
+    circles = swept_circle_toi_array(positions, radii, moves, others, radii[::-1])
+    for i in range(n):
+        box, other = AABB2D(positions[i], dimensions[i]), AABB2D(others[i], other_dimensions[i])
+        assert segments[i] == scalar(segment_aabb_toi(positions[i], positions[i] + moves[i], other))
+        assert swept[i] == scalar(swept_aabb_toi(box, moves[i], other))
+        assert circles[i] == scalar(swept_circle_toi(positions[i], radii[i], moves[i], others[i], radii[n - 1 - i]))
+    assert np.isfinite(swept).any() and not np.isfinite(swept).all()
+
+
+def test_prepared_polygon_matches_point_poly_col():
+    rng = np.random.default_rng(3)
+    angles = np.sort(rng.uniform(0, 2 * pi, 60))
+    radii = rng.uniform(1, 5, 60)
+    polygon = [Vector2(float(r * cos(a)), float(r * sin(a))) for r, a in zip(radii, angles)]
+    # A vertical edge and a vertex shared by the points below
+    polygon += [Vector2(polygon[-1].x, 0.0), Vector2(1.0, 0.0)]
+    prepared = PreparedPolygon(polygon)
+
+    points = Vector2Array(*rng.uniform(-6, 6, size=(2, 2000)))
+    points.x[:50] = 1.0
+    expected = [point_poly_col(p, polygon) for p in points]
+    assert [prepared.contains(p) for p in points] == expected
+    assert prepared.contains_array(points).tolist() == expected
+    assert prepared.contains_array(points.to_array()).tolist() == expected
+    assert any(expected) and not all(expected)
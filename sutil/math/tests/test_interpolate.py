@@ -0,0 +1,41 @@
+import numpy as np
+
+from sutil.math.interpolate import KeyframeTrack, QuaternionTrack, TrackSet, lerp_angle
+from sutil.math.vector import Quaternion
+
+
+def test_lerp_angle():
+    assert lerp_angle(350, 10, 0.5) == 360
+
+
+def test_keyframe_track_sampling():
+    track = KeyframeTrack([0, 1, 3], [[0, 0], [2, 4], [4, 0]])
+    assert track.sample(0.5).tolist() == [1, 2]
+    assert track.sample(2).tolist() == [3, 2]
+    assert track.sample(-1).tolist() == [0, 0] and track.sample(5).tolist() == [4, 0]
+    # Forward playback stays on the cached segments
+    assert [track.segment(t) for t in (0, 0.5, 1, 2.5, 3)] == [0, 0, 1, 1, 2]
+    assert track.sample(0.25).tolist() == [0.5, 1]
+
+
+def test_track_set_matches_tracks():
+    rng = np.random.default_rng(2)
+    tracks = []
+    for i in range(30):
+        times = np.sort(rng.random(1 + i % 5) * 4)
+        rotations = rng.normal(size=(len(times), 4))
+        tracks.append(QuaternionTrack(times, rotations / np.linalg.norm(rotations, axis=1, keepdims=True),
+                                      slerp=i % 2 == 0))
+    for kind in (tracks[::2], tracks[1::2]):
+        rotations = TrackSet(kind)
+        for time in (-1, 0.3, 0.31, 2, 1, 3.9, 10):
+            times = np.full(len(kind), time) + np.linspace(0, 0.2, len(kind))
+            batch = rotations.sample(times)
+            for i, track in enumerate(kind):
+                q = track.sample(times[i])
+                assert all(abs(getattr(q, f) - getattr(batch[i], f)) < 1e-9 for f in "xyzw")
+
+    curves = TrackSet([KeyframeTrack([0, 1], [0, 10]), KeyframeTrack([1, 2, 4], [0, 1, 5])])
+    assert curves.sample(1.5).tolist() == [10, 0.5]
+    assert curves.sample([0.5, 3]).tolist() == [5, 3]
+    assert QuaternionTrack([0], [Quaternion()]).sample(1) == Quaternion()
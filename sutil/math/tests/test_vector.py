@@ -0,0 +1,108 @@
+import numpy as np
+
+from sutil.math.vector import Quaternion, QuaternionArray, Vector2, Vector2Array, Vector3, Vector3Array
+
+
+def approx_vector(a, b, tolerance=1e-9):
+    return all(abs(getattr(a, f) - getattr(b, f)) < tolerance for f in ("x", "y", "z", "w") if hasattr(a, f))
+
+
+def test_vector_arrays_match_scalars():
+    rng = np.random.default_rng(0)
+    a = Vector3Array(*rng.normal(size=(3, 50)))
+    b = Vector3Array(*rng.normal(size=(3, 50)))
+    for i in range(50):
+        sa, sb = a[i], b[i]
+        assert isinstance(sa, Vector3)
+        assert approx_vector((a + b)[i], sa + sb)
+        assert approx_vector((a - b)[i], sa - sb)
+        assert approx_vector(a.cross(b)[i], sa.cross(sb))
+        assert approx_vector(a.lerp(b, 0.3)[i], sa.lerp(sb, 0.3))
+        assert approx_vector(a.move_towards(b, 0.5)[i], sa.move_towards(sb, 0.5))
+        assert approx_vector(a.move_towards(b, 10)[i], sb)
+        assert approx_vector(a.clamp_magnitude(1)[i], sa.clamp_magnitude(1))
+        assert abs(a.dot(b)[i] - sa.dot(sb)) < 1e-9
+
+    p = Vector2Array([3, 0], [4, 0])
+    assert list(p.magnitude) == [5, 0]
+    assert list(p.normalized()) == [Vector2(0.6, 0.8), Vector2(0, 0)]
+    assert list(p * 2) == list(2 * p) == [Vector2(6, 8), Vector2(0, 0)]
+    assert list(p / Vector2(3, 2)) == [Vector2(1, 2), Vector2(0, 0)]
+    assert list(a.xy[:2]) == [Vector2(v.x, v.y) for v in list(a)[:2]]
+
+
+def test_vector_arrays_share_buffers():
+    soa = np.arange(6, dtype=np.float64)
+    p = Vector2Array.from_buffer(soa)
+    assert list(p) == [Vector2(0, 3), Vector2(1, 4), Vector2(2, 5)]
+    p += Vector2(1, 1)
+    assert list(soa) == [1, 2, 3, 4, 5, 6]
+
+    interleaved = np.zeros((3, 2))
+    q = Vector2Array.from_array(interleaved)
+    q[1] = Vector2(7, 8)
+    q *= 2
+    assert interleaved.tolist() == [[0, 0], [14, 16], [0, 0]]
+    assert Vector2Array.from_buffer(interleaved.tobytes(), interleaved=True)[1] == Vector2(14, 16)
+
+    xs = np.ones(4)
+    r = Vector2Array(xs, np.zeros(4))
+    assert r.x is xs
+    r[r.x > 0] = r[r.x > 0] * 3
+    assert list(xs) == [3, 3, 3, 3]
+    assert Vector3Array.from_vectors([Vector3(1, 2, 3)]).to_array().tolist() == [[1, 2, 3]]
+
+
+def test_scalar_operators():
+    a = Vector2(3, 4)
+    assert a.normalized() == Vector2(0.6, 0.8)
+    assert a / 2 == Vector2(1.5, 2) and a / Vector2(3, 2) == Vector2(1, 2)
+    assert 2 * a == a * 2 == Vector2(6, 8)
+    assert Vector3(1, 2, 2).clamp_magnitude(1.5) == Vector3(0.5, 1, 1)
+    assert a != (3, 4)
+
+    b = a
+    b += Vector2(1, 1)
+    b *= 2
+    assert a is b and a == Vector2(8, 10)
+    a[1] = 0
+    assert a == Vector2(8, 0)
+
+    c = Vector3(1, 0, 0)
+    c /= 2
+    assert c == Vector3(0.5, 0, 0) and not hasattr(c, "__dict__")
+    assert list((Vector2(1, 1) - Vector2Array([1, 2], [3, 4])).x) == [0, -1]
+
+
+def test_quaternion_rotation():
+    half = 0.5 ** 0.5
+    quarter_turn = Quaternion(0, 0, half, half)
+    assert approx_vector(quarter_turn * Vector3(1, 0, 0), Vector3(0, 1, 0))
+    half_turn = quarter_turn * quarter_turn
+    assert approx_vector(half_turn * Vector3(1, 0, 0), Vector3(-1, 0, 0))
+    assert Quaternion(0, 0, 0, 2).normalized() == Quaternion.identity()
+    assert abs(half_turn.dot(half_turn) - 1) < 1e-9
+
+
+def test_quaternion_arrays_match_scalars():
+    rng = np.random.default_rng(1)
+    q = QuaternionArray(*rng.normal(size=(4, 20))).normalized()
+    r = QuaternionArray(*rng.normal(size=(4, 20)))
+    points = Vector3Array(*rng.normal(size=(3, 20)))
+    one = q[0]
+
+    composed, rotated, spun = q * r, q * points, one * points
+    left, euler, normalized = one * r, r.to_euler_angles(), r.normalized()
+    for i in range(20):
+        assert approx_vector(composed[i], q[i] * r[i])
+        assert approx_vector(left[i], one * r[i])
+        assert approx_vector(rotated[i], q[i] * points[i])
+        assert approx_vector(spun[i], one * points[i])
+        assert approx_vector(euler[i], r[i].to_euler_angles())
+        assert approx_vector(normalized[i], r[i].normalized())
+
+    before = q.copy()
+    q *= QuaternionArray.identity(20)
+    assert approx_vector(q[3], before[3])
+    assert QuaternionArray([0], [0], [0], [0]).normalized()[0] == Quaternion.identity()
+    assert q.rotation_matrices().shape == (20, 3, 3)
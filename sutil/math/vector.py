@@ -2,89 +2,75 @@
 '''
 
 from __future__ import annotations
-from math import sqrt, pow
+from math import acos, asin, atan2, sin, sqrt
+from numbers import Real
 import sys
-from functools import singledispatchmethod
-from typing import SupportsFloat
-import mathf
-
-# region Vector 2
+from typing import Iterable, Iterator, List, SupportsFloat, Tuple, Union
+from .core import clamp, RAD2DEG
 
+try:
+    import numpy as np
+except ImportError:  # Only the vector arrays need numpy
+    np = None
 
-class Vector2:
+# Checked before the slower Real ABC on the operator fast paths
+_SCALARS = (int, float)
 
-    def __init__(self, x: SupportsFloat = 0, y: SupportsFloat = 0) -> None:
-        self._x = x
-        self._y = y
+# region Vector 2
 
-    @property
-    def x(self):
-        return self._x
 
-    @x.setter
-    def x(self, value):
-        self._x = value
+class Vector2:
 
-    @property
-    def y(self):
-        return self._y
+    __slots__ = ("x", "y")
 
-    @y.setter
-    def y(self, value) -> float:
-        self._y = value
+    def __init__(self, x: SupportsFloat = 0, y: SupportsFloat = 0) -> None:
+        self.x = x
+        self.y = y
 
     @property
     def xy(self) -> Vector2:
-        return self.clone()
+        return Vector2(self.x, self.y)
 
     @property
     def sqr_magnitude(self) -> float:
-        return pow(self.x, 2) + pow(self.y, 2)
+        return self.x * self.x + self.y * self.y
 
     @property
     def magnitude(self) -> float:
-        return sqrt(self.sqr_magnitude)
+        return sqrt(self.x * self.x + self.y * self.y)
 
     def normalized(self) -> Vector2:
-        if(self.magnitude > sys.float_info.epsilon):
-            return self/self.magnitude
-        else:
-            return Vector2()
+        mag = sqrt(self.x * self.x + self.y * self.y)
+        if mag > sys.float_info.epsilon:
+            return Vector2(self.x / mag, self.y / mag)
+        return Vector2()
 
     def clamp_magnitude(self, max_lenght: SupportsFloat) -> Vector2:
-        if self.sqr_magnitude > pow(max_lenght, 2):
-            mag = self.sqr_magnitude
-            norm_x = self.x / mag
-            norm_y = self.y / mag
-            return Vector2(
-                norm_x * max_lenght,
-                norm_y * max_lenght
-            )
-        else:
-            return self.clone()
+        sqr_mag = self.x * self.x + self.y * self.y
+        if sqr_mag > max_lenght * max_lenght:
+            scale = max_lenght / sqrt(sqr_mag)
+            return Vector2(self.x * scale, self.y * scale)
+        return Vector2(self.x, self.y)
 
     def clone(self) -> Vector2:
         return Vector2(self.x, self.y)
 
     def lerp(self, other: Vector2, t: SupportsFloat):
         return Vector2(
-            x=self.x + (other.x - self.x) * t,
-            y=self.y + (other.y - self.y) * t
+            self.x + (other.x - self.x) * t,
+            self.y + (other.y - self.y) * t
         )
 
     def move_towards(self, target: Vector2, max_distance_delta: SupportsFloat) -> Vector2:
         dx = target.x - self.x
         dy = target.y - self.y
 
-        sqr_distance = pow(dx, 2) + pow(dy, 2)
+        sqr_distance = dx * dx + dy * dy
         if (sqr_distance == 0 or (max_distance_delta >= 0 and sqr_distance <= max_distance_delta**2)):
-            return target
+            return Vector2(target.x, target.y)
 
-        distance_to_move = sqrt(sqr_distance)
-        return Vector2(
-            x=self.x + dx / distance_to_move * max_distance_delta,
-            y=self.y + dy / distance_to_move * max_distance_delta
-        )
+        scale = max_distance_delta / sqrt(sqr_distance)
+        return Vector2(self.x + dx * scale, self.y + dy * scale)
 
     def dot(self, other: Vector2) -> float:
         return self.x * other.x + self.y * other.y
@@ -96,25 +82,75 @@ class Vector2:
         return "Vector2({}, {})".format(self.x, self.y)
 
     def __hash__(self) -> int:
-        return (hash(self.x) ^ hash(self.y) << 2)
+        return hash((self.x, self.y))
 
     def __eq__(self, other: Vector2) -> bool:
+        if not isinstance(other, Vector2):
+            return NotImplemented
         return self.x == other.x and self.y == other.y
 
     def __add__(self, other: Vector2) -> Vector2:
-        return Vector2(self.x + other.x, self.y + other.y)
+        if isinstance(other, Vector2):
+            return Vector2(self.x + other.x, self.y + other.y)
+        return NotImplemented
 
     def __sub__(self, other: Vector2) -> Vector2:
-        return Vector2(self.x - other.x, self.y - other.y)
+        if isinstance(other, Vector2):
+            return Vector2(self.x - other.x, self.y - other.y)
+        return NotImplemented
 
-    @singledispatchmethod
-    def __mul__(self, other):
+    def __mul__(self, other) -> Vector2:
+        if isinstance(other, Vector2):
+            return Vector2(self.x * other.x, self.y * other.y)
+        if isinstance(other, _SCALARS) or isinstance(other, Real):
+            return Vector2(self.x * other, self.y * other)
         return NotImplemented
 
-    @singledispatchmethod
-    def __div__(self, other: Vector2) -> Vector2:
+    __rmul__ = __mul__
+
+    def __truediv__(self, other) -> Vector2:
+        if isinstance(other, Vector2):
+            return Vector2(self.x / other.x, self.y / other.y)
+        if isinstance(other, _SCALARS) or isinstance(other, Real):
+            return Vector2(self.x / other, self.y / other)
         return NotImplemented
 
+    def __iadd__(self, other: Vector2) -> Vector2:
+        if not isinstance(other, Vector2):
+            return NotImplemented
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def __isub__(self, other: Vector2) -> Vector2:
+        if not isinstance(other, Vector2):
+            return NotImplemented
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def __imul__(self, other) -> Vector2:
+        if isinstance(other, Vector2):
+            self.x *= other.x
+            self.y *= other.y
+        elif isinstance(other, _SCALARS) or isinstance(other, Real):
+            self.x *= other
+            self.y *= other
+        else:
+            return NotImplemented
+        return self
+
+    def __itruediv__(self, other) -> Vector2:
+        if isinstance(other, Vector2):
+            self.x /= other.x
+            self.y /= other.y
+        elif isinstance(other, _SCALARS) or isinstance(other, Real):
+            self.x /= other
+            self.y /= other
+        else:
+            return NotImplemented
+        return self
+
     def __neg__(self) -> Vector2:
         return Vector2(-self.x, -self.y)
 
@@ -130,27 +166,8 @@ class Vector2:
             self.x = value
         elif key == 1:
             self.y = value
-        raise IndexError()
-
-
-@Vector2.__div__.register
-def _(self, other: Vector2):
-    return Vector2(self.x / other.x, self.y / other.y)
-
-
-@Vector2.__div__.register
-def _(self, other: SupportsFloat):
-    return Vector2(self.x / other, self.y / other)
-
-
-@Vector2.__mul__.register
-def _(self, other: Vector2):
-    return Vector2(self.x * other.x, self.y * other.y)
-
-
-@Vector2.__mul__.register
-def _(self, other: SupportsFloat):
-    return Vector2(self.x * other, self.y * other)
+        else:
+            raise IndexError()
 
 # endregion
 
@@ -159,34 +176,12 @@ def _(self, other: SupportsFloat):
 
 class Vector3:
 
-    def __init__(self, x: SupportsFloat = 0, y: SupportsFloat = 0, z: SupportsFloat = 0) -> None:
-        self._x = x
-        self._y = y
-        self._z = z
-
-    @property
-    def x(self):
-        return self._x
-
-    @x.setter
-    def x(self, value):
-        self._x = value
-
-    @property
-    def y(self):
-        return self._y
-
-    @y.setter
-    def y(self, value):
-        self._y = value
+    __slots__ = ("x", "y", "z")
 
-    @property
-    def z(self):
-        return self._z
-
-    @z.setter
-    def z(self, value):
-        self._z = value
+    def __init__(self, x: SupportsFloat = 0, y: SupportsFloat = 0, z: SupportsFloat = 0) -> None:
+        self.x = x
+        self.y = y
+        self.z = z
 
     @property
     def xy(self) -> Vector2:
@@ -202,42 +197,37 @@ class Vector3:
 
     @property
     def xyz(self) -> Vector3:
-        return self.clone()
+        return Vector3(self.x, self.y, self.z)
 
+    @property
     def sqr_magnitude(self) -> float:
-        return pow(self.x, 2) + pow(self.y, 2) + pow(self.z, 2)
+        return self.x * self.x + self.y * self.y + self.z * self.z
 
+    @property
     def magnitude(self) -> float:
-        return sqrt(self.sqr_magnitude)
+        return sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
 
-    def normalized(self) -> None:
-        if(self.magnitude > sys.float_info.epsilon):
-            return self/self.magnitude
-        else:
-            return Vector3()
+    def normalized(self) -> Vector3:
+        mag = sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+        if mag > sys.float_info.epsilon:
+            return Vector3(self.x / mag, self.y / mag, self.z / mag)
+        return Vector3()
 
     def clamp_magnitude(self, max_lenght: SupportsFloat) -> Vector3:
-        if self.sqr_magnitude > pow(max_lenght, 2):
-            mag = self.sqr_magnitude
-            norm_x = self.x / mag
-            norm_y = self.y / mag
-            norm_z = self.z / mag
-            return Vector3(
-                norm_x * max_lenght,
-                norm_y * max_lenght,
-                norm_z * max_lenght
-            )
-        else:
-            return self.clone()
+        sqr_mag = self.x * self.x + self.y * self.y + self.z * self.z
+        if sqr_mag > max_lenght * max_lenght:
+            scale = max_lenght / sqrt(sqr_mag)
+            return Vector3(self.x * scale, self.y * scale, self.z * scale)
+        return Vector3(self.x, self.y, self.z)
 
     def clone(self) -> Vector3:
         return Vector3(self.x, self.y, self.z)
 
     def lerp(self, other: Vector3, t: SupportsFloat):
         return Vector3(
-            x=self.x + (other.x - self.x) * t,
-            y=self.y + (other.y - self.y) * t,
-            z=self.z + (other.z - self.z) * t
+            self.x + (other.x - self.x) * t,
+            self.y + (other.y - self.y) * t,
+            self.z + (other.z - self.z) * t
         )
 
     def move_towards(self, target: Vector3, max_distance_delta: SupportsFloat) -> Vector3:
@@ -245,25 +235,21 @@ class Vector3:
         dy = target.y - self.y
         dz = target.z - self.z
 
-        sqr_distance = pow(dx, 2) + pow(dy, 2) + pow(dz, 2)
+        sqr_distance = dx * dx + dy * dy + dz * dz
         if (sqr_distance == 0 or (max_distance_delta >= 0 and sqr_distance <= max_distance_delta**2)):
-            return target
+            return Vector3(target.x, target.y, target.z)
 
-        distance_to_move = sqrt(sqr_distance)
-        return Vector3(
-            x=self.x + dx / distance_to_move * max_distance_delta,
-            y=self.y + dy / distance_to_move * max_distance_delta,
-            z=self.z + dz / distance_to_move * max_distance_delta
-        )
+        scale = max_distance_delta / sqrt(sqr_distance)
+        return Vector3(self.x + dx * scale, self.y + dy * scale, self.z + dz * scale)
 
     def dot(self, other: Vector3) -> float:
         return self.x * other.x + self.y * other.y + self.z * other.z
 
     def cross(self, other):
         return Vector3(
-            x=self.y * other.z - self.z * other.y,
-            y=self.z * other.x - self.x * other.z,
-            z=self.x * other.y - self.y * other.x
+            self.y * other.z - self.z * other.y,
+            self.z * other.x - self.x * other.z,
+            self.x * other.y - self.y * other.x
         )
 
     def __str__(self):
@@ -273,25 +259,81 @@ class Vector3:
         return "Vector3({}, {}, {})".format(self.x, self.y, self.z)
 
     def __hash__(self) -> int:
-        return (self.x) ^ (hash(self.y) << 2) ^ (hash(self.z) >> 2)
+        return hash((self.x, self.y, self.z))
 
     def __eq__(self, other: Vector3) -> bool:
+        if not isinstance(other, Vector3):
+            return NotImplemented
         return self.x == other.x and self.y == other.y and self.z == other.z
 
     def __add__(self, other: Vector3) -> Vector3:
-        return Vector3(self.x + other.x, self.y + other.y, self.z + other.z)
+        if isinstance(other, Vector3):
+            return Vector3(self.x + other.x, self.y + other.y, self.z + other.z)
+        return NotImplemented
 
     def __sub__(self, other: Vector3) -> Vector3:
-        return Vector3(self.x - other.x, self.y - other.y, self.z - other.z)
+        if isinstance(other, Vector3):
+            return Vector3(self.x - other.x, self.y - other.y, self.z - other.z)
+        return NotImplemented
 
-    @ singledispatchmethod
-    def __mul__(self, other):
+    def __mul__(self, other) -> Vector3:
+        if isinstance(other, Vector3):
+            return Vector3(self.x * other.x, self.y * other.y, self.z * other.z)
+        if isinstance(other, _SCALARS) or isinstance(other, Real):
+            return Vector3(self.x * other, self.y * other, self.z * other)
         return NotImplemented
 
-    @ singledispatchmethod
-    def __div__(self, other: Vector3) -> Vector3:
+    __rmul__ = __mul__
+
+    def __truediv__(self, other) -> Vector3:
+        if isinstance(other, Vector3):
+            return Vector3(self.x / other.x, self.y / other.y, self.z / other.z)
+        if isinstance(other, _SCALARS) or isinstance(other, Real):
+            return Vector3(self.x / other, self.y / other, self.z / other)
         return NotImplemented
 
+    def __iadd__(self, other: Vector3) -> Vector3:
+        if not isinstance(other, Vector3):
+            return NotImplemented
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return self
+
+    def __isub__(self, other: Vector3) -> Vector3:
+        if not isinstance(other, Vector3):
+            return NotImplemented
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        return self
+
+    def __imul__(self, other) -> Vector3:
+        if isinstance(other, Vector3):
+            self.x *= other.x
+            self.y *= other.y
+            self.z *= other.z
+        elif isinstance(other, _SCALARS) or isinstance(other, Real):
+            self.x *= other
+            self.y *= other
+            self.z *= other
+        else:
+            return NotImplemented
+        return self
+
+    def __itruediv__(self, other) -> Vector3:
+        if isinstance(other, Vector3):
+            self.x /= other.x
+            self.y /= other.y
+            self.z /= other.z
+        elif isinstance(other, _SCALARS) or isinstance(other, Real):
+            self.x /= other
+            self.y /= other
+            self.z /= other
+        else:
+            return NotImplemented
+        return self
+
     def __neg__(self) -> Vector3:
         return Vector3(-self.x, -self.y, -self.z)
 
@@ -311,123 +353,123 @@ class Vector3:
             self.y = value
         elif key == 2:
             self.z = value
-        raise IndexError()
-
-
-@ Vector3.__div__.register
-def _(self, other: Vector3):
-    return Vector3(self.x / other.x, self.y / other.y, self.z / other.z)
-
-
-@ Vector3.__div__.register
-def _(self, other: SupportsFloat):
-    return Vector3(self.x / other, self.y / other, self.z / other)
-
-
-@ Vector3.__mul__.register
-def _(self, other: Vector3):
-    return Vector3(self.x * other.x, self.y * other.y, self.z * other.z)
-
-
-@ Vector3.__mul__.register
-def _(self, other: SupportsFloat):
-    return Vector3(self.x * other, self.y * other, self.z * other)
+        else:
+            raise IndexError()
 
 # endregion
 
 # region Quaternion
 
+# The quaternion kernels only use arithmetic, they run on floats for
+# Quaternion and on NumPy arrays for QuaternionArray alike
 
-class Quaternion():
-
-    def __init__(self, x=0, y=0, z=0, w=1) -> None:
-        self._x = x
-        self._y = y
-        self._z = z
-        self._w = w
-
-    @property
-    def x(self) -> float:
-        return self._x
-
-    @x.setter
-    def x(self, value):
-        self._x = value
 
-    @property
-    def y(self) -> float:
-        return self._y
-
-    @y.setter
-    def y(self, value):
-        self._y = value
+def _combine(sx, sy, sz, sw, ox, oy, oz, ow) -> tuple:
+    # No one knows how this witchcraft works
+    # It works
+    #       - Todd Howard
+    return (sw * ox + sx * ow + sy * oz - sz * oy,
+            sw * oy + sy * ow + sz * ox - sx * oz,
+            sw * oz + sz * ow + sx * oy - sy * ox,
+            sw * ow - sx * ox - sy * oy - sz * oz)
+
+
+def _rotation_matrix(qx, qy, qz, qw) -> tuple:
+    x = qx * 2.0
+    y = qy * 2.0
+    z = qz * 2.0
+    xx = qx * x
+    yy = qy * y
+    zz = qz * z
+    xy = qx * y
+    xz = qx * z
+    yz = qy * z
+    wx = qw * x
+    wy = qw * y
+    wz = qw * z
+    return ((1.0 - (yy + zz), xy - wz, xz + wy),
+            (xy + wz, 1.0 - (xx + zz), yz - wx),
+            (xz - wy, yz + wx, 1.0 - (xx + yy)))
+
+
+def _transform(matrix: tuple, px, py, pz) -> tuple:
+    (m00, m01, m02), (m10, m11, m12), (m20, m21, m22) = matrix
+    return (m00 * px + m01 * py + m02 * pz,
+            m10 * px + m11 * py + m12 * pz,
+            m20 * px + m21 * py + m22 * pz)
+
+
+def _euler_angles(x, y, z, w, atan2, asin, clamp) -> tuple:
+    # Roll
+    sinr_cosp = 2 * (w * x + y * z)
+    cosr_cosp = 1 - 2 * (x * x + y * y)
+    roll = atan2(sinr_cosp, cosr_cosp)
+
+    # Pitch
+    sinp = 2 * (w * y - z * x)
+    pitch = asin(clamp(sinp, -1, 1))
+
+    # Yaw
+    siny_cosp = 2 * (w * z + x * y)
+    cosy_cosp = 1 - 2 * (y * y + z * z)
+    yaw = atan2(siny_cosp, cosy_cosp)
+    return yaw, pitch, roll
+
+
+# Angles below the flip are wrapped up and above it wrapped down
+_NEGATIVE_FLIP = -sys.float_info.epsilon * RAD2DEG
+_POSITIVE_FLIP = 360.0 + _NEGATIVE_FLIP
+
+# Above this cosine the angle is too small for slerp, nlerp is used instead
+_SLERP_THRESHOLD = 0.9995
 
-    @property
-    def z(self) -> float:
-        return self._z
 
-    @z.setter
-    def z(self, value):
-        self._z = value
+class Quaternion():
 
-    @property
-    def w(self) -> float:
-        return self._w
+    __slots__ = ("x", "y", "z", "w")
 
-    @w.setter
-    def w(self, value):
-        self._w = value
+    def __init__(self, x=0, y=0, z=0, w=1) -> None:
+        self.x = x
+        self.y = y
+        self.z = z
+        self.w = w
 
     @classmethod
-    def identity():
-        return Quaternion()
+    def identity(cls) -> Quaternion:
+        return cls()
 
     def __getitem__(self, key: int) -> float:
         if key == 0:
-            return self._x
+            return self.x
         elif key == 1:
-            return self._y
+            return self.y
         elif key == 2:
-            return self._z
+            return self.z
         elif key == 3:
-            return self._w
+            return self.w
         raise IndexError()
 
     def __setitem__(self, key: int, value: int) -> None:
         if key == 0:
-            self._x = value
+            self.x = value
         elif key == 1:
-            self._y = value
-        elif key == 2:
-            self._z = value
+            self.y = value
         elif key == 2:
-            self._w = value
-        raise IndexError()
+            self.z = value
+        elif key == 3:
+            self.w = value
+        else:
+            raise IndexError()
 
-    def dot(self, other: Vector2) -> float:
-        return self.x * other.x + self.y * other.y + self.w * other.w
+    def dot(self, other: Quaternion) -> float:
+        return self.x * other.x + self.y * other.y + self.z * other.z + self.w * other.w
 
     def to_euler_angles(self) -> Vector3:
         '''Converts a quaternions to yaw, pitch and roll'''
+        euler = Vector3(*_euler_angles(self.x, self.y, self.z, self.w, atan2, asin, clamp))
 
-        # Roll
-        sinr_cosp = 2 * (self.w * self.x + self.y * self.z)
-        cosr_cosp = 1 - 2 * (self.x * self.x + self.y * self.y)
-        roll = mathf.atan2(sinr_cosp, cosr_cosp)
-
-        # Pitch
-        sinp = 2 * (self.w * self.y - self.z * self.x)
-        pitch = mathf.asin(mathf.clamp(sinp, -1, 1))
-
-        # Yaw
-        siny_cosp = 2 * (self.w * self.z + self.x * self.y)
-        cosy_cosp = 1 - 2 * (self.y * self.y + self.z * self.z)
-        yaw = mathf.atan2(siny_cosp, cosy_cosp)
-
-        euler = Vector3(yaw, pitch, roll)
-
-        negative_flip = -sys.float_info.epsilon * mathf.RAD2DEG
-        positive_flip = 360.0 + negative_flip
+        negative_flip = _NEGATIVE_FLIP
+        positive_flip = _POSITIVE_FLIP
 
         if euler.x < negative_flip:
             euler.x += 360.0
@@ -447,54 +489,406 @@ class Quaternion():
         return euler
 
     def normalized(self) -> Quaternion:
-        mag = mathf.sqrt(self.dot(self))
+        mag = sqrt(self.x * self.x + self.y * self.y + self.z * self.z + self.w * self.w)
         if mag < sys.float_info.epsilon:
-            return Quaternion.identity
+            return Quaternion()
         return Quaternion(self.x / mag, self.y / mag, self.z / mag, self.w / mag)
 
-    @singledispatchmethod
+    def nlerp(self, other: Quaternion, t: SupportsFloat) -> Quaternion:
+        '''Normalized linear interpolation along the shortest arc'''
+        s = 1 - t
+        if self.dot(other) < 0:
+            t = -t
+        return Quaternion(self.x * s + other.x * t, self.y * s + other.y * t,
+                          self.z * s + other.z * t, self.w * s + other.w * t).normalized()
+
+    def slerp(self, other: Quaternion, t: SupportsFloat) -> Quaternion:
+        '''Spherical linear interpolation along the shortest arc at constant speed'''
+        dot = self.dot(other)
+        sign = 1.0
+        if dot < 0:
+            dot = -dot
+            sign = -1.0
+        if dot > _SLERP_THRESHOLD:
+            return self.nlerp(other, t)
+        theta = acos(dot)
+        sin_theta = sin(theta)
+        s = sin((1 - t) * theta) / sin_theta
+        t = sign * sin(t * theta) / sin_theta
+        return Quaternion(self.x * s + other.x * t, self.y * s + other.y * t,
+                          self.z * s + other.z * t, self.w * s + other.w * t)
+
     def __mul__(self, other):
+        if isinstance(other, Quaternion):
+            return self.combine(other)
+        if isinstance(other, Vector3):
+            return self.rotate(other)
+        if isinstance(other, Vector3Array):
+            return self.rotate_array(other)
         return NotImplemented
 
+    def combine(self, other: Quaternion) -> Quaternion:
+        '''Combine rotations'''
+        return Quaternion(*_combine(self.x, self.y, self.z, self.w, other.x, other.y, other.z, other.w))
+
+    def rotation_matrix(self) -> tuple:
+        '''Returns the rows of the 3x3 rotation matrix'''
+        return _rotation_matrix(self.x, self.y, self.z, self.w)
+
+    def rotate(self, point: Vector3) -> Vector3:
+        '''Rotates point with rotation'''
+        # Same math as _rotation_matrix, inlined for the per point fast path
+        x = self.x * 2.0
+        y = self.y * 2.0
+        z = self.z * 2.0
+        xx = self.x * x
+        yy = self.y * y
+        zz = self.z * z
+        xy = self.x * y
+        xz = self.x * z
+        yz = self.y * z
+        wx = self.w * x
+        wy = self.w * y
+        wz = self.w * z
+
+        px, py, pz = point.x, point.y, point.z
+        return Vector3(
+            (1.0 - (yy + zz)) * px + (xy - wz) * py + (xz + wy) * pz,
+            (xy + wz) * px + (1.0 - (xx + zz)) * py + (yz - wx) * pz,
+            (xz - wy) * px + (yz + wx) * py + (1.0 - (xx + yy)) * pz)
+
+    def rotate_array(self, points: Vector3Array) -> Vector3Array:
+        '''Rotates many points, the rotation matrix is built once for all of them'''
+        matrix = np.array(self.rotation_matrix())
+        return Vector3Array._make(np.tensordot(matrix, np.stack(points._arrays()), axes=1))
+
     def __eq__(self, other: Quaternion) -> bool:
+        if not isinstance(other, Quaternion):
+            return NotImplemented
         return self.x == other.x and self.y == other.y and self.z == other.z and self.w == other.w
 
+    def __hash__(self) -> int:
+        return hash((self.x, self.y, self.z, self.w))
 
-@Quaternion.__mul__.register
-def _(self, other: Quaternion) -> Quaternion:
-    '''Combine rotations'''
-    # No one knows how this witchcraft works
-    # It works
-    #       - Todd Howard
-    x = self.w * other.x + self.x * other.w + self.y * other.z - self.z * other.y
-    y = self.w * other.y + self.y * other.w + self.z * other.x - self.x * other.z
-    z = self.w * other.z + self.z * other.w + self.x * other.y - self.y * other.x
-    w = self.w * other.w - self.x * other.x - self.y * other.y - self.z * other.z
-    return Quaternion(x, y, z, w)
-
-
-@Quaternion.__mul__.register
-def _(self, point: Vector3) -> Vector3:
-    '''Rotates point with rotation'''
-    x = self.x * 2.0
-    y = self.y * 2.0
-    z = self.z * 2.0
-    xx = self.x * x
-    yy = self.y * y
-    zz = self.z * z
-    xy = self.x * y
-    xz = self.x * z
-    yz = self.y * z
-    wx = self.w * x
-    wy = self.w * y
-    wz = self.w * z
-
-    px = (1.0 - (yy + zz)) * point.x + \
-        (xy - wz) * point.y + (xz + wy) * point.z
-    py = (xy + wz) * point.x + (1.0 - (xx + zz)) * \
-        point.y + (yz - wx) * point.z
-    pz = (xz - wy) * point.x + (yz + wx) * \
-        point.y + (1.0 - (xx + yy)) * point.z
-    return Vector3(px, py, pz)
+    def __repr__(self):
+        return "Quaternion({}, {}, {}, {})".format(self.x, self.y, self.z, self.w)
+
+# endregion
+
+# region Vector arrays
+
+
+class _VectorArray:
+    '''Base of the struct of arrays vector types
+
+    Every component is a float64 NumPy array of its own, the arrays are kept
+    as given when possible so a vector array can be a view over columns or
+    buffers owned by something else and operating in place writes into them
+    '''
+
+    __slots__ = ()
+    fields: Tuple[str, ...] = ()
+    scalar: type = None
+
+    @classmethod
+    def _make(cls, arrays: Iterable[np.ndarray]):
+        vectors = cls.__new__(cls)
+        for name, array in zip(cls.fields, arrays):
+            setattr(vectors, name, array)
+        return vectors
+
+    @classmethod
+    def _coerce(cls, arrays: Iterable) -> List[np.ndarray]:
+        if np is None:
+            raise ImportError("Vector arrays require numpy")
+        arrays = [np.asarray(a, dtype=np.float64) for a in arrays]
+        if len({a.shape for a in arrays}) > 1:
+            raise ValueError("Vector components must have the same shape")
+        return arrays
+
+    @classmethod
+    def zeros(cls, count: int):
+        return cls._make(np.zeros((len(cls.fields), count)))
+
+    @classmethod
+    def from_vectors(cls, vectors: Iterable):
+        '''Copies a sequence of scalar vectors'''
+        return cls._make(np.array([[getattr(v, name) for name in cls.fields] for v in vectors],
+                                  dtype=np.float64).reshape(-1, len(cls.fields)).T.copy())
+
+    @classmethod
+    def from_array(cls, array):
+        '''Views the columns of an (n, components) array, without copying float64 data'''
+        array = np.asarray(array, dtype=np.float64)
+        if array.ndim != 2 or array.shape[1] != len(cls.fields):
+            raise ValueError(f"Expected an array of shape (n, {len(cls.fields)})")
+        return cls._make(array.T)
+
+    @classmethod
+    def from_buffer(cls, buffer, count: int = -1, offset: int = 0, interleaved: bool = False):
+        '''Views float64 values of a buffer without copying them
+
+        The buffer holds every x then every y and so on, or x, y, ... of
+        each vector in turn when interleaved. count is the number of vectors,
+        by default as many as the buffer holds.
+        '''
+        if np is None:
+            raise ImportError("Vector arrays require numpy")
+        size = len(cls.fields)
+        data = np.frombuffer(buffer, dtype=np.float64, count=-1 if count < 0 else count * size, offset=offset)
+        if interleaved:
+            return cls._make(data.reshape(-1, size).T)
+        return cls._make(data.reshape(size, -1))
+
+    def _arrays(self) -> List[np.ndarray]:
+        return [getattr(self, name) for name in self.fields]
+
+    def _operand(self, other) -> List:
+        if isinstance(other, (_VectorArray, self.scalar)):
+            return [getattr(other, name) for name in self.fields]
+        # Scalars and per vector arrays of scalars broadcast over the components
+        return [other] * len(self.fields)
+
+    def to_array(self) -> np.ndarray:
+        '''Returns a copy as an (n, components) array'''
+        return np.stack(self._arrays(), axis=-1)
+
+    def copy(self):
+        return self._make(a.copy() for a in self._arrays())
+
+    def __len__(self) -> int:
+        return len(getattr(self, self.fields[0]))
+
+    def __iter__(self) -> Iterator:
+        scalar = self.scalar
+        return (scalar(*values) for values in zip(*(a.tolist() for a in self._arrays())))
+
+    def __getitem__(self, key):
+        '''A position gives a scalar vector, slices, masks and index arrays a vector array'''
+        if isinstance(key, (int, np.integer)):
+            return self.scalar(*(a.item(key) for a in self._arrays()))
+        return self._make(a[key] for a in self._arrays())
+
+    def __setitem__(self, key, value) -> None:
+        for array, component in zip(self._arrays(), self._operand(value)):
+            array[key] = component
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(repr(a) for a in self._arrays())})"
+
+    @property
+    def sqr_magnitude(self) -> np.ndarray:
+        return sum(a * a for a in self._arrays())
+
+    @property
+    def magnitude(self) -> np.ndarray:
+        return np.sqrt(self.sqr_magnitude)
+
+    def dot(self, other) -> np.ndarray:
+        return sum(a * b for a, b in zip(self._arrays(), self._operand(other)))
+
+    def normalized(self):
+        mag = self.magnitude
+        # Vectors too short to normalize become zero like the scalar ones
+        valid = mag > sys.float_info.epsilon
+        return self._make(np.divide(a, mag, out=np.zeros_like(mag), where=valid) for a in self._arrays())
+
+    def clamp_magnitude(self, max_length: SupportsFloat):
+        mag = self.magnitude
+        scale = np.divide(max_length, mag, out=np.ones_like(mag), where=mag > max_length)
+        return self._make(a * scale for a in self._arrays())
+
+    def lerp(self, other, t: Union[SupportsFloat, np.ndarray]):
+        return self._make(a + (b - a) * t for a, b in zip(self._arrays(), self._operand(other)))
+
+    def move_towards(self, target, max_distance_delta: Union[SupportsFloat, np.ndarray]):
+        deltas = [b - a for a, b in zip(self._arrays(), self._operand(target))]
+        distance = np.sqrt(sum(d * d for d in deltas))
+        # Targets within reach are returned as is
+        arrive = (distance == 0) | ((max_distance_delta >= 0) & (distance <= max_distance_delta))
+        step = np.divide(max_distance_delta, distance, out=np.zeros_like(distance), where=~arrive)
+        return self._make(np.where(arrive, a + d, a + d * step) for a, d in zip(self._arrays(), deltas))
+
+    def __add__(self, other):
+        return self._make(a + b for a, b in zip(self._arrays(), self._operand(other)))
+
+    def __sub__(self, other):
+        return self._make(a - b for a, b in zip(self._arrays(), self._operand(other)))
+
+    def __mul__(self, other):
+        return self._make(a * b for a, b in zip(self._arrays(), self._operand(other)))
+
+    def __truediv__(self, other):
+        return self._make(a / b for a, b in zip(self._arrays(), self._operand(other)))
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+    def __rsub__(self, other):
+        return self._make(b - a for a, b in zip(self._arrays(), self._operand(other)))
+
+    def __rtruediv__(self, other):
+        return self._make(b / a for a, b in zip(self._arrays(), self._operand(other)))
+
+    def __neg__(self):
+        return self._make(-a for a in self._arrays())
+
+    def __iadd__(self, other):
+        for a, b in zip(self._arrays(), self._operand(other)):
+            a += b
+        return self
+
+    def __isub__(self, other):
+        for a, b in zip(self._arrays(), self._operand(other)):
+            a -= b
+        return self
+
+    def __imul__(self, other):
+        for a, b in zip(self._arrays(), self._operand(other)):
+            a *= b
+        return self
+
+    def __itruediv__(self, other):
+        for a, b in zip(self._arrays(), self._operand(other)):
+            a /= b
+        return self
+
+
+class Vector2Array(_VectorArray):
+    '''Many Vector2 stored as an array of x and an array of y
+
+    Examples:
+        points = Vector2Array(xs, ys)
+        points += velocities * dt
+        points[0]  # Vector2
+    '''
+
+    fields = ("x", "y")
+    scalar = Vector2
+    __slots__ = fields
+
+    def __init__(self, x=(), y=()) -> None:
+        self.x, self.y = self._coerce((x, y))
+
+
+class Vector3Array(_VectorArray):
+    '''Many Vector3 stored as arrays of x, y and z'''
+
+    fields = ("x", "y", "z")
+    scalar = Vector3
+    __slots__ = fields
+
+    def __init__(self, x=(), y=(), z=()) -> None:
+        self.x, self.y, self.z = self._coerce((x, y, z))
+
+    @property
+    def xy(self) -> Vector2Array:
+        return Vector2Array._make((self.x, self.y))
+
+    @property
+    def xz(self) -> Vector2Array:
+        return Vector2Array._make((self.x, self.z))
+
+    @property
+    def yz(self) -> Vector2Array:
+        return Vector2Array._make((self.y, self.z))
+
+    def cross(self, other) -> Vector3Array:
+        x, y, z = self._operand(other)
+        return Vector3Array._make((self.y * z - self.z * y,
+                                   self.z * x - self.x * z,
+                                   self.x * y - self.y * x))
+
+
+class QuaternionArray(_VectorArray):
+    '''Many Quaternion stored as arrays of x, y, z and w
+
+    Multiplying composes rotations or rotates points pairwise, a single
+    Quaternion or Vector3 operand applies to every element
+
+    Examples:
+        orientations = orientations * spins
+        world = orientations * local_points
+    '''
+
+    fields = ("x", "y", "z", "w")
+    scalar = Quaternion
+    __slots__ = fields
+
+    def __init__(self, x=(), y=(), z=(), w=None) -> None:
+        if w is None:
+            w = np.ones(np.shape(x))
+        self.x, self.y, self.z, self.w = self._coerce((x, y, z, w))
+
+    @classmethod
+    def identity(cls, count: int) -> QuaternionArray:
+        return cls(np.zeros(count), np.zeros(count), np.zeros(count))
+
+    def normalized(self) -> QuaternionArray:
+        mag = self.magnitude
+        valid = mag >= sys.float_info.epsilon
+        # Degenerate quaternions become the identity like the scalar ones
+        x, y, z = (np.divide(a, mag, out=np.zeros_like(mag), where=valid) for a in (self.x, self.y, self.z))
+        w = np.divide(self.w, mag, out=np.ones_like(mag), where=valid)
+        return QuaternionArray._make((x, y, z, w))
+
+    def nlerp(self, other, t) -> QuaternionArray:
+        '''Normalized linear interpolation along the shortest arc, t may be an array'''
+        sign = np.where(self.dot(other) < 0, -1.0, 1.0)
+        return self._blend(other, 1 - t, sign * t).normalized()
+
+    def slerp(self, other, t) -> QuaternionArray:
+        '''Spherical linear interpolation along the shortest arc, t may be an array'''
+        dot = self.dot(other)
+        sign = np.where(dot < 0, -1.0, 1.0)
+        dot = np.abs(dot)
+        theta = np.arccos(np.minimum(dot, 1.0))
+        sin_theta = np.sin(theta)
+        linear = dot > _SLERP_THRESHOLD
+        t = np.asarray(t, dtype=np.float64)
+        s = np.divide(np.sin((1 - t) * theta), sin_theta, out=np.broadcast_to(1 - t, theta.shape).copy(),
+                      where=~linear)
+        u = np.divide(np.sin(t * theta), sin_theta, out=np.broadcast_to(t, theta.shape).copy(), where=~linear)
+        blended = self._blend(other, s, sign * u)
+        if not linear.any():
+            return blended
+        # Nearly equal rotations are blended linearly like nlerp
+        normalized = blended.normalized()
+        return QuaternionArray._make(np.where(linear, n, b) for n, b in zip(normalized._arrays(), blended._arrays()))
+
+    def _blend(self, other, s, t) -> QuaternionArray:
+        return QuaternionArray._make(a * s + b * t for a, b in zip(self._arrays(), self._operand(other)))
+
+    def to_euler_angles(self) -> Vector3Array:
+        angles = _euler_angles(self.x, self.y, self.z, self.w, np.arctan2, np.arcsin, np.clip)
+        return Vector3Array._make(np.where(a < _NEGATIVE_FLIP, a + 360.0, np.where(a > _POSITIVE_FLIP, a - 360.0, a))
+                                  for a in angles)
+
+    def rotation_matrices(self) -> np.ndarray:
+        '''Returns the rotation matrices as an array of shape (n, 3, 3)'''
+        return np.moveaxis(np.array(_rotation_matrix(self.x, self.y, self.z, self.w)), -1, 0)
+
+    def __mul__(self, other):
+        if isinstance(other, (QuaternionArray, Quaternion)):
+            return QuaternionArray._make(_combine(self.x, self.y, self.z, self.w,
+                                                  other.x, other.y, other.z, other.w))
+        if isinstance(other, (Vector3Array, Vector3)):
+            matrix = _rotation_matrix(self.x, self.y, self.z, self.w)
+            return Vector3Array._make(_transform(matrix, other.x, other.y, other.z))
+        return NotImplemented
+
+    def __rmul__(self, other):
+        # Composition doesn't commute, other is on the left
+        if isinstance(other, Quaternion):
+            return QuaternionArray._make(_combine(other.x, other.y, other.z, other.w,
+                                                  self.x, self.y, self.z, self.w))
+        return NotImplemented
+
+    def __imul__(self, other):
+        combined = self * other
+        if not isinstance(combined, QuaternionArray):
+            return NotImplemented
+        self[...] = combined
+        return self
 
 # endregion
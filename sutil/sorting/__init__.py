@@ -0,0 +1 @@
+from .sorters import insertion_sort, merge_sort
@@ -1,7 +1,13 @@
-def insertion_sort(l):
+def insertion_sort(l, swapped=None):
+    '''Sorts l in place, in linear time when l is nearly sorted
+
+    swapped(item, other) is called every time item moves before other
+    '''
     for j in range(len(l) - 1):
         key = l[j + 1]  # key is the current element
         while (j >= 0) and (l[j] > key):
+            if swapped is not None:
+                swapped(key, l[j])
             l[j + 1] = l[j]
             j -= 1
         l[j + 1] = key
@@ -21,7 +27,8 @@ def merge_sort(l):
     return list(left) + list(right)
 
 
-ls = [1, 3, 2, 6, 5, 4]
+if __name__ == "__main__":
+    ls = [1, 3, 2, 6, 5, 4]
 
-print(ls)
-print(merge_sort(ls))
\ No newline at end of file
+    print(ls)
+    print(merge_sort(ls))
@@ -2,7 +2,67 @@
 '''
 
 from __future__ import annotations
-from typing import Dict, List
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from importlib import import_module
+from itertools import islice
+from multiprocessing import shared_memory
+import hashlib
+import json
+import pickle
+import struct
+import threading
+import time
+from typing import Callable, Deque, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # Only record components need numpy
+    np = None
+
+DICT_STORAGE = "dict"
+ARCHETYPE_STORAGE = "archetype"
+SPARSE_STORAGE = "sparse"
+
+# Entity handles pack a 32 bit index with a 32 bit generation
+INDEX_BITS = 32
+INDEX_MASK = (1 << INDEX_BITS) - 1
+
+
+class ComponentRegistry:
+    '''Assigns a bit index to every component type
+
+    Sets of component types are then represented by integer masks, checking
+    a family against an entity becomes a couple of bitwise ANDs
+    '''
+
+    def __init__(self) -> None:
+        self.bits: Dict[type, int] = {}
+
+    def bit(self, component_type: type) -> int:
+        '''Returns the mask of a single component type, registering it if needed'''
+        bit = self.bits.get(component_type)
+        if bit is None:
+            bit = 1 << len(self.bits)
+            self.bits[component_type] = bit
+        return bit
+
+    def mask(self, component_types: Iterable[type]) -> int:
+        '''Returns the mask of a group of component types'''
+        mask = 0
+        for component_type in component_types:
+            mask |= self.bit(component_type)
+        return mask
+
+    def types(self, mask: int) -> FrozenSet[type]:
+        '''Returns the component types present in a mask'''
+        return frozenset(t for t, bit in self.bits.items() if mask & bit)
+
+
+# Bits are shared by every engine so entities can build their signature
+# before being added to one
+component_registry = ComponentRegistry()
 
 
 class EntityFamily:
@@ -12,35 +72,61 @@ class EntityFamily:
         self.s_electives = set()
         self.s_included = set()
         self.s_excluded = set()
+        # Change filters, evaluated against the last run of the iterating system
+        self.s_added = set()
+        self.s_changed = set()
+        self._masks: Optional[Tuple[int, int, int]] = None
 
     def all(self, *components) -> EntityFamily:
         '''Requires an entity to contain all of the components'''
         self.s_included |= set(components)
+        self._masks = None
         return self
 
     def elective(self, *components) -> EntityFamily:
         '''Requires an entity to contain at least one of the components'''
         self.s_electives |= set(components)
+        self._masks = None
         return self
 
     def exclude(self, *components) -> EntityFamily:
         '''Requires an entity to contain none of the components'''
         self.s_excluded |= set(components)
+        self._masks = None
         return self
 
+    def added(self, *components) -> EntityFamily:
+        '''Requires the components to have been attached since the system last ran'''
+        self.s_added |= set(components)
+        return self.all(*components)
+
+    def changed(self, *components) -> EntityFamily:
+        '''Requires the components to have been attached or changed since the system last ran'''
+        self.s_changed |= set(components)
+        return self.all(*components)
+
+    def signature(self) -> Tuple[int, int, int]:
+        '''Returns the included, elective and excluded masks of the filter'''
+        if self._masks is None:
+            self._masks = (component_registry.mask(self.s_included),
+                           component_registry.mask(self.s_electives),
+                           component_registry.mask(self.s_excluded))
+        return self._masks
+
     def matches(self, entity: EntityObject) -> bool:
         '''Checks if an entity matches the family type'''
-        keys = set(entity.components.keys())
-
-        if len(self.s_excluded & keys) != 0:
-            return False
+        return self.matches_signature(entity.signature)
 
-        if len(self.s_included & keys) == len(self.s_included) and len(self.s_electives) == 0:
-            return True
+    def matches_types(self, keys) -> bool:
+        '''Checks if a set of component types matches the family type'''
+        return self.matches_signature(component_registry.mask(keys))
 
-        if len(self.s_electives & keys) > 0:
-            return True
-        return False
+    def matches_signature(self, signature: int) -> bool:
+        '''Checks if a component mask matches the family type'''
+        included, electives, excluded = self.signature()
+        return (signature & excluded == 0
+                and signature & included == included
+                and (electives == 0 or signature & electives != 0))
 
     def create_entity(self, include_electives=False) -> EntityObject:
         '''Creates an entity that satisfies the family'''
@@ -57,36 +143,1756 @@ class EntityFamily:
 
 class EntityObject:
     '''A holder of components, these can be any type of instantiable class
+
+    Once added to an engine the components are owned by the engine storage
+    and the entity acts as a view over them, identified by its handle
     '''
 
+    __slots__ = ("_components", "_storage", "signature", "id", "_index", "_table", "_row", "__weakref__")
+
     def __init__(self) -> None:
-        self.components: Dict[type, object] = {}
+        self._components: Dict[type, object] = {}
+        self._storage: Optional[ComponentStorage] = None
+        # Mask of the component types, kept in sync on attach/remove
+        self.signature = 0
+        # Handle given by the engine and position in the storage list
+        self.id = -1
+        self._index = -1
+        self._table: Optional[ArchetypeTable] = None
+        self._row = -1
+
+    @classmethod
+    def _facade(cls, storage: ComponentStorage, handle: int, signature: int) -> EntityObject:
+        '''Creates an entity object over a handle of a storage'''
+        entity = cls()
+        entity._storage = storage
+        entity.id = handle
+        entity.signature = signature
+        return entity
+
+    @property
+    def components(self) -> Dict[type, object]:
+        '''Maps the component types to the components of the entity'''
+        if self._storage is None:
+            return self._components
+        return self._storage.components(self)
+
+    def component_types(self) -> FrozenSet[type]:
+        '''Returns the set of component types of the entity'''
+        if self._storage is None:
+            return frozenset(self._components)
+        return self._storage.component_types(self)
 
     def attach(self, component) -> bool:
         '''Attach or update the component if it doesn't already exist'''
-        self.components[type(component)] = component
+        if self._storage is None:
+            component_type = type(component)
+            self._components[component_type] = component
+            self.signature |= component_registry.bit(component_type)
+        else:
+            changes = self._storage.changes
+            if not changes.enabled:
+                self._storage.attach(self, component)
+                return
+            component_type = type(component)
+            signature = self.signature
+            is_new = not self._storage.contains(self, component_type)
+            self._storage.attach(self, component)
+            if is_new:
+                changes.mark_added(self.id, self, signature, (component_type,))
+            else:
+                changes.mark_changed(self.id, component_type)
 
     def remove(self, component_type: type) -> bool:
         '''Removes the component from the class if it exists'''
-        if component_type not in self.components:
+        if self._storage is not None:
+            signature = self.signature
+            removed = self._storage.remove(self, component_type)
+            if removed and self._storage.changes.enabled:
+                self._storage.changes.mark_removed(self.id, self, signature)
+            return removed
+        if component_type not in self._components:
             return False
-        self.components.pop(component_type)
+        self._components.pop(component_type)
+        self.signature &= ~component_registry.bit(component_type)
         return True
 
     def contains(self, component_type: type) -> bool:
         '''Checks if entity contains component'''
-        return component_type in self.components
+        if self._storage is None:
+            return component_type in self._components
+        return self._storage.contains(self, component_type)
 
     def get(self, component_type: type) -> object:
         '''Returns the component'''
-        return self.components[component_type]
+        if self._storage is None:
+            return self._components[component_type]
+        return self._storage.get(self, component_type)
+
+    def get_mut(self, component_type: type) -> object:
+        '''Returns the component and flags it as changed for change detection'''
+        if self._storage is None:
+            return self._components[component_type]
+        component = self._storage.get(self, component_type)
+        if self._storage.changes.enabled:
+            self._storage.changes.mark_changed(self.id, component_type)
+        return component
+
+
+# region Record components
+
+
+class _RecordField:
+    '''Descriptor reading a record field from its column or detached values'''
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        column = instance._column
+        if column is None:
+            return instance._values[self.name]
+        return column.arrays[self.name].item(instance._row)
+
+    def __set__(self, instance, value) -> None:
+        column = instance._column
+        if column is None:
+            instance._values[self.name] = value
+        else:
+            column.arrays[self.name][instance._row] = value
+
+
+class RecordComponent:
+    '''A component made of typed fields
+
+    Archetype storage keeps record components in contiguous NumPy arrays, one
+    per field, instead of one Python object per entity. Attaching copies the
+    values into the columns and EntityObject.get returns a view bound to the
+    current row of the entity.
+
+    Examples:
+        class PositionComponent(RecordComponent):
+            fields = {"x": "f8", "y": "f8"}
+
+        p = PositionComponent(1, y=2)
+    '''
+
+    fields: Dict[str, str] = {}
+    __slots__ = ("_values", "_column", "_row")
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        for name in cls.fields:
+            setattr(cls, name, _RecordField(name))
+
+    def __init__(self, *args, **kwargs) -> None:
+        values = dict(zip(self.fields, args))
+        values.update(kwargs)
+        self._values = {name: values.get(name, 0) for name in self.fields}
+        self._column: Optional[RecordColumn] = None
+        self._row = -1
+
+    @classmethod
+    def _view(cls, column: RecordColumn, row: int) -> RecordComponent:
+        view = cls.__new__(cls)
+        view._values = None
+        view._column = column
+        view._row = row
+        return view
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.fields)
+        return f"{type(self).__name__}({values})"
+
+
+class RecordView:
+    '''The field arrays of a record column trimmed to the used rows
+
+    Assigning a field writes into the column, so both `view.x *= 2` and
+    `view.x = view.x + view.dx` update the stored components
+    '''
+
+    def __init__(self, arrays: Dict[str, np.ndarray]) -> None:
+        self.__dict__.update(arrays)
+
+    def __setattr__(self, name: str, value) -> None:
+        self.__dict__[name][...] = value
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.__dict__[name]
+
+
+class ObjectColumn(list):
+    '''Column of plain Python component objects'''
+
+    def swap_remove(self, row: int) -> object:
+        '''Removes a row by moving the last one into it'''
+        component = self[row]
+        self[row] = self[-1]
+        self.pop()
+        return component
+
+    def view(self, start: int = 0, stop: Optional[int] = None) -> ObjectColumn:
+        if start == 0 and stop is None:
+            return self
+        return ObjectColumn(self[start:stop])
+
+
+def _release_buffer(buffer: shared_memory.SharedMemory) -> None:
+    buffer.unlink()
+    try:
+        buffer.close()
+    except BufferError:
+        # A view handed out earlier is still alive, the mapping goes with it
+        pass
+
+
+class RecordColumn:
+    '''Structure of arrays storage for a record component type
+
+    Shared columns allocate their arrays in named shared memory blocks so
+    worker processes can map and mutate them in place
+    '''
+
+    def __init__(self, component_type: type, capacity: int = 64, shared: bool = False) -> None:
+        if np is None:
+            raise ImportError("RecordComponent storage requires numpy")
+        self.component_type = component_type
+        self.length = 0
+        self.capacity = capacity
+        self.shared = shared
+        self.buffers: Dict[str, shared_memory.SharedMemory] = {}
+        self.arrays: Dict[str, np.ndarray] = {
+            name: self._allocate(name, np.dtype(dtype), capacity)
+            for name, dtype in component_type.fields.items()}
+
+    def _allocate(self, name: str, dtype: np.dtype, capacity: int) -> np.ndarray:
+        if not self.shared:
+            return np.zeros(capacity, dtype=dtype)
+        # New shared memory blocks are zero filled
+        buffer = shared_memory.SharedMemory(create=True, size=max(1, capacity * dtype.itemsize))
+        self.buffers[name] = buffer
+        return np.ndarray(capacity, dtype=dtype, buffer=buffer.buf)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, row: int) -> RecordComponent:
+        return self.component_type._view(self, row)
+
+    def __setitem__(self, row: int, component: RecordComponent) -> None:
+        if component._column is self and component._row == row:
+            return
+        for name, array in self.arrays.items():
+            array[row] = getattr(component, name)
+
+    def reserve(self, size: int) -> None:
+        '''Grows the arrays, doubling them, so they can hold size rows'''
+        if size <= self.capacity:
+            return
+        capacity = max(size, self.capacity * 2)
+        released = list(self.buffers.values())
+        self.arrays = {name: self._copy(name, array, capacity) for name, array in self.arrays.items()}
+        self.capacity = capacity
+        for buffer in released:
+            _release_buffer(buffer)
+
+    def _copy(self, name: str, array: np.ndarray, capacity: int) -> np.ndarray:
+        grown = self._allocate(name, array.dtype, capacity)
+        grown[:self.length] = array[:self.length]
+        return grown
+
+    def append(self, component: RecordComponent) -> None:
+        self.reserve(self.length + 1)
+        self.length += 1
+        self[self.length - 1] = component
+
+    def swap_remove(self, row: int) -> RecordComponent:
+        '''Removes a row by moving the last one into it, returns a detached copy'''
+        last = self.length - 1
+        component = self.component_type.__new__(self.component_type)
+        component._values = {name: array.item(row) for name, array in self.arrays.items()}
+        component._column = None
+        component._row = -1
+        for array in self.arrays.values():
+            array[row] = array[last]
+        self.length = last
+        return component
+
+    def load(self, arrays: Dict[str, np.ndarray], length: int) -> None:
+        '''Replaces the content of the column with the given field arrays'''
+        self.length = 0
+        self.reserve(length)
+        for name, array in self.arrays.items():
+            array[:length] = arrays[name]
+        self.length = length
+
+    def view(self, start: int = 0, stop: Optional[int] = None) -> RecordView:
+        stop = self.length if stop is None else stop
+        return RecordView({name: array[start:stop] for name, array in self.arrays.items()})
+
+    def layout(self) -> Dict[str, Tuple[str, str, int]]:
+        '''Returns the shared memory name, dtype and capacity of every field'''
+        return {name: (self.buffers[name].name, array.dtype.str, self.capacity)
+                for name, array in self.arrays.items()}
+
+    def release(self) -> None:
+        '''Frees the shared memory blocks of the column'''
+        self.arrays = {}
+        for buffer in self.buffers.values():
+            _release_buffer(buffer)
+        self.buffers = {}
+
+
+def make_column(component_type: type, shared: bool = False) -> Union[ObjectColumn, RecordColumn]:
+    '''Returns the column type used to store a component type'''
+    if issubclass(component_type, RecordComponent):
+        return RecordColumn(component_type, shared=shared)
+    return ObjectColumn()
+
+# endregion
+
+# region Handles
+
+
+class EntityHandles:
+    '''Allocates 64 bit entity handles made of an index and a generation
+
+    Released indices are recycled through a free list with their generation
+    bumped, so a handle kept after its entity was removed is detected as
+    stale instead of silently pointing at the entity reusing the index
+    '''
+
+    def __init__(self) -> None:
+        self.generations = array("I")
+        self.live = bytearray()
+        self.free: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.generations) - len(self.free)
+
+    def allocate(self) -> int:
+        if self.free:
+            index = self.free.pop()
+        else:
+            index = len(self.generations)
+            self.generations.append(0)
+            self.live.append(0)
+        self.live[index] = 1
+        return (self.generations[index] << INDEX_BITS) | index
+
+    def release(self, handle: int) -> None:
+        index = handle & INDEX_MASK
+        self.generations[index] = (self.generations[index] + 1) & 0xFFFFFFFF
+        self.live[index] = 0
+        self.free.append(index)
+
+    def alive(self, handle: int) -> bool:
+        '''Checks if a handle still refers to a live entity'''
+        index = handle & INDEX_MASK
+        return (0 <= handle and index < len(self.generations) and self.live[index] == 1
+                and self.generations[index] == handle >> INDEX_BITS)
+
+    def handle(self, index: int) -> int:
+        '''Returns the current handle of a live index'''
+        return (self.generations[index] << INDEX_BITS) | index
+
+
+class SparseSet:
+    '''Component storage mapping entity indices to rows of a dense column
+
+    Membership, lookup, insertion and removal are O(1) and the components
+    stay packed in the column regardless of which indices are in use
+    '''
+
+    def __init__(self, component_type: type, shared: bool = False) -> None:
+        # Entity index -> dense row, -1 when absent
+        self.sparse = array("i")
+        # Dense row -> entity index
+        self.dense = array("I")
+        self.column = make_column(component_type, shared)
+
+    def __len__(self) -> int:
+        return len(self.dense)
+
+    def __contains__(self, index: int) -> bool:
+        return index < len(self.sparse) and self.sparse[index] >= 0
+
+    def get(self, index: int) -> object:
+        if index not in self:
+            raise KeyError(index)
+        return self.column[self.sparse[index]]
+
+    def insert(self, index: int, component) -> bool:
+        '''Adds or replaces the component of an index, True if it was added'''
+        if index >= len(self.sparse):
+            grow = max(index + 1, 2 * len(self.sparse)) - len(self.sparse)
+            self.sparse.extend(array("i", [-1]) * grow)
+        row = self.sparse[index]
+        if row >= 0:
+            self.column[row] = component
+            return False
+        self.sparse[index] = len(self.dense)
+        self.dense.append(index)
+        self.column.append(component)
+        return True
+
+    def pop(self, index: int) -> object:
+        '''Swap-removes the component of an index and returns it'''
+        row = self.sparse[index]
+        component = self.column.swap_remove(row)
+        moved = self.dense[-1]
+        self.dense[row] = moved
+        self.dense.pop()
+        self.sparse[moved] = row
+        self.sparse[index] = -1
+        return component
+
+    def load(self, indices: np.ndarray, values) -> None:
+        '''Replaces the content of the set
+
+        values are the field arrays of a record column or the list of
+        components of an object column, in the order of indices
+        '''
+        self.clear()
+        self.dense.frombytes(indices.astype(np.uintc).tobytes())
+        size = int(indices.max()) + 1 if len(indices) else 0
+        sparse = np.full(max(size, len(self.sparse)), -1, dtype=np.intc)
+        sparse[indices] = np.arange(len(indices), dtype=np.intc)
+        self.sparse = array("i")
+        self.sparse.frombytes(sparse.tobytes())
+        if isinstance(self.column, RecordColumn):
+            self.column.load(values, len(indices))
+        else:
+            self.column.extend(values)
+
+    def clear(self) -> None:
+        for index in self.dense:
+            self.sparse[index] = -1
+        self.dense = array("I")
+        if isinstance(self.column, RecordColumn):
+            self.column.length = 0
+        else:
+            self.column.clear()
+
+# endregion
+
+# region Change detection
+
+
+class ChangeTracker:
+    '''Records the ticks at which components were attached, changed and removed
+
+    Every system run gets its own tick, changes made while a system runs
+    carry its tick and changes made outside of systems carry the next one.
+    A system then finds what changed since it last ran by comparing ticks.
+    Tracking stays off, at no cost, until a change filter or a reactive
+    system needs it.
+    '''
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.tick = 1
+        # Component type -> handle -> tick
+        self.added: Dict[type, Dict[int, int]] = {}
+        self.changed: Dict[type, Dict[int, int]] = {}
+        # (tick, handle, entity, signature before the change) of every
+        # structural change, the signature is None for new entities
+        self.moves: List[Tuple[int, int, Optional[EntityObject], Optional[int]]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __getstate__(self) -> dict:
+        # Locks and thread locals can't be pickled, they are remade on load
+        state = self.__dict__.copy()
+        del state["_lock"], state["_local"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def current(self) -> int:
+        '''Returns the tick changes are recorded at on this thread'''
+        return getattr(self._local, "tick", self.tick)
+
+    def since(self) -> int:
+        '''Returns the last run tick of the system running on this thread'''
+        return getattr(self._local, "since", 0)
+
+    def begin(self, since: int) -> int:
+        '''Hands out the tick of a system run on the calling thread'''
+        with self._lock:
+            tick = self.tick
+            self.tick += 1
+        self._local.tick = tick
+        self._local.since = since
+        return tick
+
+    def end(self) -> None:
+        del self._local.tick
+        del self._local.since
+
+    def mark_added(self, handle: int, entity: Optional[EntityObject], signature: Optional[int],
+                   component_types: Iterable[type]) -> None:
+        tick = self.current()
+        for component_type in component_types:
+            self.added.setdefault(component_type, {})[handle] = tick
+            self.changed.setdefault(component_type, {})[handle] = tick
+        self.moves.append((tick, handle, entity, signature))
+
+    def mark_changed(self, handle: int, component_type: type) -> None:
+        self.changed.setdefault(component_type, {})[handle] = self.current()
+
+    def mark_removed(self, handle: int, entity: Optional[EntityObject], signature: int) -> None:
+        self.moves.append((self.current(), handle, entity, signature))
+
+    def prune(self, tick: int) -> None:
+        '''Forgets the changes made at or before a tick'''
+        for ticks in (self.added, self.changed):
+            for component_type, handles in ticks.items():
+                ticks[component_type] = {h: t for h, t in handles.items() if t > tick}
+        self.moves = [move for move in self.moves if move[0] > tick]
+
+    def clear(self) -> None:
+        self.added.clear()
+        self.changed.clear()
+        self.moves.clear()
+
+# endregion
+
+# region Queries
+
+
+class EntityQuery:
+    '''A persistent, re-iterable view of the entities matching a family
+
+    Queries are cached by the storage and kept up to date as entities and
+    components come and go, iterating one costs O(matching entities)
+    '''
+
+    def __init__(self, family: EntityFamily) -> None:
+        self.family = family
+
+    def __iter__(self) -> Iterator[EntityObject]:
+        raise NotImplementedError()
+
+    def __len__(self) -> int:
+        raise NotImplementedError()
+
+    def slice(self, start: int, stop: int) -> Iterator[EntityObject]:
+        '''Yields the matching entities from position start up to stop'''
+        return islice(self, start, stop)
+
+
+class EntitySetQuery(EntityQuery):
+    '''Query holding its matching entities in an insertion ordered set'''
+
+    def __init__(self, family: EntityFamily) -> None:
+        super().__init__(family)
+        self.matching: Dict[EntityObject, None] = {}
+
+    def __iter__(self) -> Iterator[EntityObject]:
+        return iter(self.matching)
+
+    def __len__(self) -> int:
+        return len(self.matching)
+
+    def refresh(self, entity: EntityObject) -> None:
+        '''Adds or drops an entity depending on its current signature'''
+        if self.family.matches_signature(entity.signature):
+            self.matching[entity] = None
+        else:
+            self.matching.pop(entity, None)
+
+
+class SparseQuery(EntityQuery):
+    '''Query walking the smallest sparse set among the included types
+
+    Nothing is stored per entity, each index of the driving set is checked
+    against the family masks
+    '''
+
+    def __init__(self, family: EntityFamily, storage: SparseStorage) -> None:
+        super().__init__(family)
+        self.storage = storage
+
+    def indices(self) -> Iterator[int]:
+        '''Yields the matching entity indices'''
+        storage = self.storage
+        included, _, _ = self.family.signature()
+        sets = [storage.sets.get(t) for t in self.family.s_included]
+        if included == 0:
+            candidates = (i for i, live in enumerate(storage.handles.live) if live)
+        elif None in sets:
+            return
+        else:
+            candidates = iter(min(sets, key=len).dense)
+
+        signatures = storage.signatures
+        matches = self.family.matches_signature
+        for index in candidates:
+            if matches(signatures[index]):
+                yield index
+
+    def __iter__(self) -> Iterator[EntityObject]:
+        for index in self.indices():
+            yield self.storage.entity(index)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.indices())
+
+
+class TableQuery(EntityQuery):
+    '''Query holding the archetype tables whose component types match'''
+
+    def __init__(self, family: EntityFamily) -> None:
+        super().__init__(family)
+        self.tables: List[ArchetypeTable] = []
+
+    def __iter__(self) -> Iterator[EntityObject]:
+        for table in self.tables:
+            yield from table.entities
+
+    def __len__(self) -> int:
+        return sum(len(t) for t in self.tables)
+
+    def slice(self, start: int, stop: int) -> Iterator[EntityObject]:
+        # Whole tables before start are skipped without being walked
+        offset = 0
+        for table in self.tables:
+            size = len(table)
+            if offset + size > start and offset < stop:
+                yield from table.entities[max(start - offset, 0):stop - offset]
+            offset += size
+
+
+class ChangeQuery(EntityQuery):
+    '''Narrows a query to the entities whose components were added or changed
+
+    Iterating from a system yields the changes since that system last ran,
+    the first run yields every matching entity. Only the recorded changes
+    are walked, not the whole query.
+    '''
+
+    def __init__(self, family: EntityFamily, query: EntityQuery, engine: EntityEngine) -> None:
+        super().__init__(family)
+        self.query = query
+        self.engine = engine
+
+    def since(self, tick: int) -> Iterator[EntityObject]:
+        '''Yields the matching entities changed after a tick'''
+        if tick == 0:
+            yield from self.query
+            return
+        changes = self.engine.storage.changes
+        ticks = ([changes.added.get(t, {}) for t in self.family.s_added]
+                 + [changes.changed.get(t, {}) for t in self.family.s_changed])
+        driver = min(ticks, key=len)
+        matches = self.family.matches_signature
+        for handle, changed in list(driver.items()):
+            if changed <= tick or any(t.get(handle, 0) <= tick for t in ticks):
+                continue
+            entity = self.engine.get_entity(handle)
+            if entity is not None and matches(entity.signature):
+                yield entity
+
+    def __iter__(self) -> Iterator[EntityObject]:
+        return self.since(self.engine.storage.changes.since())
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+# endregion
+
+# region Snapshots
+
+SNAPSHOT_MAGIC = b"SUTILECS"
+
+
+def _type_name(component_type: type) -> str:
+    return f"{component_type.__module__}:{component_type.__qualname__}"
+
+
+def _resolve_type(name: str, known: Dict[str, type]) -> type:
+    if name in known:
+        return known[name]
+    module, qualname = name.split(":")
+    found = import_module(module)
+    for part in qualname.split("."):
+        found = getattr(found, part)
+    return found
+
+
+class SnapshotWriter:
+    '''Lays out a snapshot as a header followed by 8 byte aligned blobs
+
+    Blobs are raw array bytes, which keeps them readable in place from a
+    memory mapped file
+    '''
+
+    def __init__(self) -> None:
+        self.blobs: List[bytes] = []
+        self.size = 0
+
+    def add(self, data) -> Tuple[int, int]:
+        '''Appends a blob, returns its offset and size'''
+        if np is not None and isinstance(data, np.ndarray):
+            data = np.ascontiguousarray(data).tobytes()
+        offset = self.size
+        self.blobs.append(data)
+        self.size += len(data)
+        padding = -self.size % 8
+        if padding:
+            self.blobs.append(bytes(padding))
+            self.size += padding
+        return offset, len(data)
+
+    def finish(self, header: dict) -> bytes:
+        encoded = pickle.dumps(header, protocol=pickle.HIGHEST_PROTOCOL)
+        prefix = SNAPSHOT_MAGIC + struct.pack("<Q", len(encoded)) + encoded
+        prefix += bytes(-len(prefix) % 8)
+        return b"".join([prefix] + self.blobs)
+
+
+class Snapshot:
+    '''Read access over a snapshot buffer, bytes or a memory map
+
+    Snapshots embed pickled objects, only restore trusted ones
+    '''
+
+    def __init__(self, data) -> None:
+        view = memoryview(data)
+        if bytes(view[:8]) != SNAPSHOT_MAGIC:
+            raise ValueError("Not an entity snapshot")
+        (length,) = struct.unpack_from("<Q", view, 8)
+        self.header: dict = pickle.loads(view[16:16 + length])
+        self.start = 16 + length + (-(16 + length) % 8)
+        self.data = data
+
+    @property
+    def delta(self) -> bool:
+        return self.header["delta"]
+
+    def array(self, blob: Tuple[int, int], dtype) -> np.ndarray:
+        '''Returns a read only array over a blob, without copying'''
+        dtype = np.dtype(dtype)
+        offset, size = blob
+        return np.frombuffer(self.data, dtype=dtype, count=size // dtype.itemsize, offset=self.start + offset)
+
+    def bytes(self, blob: Tuple[int, int]) -> memoryview:
+        offset, size = blob
+        return memoryview(self.data)[self.start + offset:self.start + offset + size]
+
+
+def _write_handles(writer: SnapshotWriter, handles: EntityHandles) -> dict:
+    return {"generations": writer.add(np.frombuffer(handles.generations, dtype=np.uint32)),
+            "live": writer.add(bytes(handles.live)),
+            "free": writer.add(np.array(handles.free, dtype=np.uint32))}
+
+
+def _read_handles(snapshot: Snapshot, handles: EntityHandles) -> None:
+    header = snapshot.header
+    handles.generations = array("I")
+    handles.generations.frombytes(snapshot.bytes(header["generations"]))
+    handles.live = bytearray(snapshot.bytes(header["live"]))
+    handles.free = snapshot.array(header["free"], np.uint32).tolist()
+
+
+def _write_groups(writer: SnapshotWriter, groups, previous: Dict[object, tuple]) -> Tuple[List[dict], Dict[object, tuple]]:
+    '''Writes groups of rows sharing their columns, such as archetype tables
+
+    groups yields the key, component types, row ids and columns of every
+    group. A group holding the same ids as in previous only writes the
+    record rows and object columns that changed. Returns the header entries
+    and the state the next delta is compared against.
+    '''
+    entries = []
+    state = {}
+    for key, types, ids, columns in groups:
+        length = len(ids)
+        base = previous.get(key)
+        # Rows can only be patched if the group holds the same ids
+        patch = base is not None and np.array_equal(base[0], ids)
+        # Patched groups keep their rows, their ids are already known and
+        # only a digest is kept to check them against on restore
+        entry = {"types": [_type_name(t) for t in types], "rows": length,
+                 "ids": None if patch else writer.add(ids),
+                 "base": _ids_digest(ids) if patch else None,
+                 "patch": patch, "records": {}, "objects": {}}
+        columns_state = {}
+        for component_type, column in columns.items():
+            name = _type_name(component_type)
+            if isinstance(column, RecordColumn):
+                arrays = {f: a[:length].copy() for f, a in column.arrays.items()}
+                columns_state[component_type] = arrays
+                rows = None
+                if patch:
+                    changed = np.zeros(length, dtype=bool)
+                    for field, values in arrays.items():
+                        changed |= values != base[1][component_type][field]
+                    rows = np.flatnonzero(changed)
+                    arrays = {f: a[rows] for f, a in arrays.items()}
+                    rows = writer.add(rows)
+                entry["records"][name] = {
+                    "rows": rows,
+                    "fields": {f: (a.dtype.str, writer.add(a)) for f, a in arrays.items()}}
+            else:
+                pickled = pickle.dumps(list(column), protocol=pickle.HIGHEST_PROTOCOL)
+                columns_state[component_type] = pickled
+                if not patch or base[1][component_type] != pickled:
+                    entry["objects"][name] = writer.add(pickled)
+        state[key] = (ids, columns_state)
+        entries.append(entry)
+    return entries, state
+
+
+def _ids_digest(ids: np.ndarray) -> bytes:
+    return hashlib.blake2b(np.ascontiguousarray(ids).tobytes(), digest_size=16).digest()
+
+
+def _check_patch(entry: dict, ids: np.ndarray) -> None:
+    '''Raises ValueError unless a group holds the rows, in order, a delta entry was taken against'''
+    if len(ids) != entry["rows"] or _ids_digest(ids) != entry["base"]:
+        raise ValueError("The delta snapshot doesn't apply to the current state")
+
+
+def _read_group(snapshot: Snapshot, entry: dict,
+                known: Dict[str, type]) -> Tuple[FrozenSet[type], Dict[type, tuple], Dict[type, list]]:
+    '''Returns the component types, record fields and object columns of a group'''
+    types = frozenset(_resolve_type(n, known) for n in entry["types"])
+    records = {}
+    for name, record in entry["records"].items():
+        fields = {f: snapshot.array(blob, dtype) for f, (dtype, blob) in record["fields"].items()}
+        records[_resolve_type(name, known)] = (record["rows"], fields)
+    objects = {_resolve_type(n, known): pickle.loads(snapshot.bytes(blob))
+               for n, blob in entry["objects"].items()}
+    return types, records, objects
+
+
+def _patch_columns(snapshot: Snapshot, columns: Dict[type, Union[ObjectColumn, RecordColumn]],
+                   records: Dict[type, tuple], objects: Dict[type, list]) -> None:
+    '''Writes the changed record rows and object columns of a patched group'''
+    for component_type, (rows, fields) in records.items():
+        rows = snapshot.array(rows, np.int64)
+        column = columns[component_type]
+        for field, values in fields.items():
+            column.arrays[field][rows] = values
+    for component_type, values in objects.items():
+        columns[component_type][:] = values
+
+# endregion
+
+# region Storage
+
+
+class ComponentStorage:
+    '''Strategy used by an engine to hold the components of its entities
+
+    Entities reach the storage with their handle already allocated
+    '''
+
+    entities: List[EntityObject]
+
+    def __init__(self) -> None:
+        self.changes = ChangeTracker()
+        # Group key -> ids and column states as of the last snapshot,
+        # compared against by deltas
+        self._snapshot_state: Optional[Dict[object, tuple]] = None
+
+    def add(self, entity: EntityObject) -> None:
+        '''Takes ownership of the components of an entity'''
+        raise NotImplementedError()
+
+    def discard(self, entity: EntityObject) -> None:
+        '''Gives the components back to the entity'''
+        raise NotImplementedError()
+
+    def spawn(self, handle: int, components: Iterable[object]) -> None:
+        '''Stores a new entity given its components'''
+        raise NotImplementedError()
+
+    def despawn(self, index: int) -> None:
+        '''Drops the entity stored at an index'''
+        raise NotImplementedError()
+
+    def entity(self, index: int) -> EntityObject:
+        '''Returns the entity object stored at an index'''
+        raise NotImplementedError()
+
+    def attach(self, entity: EntityObject, component) -> None:
+        raise NotImplementedError()
+
+    def remove(self, entity: EntityObject, component_type: type) -> bool:
+        raise NotImplementedError()
+
+    def contains(self, entity: EntityObject, component_type: type) -> bool:
+        raise NotImplementedError()
+
+    def get(self, entity: EntityObject, component_type: type) -> object:
+        raise NotImplementedError()
+
+    def components(self, entity: EntityObject) -> Dict[type, object]:
+        raise NotImplementedError()
+
+    def component_types(self, entity: EntityObject) -> FrozenSet[type]:
+        raise NotImplementedError()
+
+    def fetch(self, family: EntityFamily) -> EntityQuery:
+        '''Returns the cached query for the family'''
+        raise NotImplementedError()
+
+    def _groups(self) -> Iterator[Tuple[object, FrozenSet[type], np.ndarray, Dict[type, Union[ObjectColumn, RecordColumn]]]]:
+        '''Yields the key, component types, row ids and columns of the groups snapshots are made of'''
+        raise NotImplementedError()
+
+    def snapshot(self, handles: EntityHandles, delta: bool) -> bytes:
+        if np is None:
+            raise ImportError("Snapshots require numpy")
+        if delta and self._snapshot_state is None:
+            raise ValueError("A delta snapshot needs a previous full snapshot")
+        writer = SnapshotWriter()
+        groups, self._snapshot_state = _write_groups(writer, self._groups(), self._snapshot_state if delta else {})
+        header = _write_handles(writer, handles)
+        header.update(delta=delta, groups=groups)
+        return writer.finish(header)
+
+    def _group_ids(self, types: FrozenSet[type]) -> np.ndarray:
+        '''Returns the current row ids of a group, as _groups gives them'''
+        raise NotImplementedError()
+
+    def _check_delta(self, snapshot: Snapshot, known: Dict[str, type]) -> None:
+        '''Checks the groups a delta patches still hold its base rows, before anything is restored'''
+        for entry in snapshot.header["groups"]:
+            if entry["patch"]:
+                _check_patch(entry, self._group_ids(frozenset(_resolve_type(n, known) for n in entry["types"])))
+
+    def restore(self, handles: EntityHandles, snapshot: Snapshot) -> None:
+        raise NotImplementedError()
+
+
+class ObjectStorage(ComponentStorage):
+    '''Base for the storages keeping one EntityObject per entity'''
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.entities: List[EntityObject] = []
+        # Handle index -> entity
+        self.slots: List[Optional[EntityObject]] = []
+
+    def _track(self, entity: EntityObject) -> None:
+        entity._index = len(self.entities)
+        self.entities.append(entity)
+        index = entity.id & INDEX_MASK
+        if index >= len(self.slots):
+            self.slots.extend([None] * (index + 1 - len(self.slots)))
+        self.slots[index] = entity
+
+    def _untrack(self, entity: EntityObject) -> None:
+        # The last entity takes the freed position, removal is O(1)
+        last = self.entities.pop()
+        if last is not entity:
+            self.entities[entity._index] = last
+            last._index = entity._index
+        entity._index = -1
+        self.slots[entity.id & INDEX_MASK] = None
+
+    def spawn(self, handle: int, components: Iterable[object]) -> None:
+        entity = EntityObject()
+        for component in components:
+            entity.attach(component)
+        entity.id = handle
+        self.add(entity)
+
+    def despawn(self, index: int) -> None:
+        self.discard(self.slots[index])
+
+    def entity(self, index: int) -> EntityObject:
+        return self.slots[index]
+
+
+class DictStorage(ObjectStorage):
+    '''Keeps the components in a dictionary inside of each entity'''
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.queries: Dict[tuple, EntitySetQuery] = {}
+
+    def _refresh(self, entity: EntityObject) -> None:
+        for query in self.queries.values():
+            query.refresh(entity)
+
+    def add(self, entity: EntityObject) -> None:
+        entity._storage = self
+        self._track(entity)
+        self._refresh(entity)
+
+    def discard(self, entity: EntityObject) -> None:
+        entity._storage = None
+        self._untrack(entity)
+        for query in self.queries.values():
+            query.matching.pop(entity, None)
+
+    def attach(self, entity: EntityObject, component) -> None:
+        component_type = type(component)
+        is_new = component_type not in entity._components
+        entity._components[component_type] = component
+        if is_new:
+            entity.signature |= component_registry.bit(component_type)
+            self._refresh(entity)
+
+    def remove(self, entity: EntityObject, component_type: type) -> bool:
+        if component_type not in entity._components:
+            return False
+        entity._components.pop(component_type)
+        entity.signature &= ~component_registry.bit(component_type)
+        self._refresh(entity)
+        return True
+
+    def contains(self, entity: EntityObject, component_type: type) -> bool:
+        return component_type in entity._components
+
+    def get(self, entity: EntityObject, component_type: type) -> object:
+        return entity._components[component_type]
+
+    def components(self, entity: EntityObject) -> Dict[type, object]:
+        return entity._components
+
+    def component_types(self, entity: EntityObject) -> FrozenSet[type]:
+        return frozenset(entity._components)
+
+    def fetch(self, family: EntityFamily) -> EntityQuery:
+        key = family.signature()
+        query = self.queries.get(key)
+        if query is None:
+            query = EntitySetQuery(family)
+            for entity in self.entities:
+                query.refresh(entity)
+            self.queries[key] = query
+        return query
+
+    def _groups(self):
+        # One group per component type, its components gathered in a column.
+        # Entities go by index so a restore keeps the rows deltas patch
+        groups: Dict[type, Tuple[List[int], ObjectColumn]] = {}
+        for entity in filter(None, self.slots):
+            for component_type, component in entity._components.items():
+                ids, column = groups.setdefault(component_type, ([], ObjectColumn()))
+                ids.append(entity.id)
+                column.append(component)
+        for component_type, (ids, column) in groups.items():
+            yield component_type, (component_type,), np.array(ids, dtype=np.uint64), {component_type: column}
+
+    def _group_ids(self, types: FrozenSet[type]) -> np.ndarray:
+        (component_type,) = types
+        return np.array([e.id for e in filter(None, self.slots) if component_type in e._components],
+                        dtype=np.uint64)
+
+    def restore(self, handles: EntityHandles, snapshot: Snapshot) -> None:
+        known = {_type_name(t): t for t in component_registry.bits}
+        self._check_delta(snapshot, known)
+        _read_handles(snapshot, handles)
+        # Patched groups of a delta start from the current components
+        current = {key: (ids, columns) for key, _, ids, columns in self._groups()}
+        components: Dict[int, Dict[type, object]] = {}
+        for entry in snapshot.header["groups"]:
+            types, _, objects = _read_group(snapshot, entry, known)
+            (component_type,) = types
+            if entry["patch"]:
+                ids, columns = current[component_type]
+                _patch_columns(snapshot, columns, {}, objects)
+                ids, values = ids.tolist(), columns[component_type]
+            else:
+                ids = snapshot.array(entry["ids"], np.uint64).tolist()
+                values = objects[component_type]
+            for entity_id, component in zip(ids, values):
+                components.setdefault(entity_id, {})[component_type] = component
+
+        existing = {e.id: e for e in self.entities}
+        self.entities = []
+        self.slots = []
+        for index, live in enumerate(handles.live):
+            if not live:
+                continue
+            handle = handles.handle(index)
+            entity = existing.pop(handle, None) or EntityObject()
+            entity.id = handle
+            entity._components = components.get(handle, {})
+            entity.signature = component_registry.mask(entity._components)
+            entity._storage = self
+            self._track(entity)
+        for entity in existing.values():
+            # Entities created after the snapshot leave the engine empty
+            entity._storage = None
+            entity._components = {}
+            entity.signature = 0
+        for query in self.queries.values():
+            query.matching.clear()
+            for entity in self.entities:
+                query.refresh(entity)
+        self._snapshot_state = None
+
+
+class ArchetypeTable:
+    '''Holds all the entities sharing the same set of component types
+
+    Each component type is stored as a column, the components of an entity
+    live on the same row of every column
+    '''
+
+    def __init__(self, types: FrozenSet[type], shared: bool = False) -> None:
+        self.types = types
+        self.signature = component_registry.mask(types)
+        self.entities: List[EntityObject] = []
+        self.columns: Dict[type, Union[ObjectColumn, RecordColumn]] = {
+            t: make_column(t, shared) for t in types}
+        # Tables reached by attaching a missing type or removing an owned one
+        self.edges: Dict[type, ArchetypeTable] = {}
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def append(self, entity: EntityObject, components: Dict[type, object]) -> None:
+        '''Adds a row at the end of the table'''
+        entity._table = self
+        entity._row = len(self.entities)
+        entity.signature = self.signature
+        self.entities.append(entity)
+        for component_type, column in self.columns.items():
+            column.append(components[component_type])
+
+    def view(self, start: int = 0, stop: Optional[int] = None) -> Dict[type, Union[ObjectColumn, RecordView]]:
+        '''Returns the columns of the table, record columns as field arrays'''
+        return {t: column.view(start, stop) for t, column in self.columns.items()}
+
+    def record_columns(self) -> Dict[type, RecordColumn]:
+        return {t: c for t, c in self.columns.items() if isinstance(c, RecordColumn)}
+
+    def clear(self) -> None:
+        self.entities.clear()
+        for column in self.columns.values():
+            if isinstance(column, RecordColumn):
+                column.length = 0
+            else:
+                column.clear()
+
+    def load(self, entities: List[EntityObject], records: Dict[type, Dict[str, np.ndarray]],
+             objects: Dict[type, List[object]]) -> None:
+        '''Replaces the whole content of the table'''
+        self.clear()
+        for row, entity in enumerate(entities):
+            entity._table = self
+            entity._row = row
+            entity.signature = self.signature
+        self.entities.extend(entities)
+        for component_type, column in self.columns.items():
+            if isinstance(column, RecordColumn):
+                column.load(records[component_type], len(entities))
+            else:
+                column.extend(objects[component_type])
+
+    def pop(self, row: int) -> Dict[type, object]:
+        '''Swap-removes a row and returns its components'''
+        last = len(self.entities) - 1
+        components = {t: column.swap_remove(row) for t, column in self.columns.items()}
+
+        moved = self.entities[last]
+        self.entities[row] = moved
+        self.entities.pop()
+        moved._row = row
+        return components
+
+
+class ArchetypeStorage(ObjectStorage):
+    '''Groups entities with the same set of component types into tables
+
+    Iterating a family walks the columns of the matching tables instead of
+    looking up one dictionary per entity
+    '''
+
+    def __init__(self, shared: bool = False) -> None:
+        super().__init__()
+        self.tables: Dict[int, ArchetypeTable] = {}
+        self.queries: Dict[tuple, TableQuery] = {}
+        # Keep record columns in shared memory for process workers
+        self.shared = shared
+
+    def table(self, types: FrozenSet[type]) -> ArchetypeTable:
+        '''Returns the table for a set of component types, creating it if needed'''
+        table = self.tables.get(component_registry.mask(types))
+        if table is None:
+            table = ArchetypeTable(types, self.shared)
+            self.tables[table.signature] = table
+            for query in self.queries.values():
+                if query.family.matches_signature(table.signature):
+                    query.tables.append(table)
+        return table
+
+    def _neighbour(self, table: ArchetypeTable, component_type: type) -> ArchetypeTable:
+        '''Returns the table with one component type toggled'''
+        target = table.edges.get(component_type)
+        if target is None:
+            target = self.table(table.types ^ {component_type})
+            table.edges[component_type] = target
+        return target
+
+    def add(self, entity: EntityObject) -> None:
+        components = entity._components
+        self.table(frozenset(components)).append(entity, components)
+        entity._components = {}
+        entity._storage = self
+        self._track(entity)
+
+    def discard(self, entity: EntityObject) -> None:
+        entity._components = entity._table.pop(entity._row)
+        entity._table = None
+        entity._row = -1
+        entity._storage = None
+        self._untrack(entity)
+
+    def attach(self, entity: EntityObject, component) -> None:
+        component_type = type(component)
+        table = entity._table
+        if component_type in table.types:
+            table.columns[component_type][entity._row] = component
+            return
+
+        target = self._neighbour(table, component_type)
+        components = table.pop(entity._row)
+        components[component_type] = component
+        target.append(entity, components)
+
+    def remove(self, entity: EntityObject, component_type: type) -> bool:
+        table = entity._table
+        if component_type not in table.types:
+            return False
+
+        target = self._neighbour(table, component_type)
+        components = table.pop(entity._row)
+        components.pop(component_type)
+        target.append(entity, components)
+        return True
+
+    def contains(self, entity: EntityObject, component_type: type) -> bool:
+        return component_type in entity._table.types
+
+    def get(self, entity: EntityObject, component_type: type) -> object:
+        return entity._table.columns[component_type][entity._row]
+
+    def components(self, entity: EntityObject) -> Dict[type, object]:
+        table = entity._table
+        return {t: column[entity._row] for t, column in table.columns.items()}
+
+    def component_types(self, entity: EntityObject) -> FrozenSet[type]:
+        return entity._table.types
+
+    def fetch_tables(self, family: EntityFamily) -> List[ArchetypeTable]:
+        '''Returns the non empty tables that match the family filter'''
+        return [t for t in self.fetch(family).tables if len(t) != 0]
+
+    def fetch(self, family: EntityFamily) -> EntityQuery:
+        key = family.signature()
+        query = self.queries.get(key)
+        if query is None:
+            query = TableQuery(family)
+            query.tables = [t for t in self.tables.values() if family.matches_signature(t.signature)]
+            self.queries[key] = query
+        return query
+
+    def _groups(self):
+        # One group per table, keyed by its signature
+        for table in self.tables.values():
+            if len(table) != 0:
+                ids = np.fromiter((e.id for e in table.entities), dtype=np.uint64, count=len(table))
+                yield table.signature, table.types, ids, table.columns
+
+    def _group_ids(self, types: FrozenSet[type]) -> np.ndarray:
+        table = self.tables.get(component_registry.mask(types))
+        entities = table.entities if table is not None else []
+        return np.fromiter((e.id for e in entities), dtype=np.uint64, count=len(entities))
+
+    def restore(self, handles: EntityHandles, snapshot: Snapshot) -> None:
+        known = {_type_name(t): t for t in component_registry.bits}
+        self._check_delta(snapshot, known)
+        _read_handles(snapshot, handles)
+        existing = {e.id: e for e in self.entities}
+        restored: List[ArchetypeTable] = []
+        for entry in snapshot.header["groups"]:
+            types, records, objects = _read_group(snapshot, entry, known)
+            table = self.table(types)
+            if entry["patch"]:
+                # The table still holds the entities of the base snapshot
+                for entity in table.entities:
+                    existing.pop(entity.id, None)
+                _patch_columns(snapshot, table.columns, records, objects)
+            else:
+                entities = []
+                for entity_id in snapshot.array(entry["ids"], np.uint64).tolist():
+                    entity = existing.pop(entity_id, None) or EntityObject()
+                    entity.id = entity_id
+                    entity._components = {}
+                    entity._storage = self
+                    entities.append(entity)
+                table.load(entities, {t: fields for t, (_, fields) in records.items()}, objects)
+            restored.append(table)
+
+        restored_set = set(restored)
+        for table in self.tables.values():
+            if table not in restored_set:
+                table.clear()
+        for entity in existing.values():
+            # Entities created after the snapshot leave the engine empty
+            entity._storage = None
+            entity._table = None
+            entity._components = {}
+            entity.signature = 0
+
+        self.entities = []
+        self.slots = []
+        for table in restored:
+            for entity in table.entities:
+                self._track(entity)
+        self._snapshot_state = None
+
+    def release(self) -> None:
+        '''Frees the shared memory of every record column'''
+        for table in self.tables.values():
+            for column in table.record_columns().values():
+                column.release()
+
+
+class SparseStorage(ComponentStorage):
+    '''Keeps every component type in a sparse set keyed by entity index
+
+    Entities don't need an EntityObject, EntityEngine.spawn stores bare
+    handles and objects are only created as thin facades when an entity is
+    looked up or iterated. Record components stay packed in NumPy columns.
+    '''
+
+    def __init__(self, handles: EntityHandles, shared: bool = False) -> None:
+        super().__init__()
+        self.handles = handles
+        self.shared = shared
+        self.sets: Dict[type, SparseSet] = {}
+        # Entity index -> component mask
+        self.signatures: List[int] = []
+        self.queries: Dict[tuple, SparseQuery] = {}
+
+    @property
+    def entities(self) -> List[EntityObject]:
+        '''Facades of every live entity, built on each access'''
+        return [self.entity(i) for i, live in enumerate(self.handles.live) if live]
+
+    def _insert(self, index: int, component) -> bool:
+        component_type = type(component)
+        sparse_set = self.sets.get(component_type)
+        if sparse_set is None:
+            sparse_set = SparseSet(component_type, self.shared)
+            self.sets[component_type] = sparse_set
+        if not sparse_set.insert(index, component):
+            return False
+        self.signatures[index] |= component_registry.bit(component_type)
+        return True
+
+    def _index(self, entity: EntityObject) -> int:
+        '''Returns the index of an entity, facades outliving their entity raise ValueError'''
+        if not self.handles.alive(entity.id):
+            raise ValueError("Stale entity handle")
+        return entity.id & INDEX_MASK
+
+    def _take(self, index: int) -> Dict[type, object]:
+        signature = self.signatures[index]
+        self.signatures[index] = 0
+        return {t: self.sets[t].pop(index) for t in component_registry.types(signature)}
+
+    def spawn(self, handle: int, components: Iterable[object]) -> None:
+        index = handle & INDEX_MASK
+        if index >= len(self.signatures):
+            self.signatures.extend([0] * (index + 1 - len(self.signatures)))
+        for component in components:
+            self._insert(index, component)
+
+    def add(self, entity: EntityObject) -> None:
+        self.spawn(entity.id, entity._components.values())
+        entity._components = {}
+        entity._storage = self
+
+    def discard(self, entity: EntityObject) -> None:
+        entity._components = self._take(self._index(entity))
+        entity._storage = None
+
+    def despawn(self, index: int) -> None:
+        self._take(index)
+
+    def entity(self, index: int) -> EntityObject:
+        return EntityObject._facade(self, self.handles.handle(index), self.signatures[index])
+
+    def attach(self, entity: EntityObject, component) -> None:
+        index = self._index(entity)
+        self._insert(index, component)
+        entity.signature = self.signatures[index]
+
+    def remove(self, entity: EntityObject, component_type: type) -> bool:
+        index = self._index(entity)
+        sparse_set = self.sets.get(component_type)
+        if sparse_set is None or index not in sparse_set:
+            return False
+        sparse_set.pop(index)
+        self.signatures[index] &= ~component_registry.bit(component_type)
+        entity.signature = self.signatures[index]
+        return True
+
+    def contains(self, entity: EntityObject, component_type: type) -> bool:
+        index = self._index(entity)
+        sparse_set = self.sets.get(component_type)
+        return sparse_set is not None and index in sparse_set
+
+    def get(self, entity: EntityObject, component_type: type) -> object:
+        return self.sets[component_type].get(self._index(entity))
+
+    def components(self, entity: EntityObject) -> Dict[type, object]:
+        index = self._index(entity)
+        return {t: self.sets[t].get(index) for t in component_registry.types(self.signatures[index])}
+
+    def component_types(self, entity: EntityObject) -> FrozenSet[type]:
+        return component_registry.types(self.signatures[self._index(entity)])
+
+    def fetch(self, family: EntityFamily) -> EntityQuery:
+        key = family.signature()
+        query = self.queries.get(key)
+        if query is None:
+            query = SparseQuery(family, self)
+            self.queries[key] = query
+        return query
+
+    def _groups(self):
+        # One group per sparse set, its ids are the dense entity indices
+        for component_type, sparse_set in self.sets.items():
+            if len(sparse_set) != 0:
+                ids = np.frombuffer(sparse_set.dense, dtype=np.uintc).copy()
+                yield component_type, (component_type,), ids, {component_type: sparse_set.column}
+
+    def _group_ids(self, types: FrozenSet[type]) -> np.ndarray:
+        (component_type,) = types
+        sparse_set = self.sets.get(component_type)
+        if sparse_set is None:
+            return np.empty(0, dtype=np.uintc)
+        return np.frombuffer(sparse_set.dense, dtype=np.uintc)
+
+    def restore(self, handles: EntityHandles, snapshot: Snapshot) -> None:
+        known = {_type_name(t): t for t in component_registry.bits}
+        self._check_delta(snapshot, known)
+        _read_handles(snapshot, handles)
+        restored = set()
+        for entry in snapshot.header["groups"]:
+            types, records, objects = _read_group(snapshot, entry, known)
+            (component_type,) = types
+            sparse_set = self.sets.get(component_type)
+            if sparse_set is None:
+                sparse_set = SparseSet(component_type, self.shared)
+                self.sets[component_type] = sparse_set
+            if entry["patch"]:
+                _patch_columns(snapshot, {component_type: sparse_set.column}, records, objects)
+            else:
+                values = records[component_type][1] if component_type in records else objects[component_type]
+                sparse_set.load(snapshot.array(entry["ids"], np.uintc), values)
+            restored.add(component_type)
+
+        for component_type, sparse_set in self.sets.items():
+            if component_type not in restored:
+                sparse_set.clear()
+        self.signatures = [0] * len(handles.generations)
+        for component_type, sparse_set in self.sets.items():
+            bit = component_registry.bit(component_type)
+            for index in sparse_set.dense:
+                self.signatures[index] |= bit
+        self._snapshot_state = None
+
+    def release(self) -> None:
+        '''Frees the shared memory of every record column'''
+        for sparse_set in self.sets.values():
+            if isinstance(sparse_set.column, RecordColumn):
+                sparse_set.column.release()
+
+# endregion
+
+# region Process chunks
+
+
+# Shared memory blocks mapped by a worker process, by component type and field
+_worker_buffers: Dict[Tuple[type, str], shared_memory.SharedMemory] = {}
+
+
+def _map_buffer(component_type: type, field: str, buffer_name: str) -> shared_memory.SharedMemory:
+    '''Maps the block of a field, closing the mapping of the block it replaced when the column grew'''
+    buffer = _worker_buffers.get((component_type, field))
+    if buffer is not None and buffer.name == buffer_name:
+        return buffer
+    if buffer is not None:
+        try:
+            buffer.close()
+        except BufferError:
+            # A view kept by the chunk function is still alive, the mapping goes with it
+            pass
+    buffer = shared_memory.SharedMemory(name=buffer_name)
+    _worker_buffers[component_type, field] = buffer
+    return buffer
+
+
+def _process_chunk(function, layout: Dict[type, Dict[str, Tuple[str, str, int]]], start: int, stop: int) -> None:
+    '''Runs in a worker, maps the shared columns and hands a chunk of rows to function'''
+    columns = {}
+    for component_type, fields in layout.items():
+        arrays = {}
+        for name, (buffer_name, dtype, capacity) in fields.items():
+            buffer = _map_buffer(component_type, name, buffer_name)
+            arrays[name] = np.ndarray(capacity, dtype=dtype, buffer=buffer.buf)[start:stop]
+        columns[component_type] = RecordView(arrays)
+    function(columns)
+
+# endregion
+
+
+# region Profiling
+
+
+def percentile(values: Iterable[float], q: float) -> float:
+    '''Returns the q-th percentile of the values using the nearest rank'''
+    ordered = sorted(values)
+    if len(ordered) == 0:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def histogram(values: Iterable[float], bins: int = 20) -> Tuple[List[float], List[int]]:
+    '''Returns the bin edges and counts of the values'''
+    values = list(values)
+    if len(values) == 0:
+        return [], []
+    low = min(values)
+    width = (max(values) - low) / bins or 1.0
+    counts = [0] * bins
+    for value in values:
+        counts[min(bins - 1, int((value - low) / width))] += 1
+    return [low + width * i for i in range(bins + 1)], counts
+
+
+class SystemSample:
+    '''One run of a system within a frame
+
+    entities is the number of entities the run processed, -1 when unknown
+    '''
+
+    __slots__ = ("name", "start", "duration", "entities", "thread")
+
+    def __init__(self, name: str, start: float, duration: float, entities: int, thread: int) -> None:
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.entities = entities
+        self.thread = thread
+
+
+class FrameProfile:
+    '''Timings of one engine update'''
+
+    def __init__(self, index: int, start: float) -> None:
+        self.index = index
+        self.start = start
+        self.duration = 0.0
+        self.systems: List[SystemSample] = []
+        # System name -> time spent in on_engine_change
+        self.rebuilds: Dict[str, float] = {}
+
+
+class EngineProfiler:
+    '''Records how long each system takes, frame by frame
+
+    Keeps the last window frames, reports per system percentiles, can call
+    back at the end of every frame and export Chrome trace-event JSON to
+    load in chrome://tracing or Perfetto. Times are in seconds.
+
+    Examples:
+        engine.profiler = EngineProfiler(callback=lambda f: print(f.duration))
+        ...
+        print(engine.profiler.report())
+        engine.profiler.export_chrome_trace("frames.json")
+    '''
+
+    def __init__(self, window: int = 600, callback: Optional[Callable[[FrameProfile], None]] = None) -> None:
+        self.window = window
+        self.callback = callback
+        self.frames: Deque[FrameProfile] = deque(maxlen=window)
+        self._frame: Optional[FrameProfile] = None
+        self._frame_count = 0
+        self._rebuilds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def begin_frame(self) -> None:
+        self._frame = FrameProfile(self._frame_count, time.perf_counter())
+        self._frame_count += 1
+
+    def record_system(self, system: EntitySystem, start: float, duration: float,
+                      processed: Optional[int] = None) -> None:
+        '''Records a run, processed is the entity count the update returned if any'''
+        entities = processed if processed is not None else self._processed(system)
+        sample = SystemSample(type(system).__name__, start, duration, entities, threading.get_ident())
+        with self._lock:
+            if self._frame is not None:
+                self._frame.systems.append(sample)
+
+    @staticmethod
+    def _processed(system: EntitySystem) -> int:
+        '''Size of the current slice of the entities, -1 if it can't be had without walking them'''
+        entities = system.entities
+        if isinstance(entities, (SparseQuery, ChangeQuery)):
+            return -1
+        try:
+            count = len(entities)
+        except TypeError:
+            return -1
+        start, stop = system.slice_bounds(count)
+        return stop - start
+
+    def record_rebuild(self, system: EntitySystem, duration: float) -> None:
+        name = type(system).__name__
+        self._rebuilds[name] = self._rebuilds.get(name, 0.0) + duration
+
+    def end_frame(self) -> None:
+        frame = self._frame
+        frame.duration = time.perf_counter() - frame.start
+        # Rebuilds outside of an update are charged to the next frame
+        frame.rebuilds = self._rebuilds
+        self._rebuilds = {}
+        self._frame = None
+        self.frames.append(frame)
+        if self.callback is not None:
+            self.callback(frame)
+
+    def system_names(self) -> List[str]:
+        names = {}
+        for frame in self.frames:
+            for sample in frame.systems:
+                names[sample.name] = None
+            for name in frame.rebuilds:
+                names[name] = None
+        return list(names)
+
+    def durations(self, name: Optional[str] = None) -> List[float]:
+        '''Per frame durations of a system, or of whole frames without a name'''
+        if name is None:
+            return [frame.duration for frame in self.frames]
+        return [sum(s.duration for s in frame.systems if s.name == name) for frame in self.frames]
+
+    def percentile(self, q: float, name: Optional[str] = None) -> float:
+        return percentile(self.durations(name), q)
+
+    def histogram(self, name: Optional[str] = None, bins: int = 20) -> Tuple[List[float], List[int]]:
+        return histogram(self.durations(name), bins)
+
+    def report(self) -> str:
+        '''Returns a table of per system timings over the recorded frames'''
+        lines = [f"{'system':<24}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+                 f"{'entities':>10}{'rebuild ms':>12}"]
+        frames = len(self.frames) or 1
+        for name in self.system_names() + [None]:
+            durations = self.durations(name)
+            if name is None:
+                label, entities, rebuild = "frame", "", ""
+            else:
+                label = name
+                counts = [s.entities for f in self.frames for s in f.systems if s.name == name]
+                entities = str(max(counts, default=0))
+                rebuild = f"{sum(f.rebuilds.get(name, 0.0) for f in self.frames) * 1000 / frames:.3f}"
+            lines.append(f"{label:<24}{sum(durations) * 1000 / frames:>10.3f}"
+                         f"{percentile(durations, 50) * 1000:>10.3f}{percentile(durations, 99) * 1000:>10.3f}"
+                         f"{max(durations, default=0) * 1000:>10.3f}{entities:>10}{rebuild:>12}")
+        return "\n".join(lines)
+
+    def trace_events(self) -> List[dict]:
+        '''Returns the recorded frames as Chrome trace events'''
+        pid = 1
+        events = []
+        for frame in self.frames:
+            events.append({"name": f"frame {frame.index}", "cat": "frame", "ph": "X", "pid": pid,
+                           "tid": 0, "ts": frame.start * 1e6, "dur": frame.duration * 1e6})
+            for sample in frame.systems:
+                events.append({"name": sample.name, "cat": "system", "ph": "X", "pid": pid,
+                               "tid": sample.thread, "ts": sample.start * 1e6,
+                               "dur": sample.duration * 1e6, "args": {"entities": sample.entities}})
+        return events
+
+    def export_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+
+# endregion
+
+
+class CommandBuffer:
+    '''Queues structural changes to apply at the next engine sync point
+
+    Systems record entity creation, destruction and component changes while
+    iterating, the engine applies them in one batch once every system ran.
+    Queuing only appends to a list so threaded systems can share a buffer.
+    '''
+
+    def __init__(self) -> None:
+        self.commands: List[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def spawn(self, *components) -> EntityObject:
+        '''Queues the creation of an entity, which is returned right away'''
+        entity = EntityObject()
+        for component in components:
+            entity.attach(component)
+        self.commands.append(("spawn", entity, None))
+        return entity
+
+    def destroy(self, entity: EntityObject) -> None:
+        '''Queues the removal of an entity'''
+        self.commands.append(("destroy", entity, None))
+
+    def attach(self, entity: EntityObject, component) -> None:
+        '''Queues attaching or replacing a component'''
+        self.commands.append(("attach", entity, component))
+
+    def detach(self, entity: EntityObject, component_type: type) -> None:
+        '''Queues removing a component'''
+        self.commands.append(("detach", entity, component_type))
 
 
 class EntitySystem:
-    '''Bare-bones entity processor class'''
+    '''Bare-bones entity processor class
+
+    A system may declare the component types it reads and writes, the
+    engine then runs systems that don't conflict on the same phase. A
+    system declaring neither is assumed to touch everything and runs alone.
+    '''
+
+    reads: Optional[Tuple[type, ...]] = None
+    writes: Optional[Tuple[type, ...]] = None
+    # Updates per simulated second, None to run on every engine update
+    tick_rate: Optional[float] = None
+    # Number of updates the entities are spread across, see sliced
+    slices = 1
 
     def __init__(self):
         self.entities: List[EntityObject] = []
+        # Change tick of the previous update, 0 before the first one
+        self.last_run = 0
+        # Simulated time of the next and previous update
+        self.next_run = 0.0
+        self.last_time: Optional[float] = None
+        # Simulated time since the previous update
+        self.delta_time = 0.0
+        # Slice processed by the current update
+        self.slice = 0
 
     def on_engine_change(self, engine: EntityEngine):
         '''Filters the entities from an engine
@@ -113,46 +1919,498 @@ class EntitySystem:
                 position_component.x += velocity_component.dx
                 position_component.y += velocity_component.dy
 
-            or
+            and declare the accessed types so the engine can run it
+            alongside other systems
 
-            with multiprocessing.Pool() as pool:
-                pool.map(lambda e: self.update_entity(e), self.entities)
+            reads = (VelocityComponent,)
+            writes = (PositionComponent,)
 
+        It may return the number of entities it processed for the profiler,
+        which otherwise counts the current slice of self.entities
         '''
         pass
 
+    def on_added(self, engine: EntityEngine, entity: EntityObject):
+        '''Called before update for every entity that joined the fetched query
+
+        Covers the entities added since the previous update, on the first
+        update every entity of the query. Overriding on_added or on_removed
+        turns on change tracking.
+        '''
+        pass
+
+    def on_removed(self, engine: EntityEngine, entity: EntityObject):
+        '''Called before update for every entity that left the fetched query'''
+        pass
+
+    def slice_bounds(self, count: int) -> Tuple[int, int]:
+        '''Returns the start and stop positions of the current slice of count entities'''
+        return count * self.slice // self.slices, count * (self.slice + 1) // self.slices
+
+    def sliced(self, entities=None) -> Iterable[EntityObject]:
+        '''Returns the part of the entities to process on this update
+
+        With slices = N each update handles the next 1/N of the entities, so
+        every entity is processed once every N updates. Entities moving
+        inside a live query between updates may be skipped or seen twice.
+        '''
+        entities = self.entities if entities is None else entities
+        if self.slices <= 1:
+            return entities
+        start, stop = self.slice_bounds(len(entities))
+        if isinstance(entities, EntityQuery):
+            return entities.slice(start, stop)
+        return entities[start:stop]
+
+    def reactive(self) -> bool:
+        '''Checks if the system overrides on_added or on_removed'''
+        cls = type(self)
+        return cls.on_added is not EntitySystem.on_added or cls.on_removed is not EntitySystem.on_removed
+
+    def conflicts(self, other: EntitySystem) -> bool:
+        '''Checks if two systems can't run at the same time'''
+        if self.reads is None and self.writes is None:
+            return True
+        if other.reads is None and other.writes is None:
+            return True
+        writes = set(self.writes or ())
+        other_writes = set(other.writes or ())
+        if writes & other_writes:
+            return True
+        return bool(writes & set(other.reads or ())) or bool(other_writes & set(self.reads or ()))
+
+
+class VectorizedSystem(EntitySystem):
+    '''System processing whole columns instead of one entity at a time
+
+    on_engine_change fetches a family as usual, on an archetype storage
+    engine update then hands the columns of every matching table to
+    update_columns, record components as arrays of fields
+
+    Examples:
+        def update_columns(self, engine, columns):
+            velocity = columns[VelocityComponent]
+            velocity.dx *= 0.998
+            velocity.dy *= 0.998
+    '''
+
+    def update(self, engine: EntityEngine):
+        if not isinstance(self.entities, TableQuery):
+            raise TypeError("VectorizedSystem requires an archetype storage engine")
+        if self.slices <= 1:
+            for table in self.entities.tables:
+                if len(table) != 0:
+                    self.update_columns(engine, table.view())
+            return
+
+        start, stop = self.slice_bounds(len(self.entities))
+        offset = 0
+        for table in self.entities.tables:
+            size = len(table)
+            if offset + size > start and offset < stop:
+                self.update_columns(engine, table.view(max(start - offset, 0), min(stop - offset, size)))
+            offset += size
+
+    def update_columns(self, engine: EntityEngine, columns: Dict[type, Union[ObjectColumn, RecordView]]):
+        '''Update step for the columns of one archetype table'''
+        pass
+
+
+class ChunkedSystem(EntitySystem):
+    '''System splitting its entities into chunks processed by worker processes
+
+    On an engine with processes > 0 record columns live in shared memory and
+    process_chunk mutates them in place from the workers, nothing but the
+    column layout is pickled. process_chunk must be picklable, so a
+    staticmethod or a module level function, and only sees the record
+    components of the chunk. Without processes the chunks run inline.
+
+    Examples:
+        @staticmethod
+        def process_chunk(columns):
+            position = columns[PositionComponent]
+            for i in range(len(position.x)):
+                position.x[i] = expensive(position.x[i])
+    '''
+
+    chunk_size = 16384
+
+    @staticmethod
+    def process_chunk(columns: Dict[type, RecordView]) -> None:
+        pass
+
+    def update(self, engine: EntityEngine):
+        engine.map_chunks(self.process_chunk, self.entities, self.chunk_size)
+
 
 class EntityEngine:
     '''
     Main class of the framework, manages all entities, systems and listeners.
+
+    The storage decides how components are laid out, DICT_STORAGE keeps them
+    inside each entity, ARCHETYPE_STORAGE groups them in column tables and
+    SPARSE_STORAGE keeps one sparse set per component type without needing
+    an object per entity. Entities are identified by generational handles.
+    With more than one worker, systems of the same schedule phase run on a
+    thread pool, which pays off for NumPy backed systems releasing the GIL.
+    With processes, ChunkedSystem chunks are dispatched to a process pool
+    working over shared memory, this needs ARCHETYPE_STORAGE.
+
+    Each update is one fixed step of simulated time, advance turns elapsed
+    real time into steps. Systems with a tick rate only run on the steps
+    they are due.
     '''
 
-    def __init__(self) -> None:
+    def __init__(self, storage: str = DICT_STORAGE, workers: int = 1, processes: int = 0,
+                 timestep: float = 1 / 60) -> None:
         self.systems: List[EntitySystem] = []
-        self.entities: List[EntityObject] = []
+        self.timestep = timestep
+        # Simulated time and number of updates so far
+        self.time = 0.0
+        self.frame = 0
+        # Real time not yet simulated, and the most steps one advance runs
+        self.accumulator = 0.0
+        self.max_steps = 5
+        self.handles = EntityHandles()
+        self.workers = workers
+        self.processes = processes
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._schedule: Tuple[Tuple[EntitySystem, ...], List[List[EntitySystem]]] = ((), [])
+        self.commands = CommandBuffer()
+        self.profiler: Optional[EngineProfiler] = None
+        self._change_queries: Dict[tuple, ChangeQuery] = {}
+        if storage == DICT_STORAGE:
+            self.storage: ComponentStorage = DictStorage()
+        elif storage == ARCHETYPE_STORAGE:
+            self.storage = ArchetypeStorage(shared=processes > 0)
+        elif storage == SPARSE_STORAGE:
+            self.storage = SparseStorage(self.handles)
+        else:
+            raise ValueError(f"Unknown storage {storage!r}")
+        if processes > 0 and storage != ARCHETYPE_STORAGE:
+            raise ValueError("Process chunking requires archetype storage")
+
+    @property
+    def entities(self) -> List[EntityObject]:
+        '''The entities of the engine'''
+        return self.storage.entities
+
+    def register_component(self, *component_types: type) -> None:
+        '''Reserves bit indices for component types ahead of their first use'''
+        component_registry.mask(component_types)
 
-    def fetch(self, family: EntityFamily):
-        '''Returns a list of entities that match the family filter'''
-        return filter(lambda e: family.matches(e), self.entities)
+    def fetch(self, family: EntityFamily) -> EntityQuery:
+        '''Returns a live query over the entities that match the family filter
+
+        The query is cached per family signature and can be iterated every
+        frame, it follows entity and component changes on its own. Families
+        with added or changed filters give a ChangeQuery and turn on change
+        tracking.
+        '''
+        query = self.storage.fetch(family)
+        if not family.s_added and not family.s_changed:
+            return query
+        key = (family.signature(), component_registry.mask(family.s_added),
+               component_registry.mask(family.s_changed))
+        change_query = self._change_queries.get(key)
+        if change_query is None:
+            change_query = ChangeQuery(family, query, self)
+            self._change_queries[key] = change_query
+            self.storage.changes.enabled = True
+        return change_query
 
     def notify_entity_change(self):
         '''Updates the entities of all systems'''
+        profiler = self.profiler
         for s in self.systems:
+            if profiler is None:
+                s.on_engine_change(self)
+                continue
+            start = time.perf_counter()
             s.on_engine_change(self)
+            profiler.record_rebuild(s, time.perf_counter() - start)
 
     def add_entity(self, entity: EntityObject, notify_change=True):
         '''Adds an an entity and updates all systems'''
-        self.entities.append(entity)
+        if entity._storage is not None:
+            raise ValueError("Entity is already in an engine")
+        entity.id = self.handles.allocate()
+        self.storage.add(entity)
+        if self.storage.changes.enabled:
+            self.storage.changes.mark_added(entity.id, entity, None, entity.component_types())
         if notify_change:
             self.notify_entity_change()
 
     def remove_entity(self, entity: EntityObject, notify_change=True):
-        '''Removes an an entity and updates all systems'''
-        self.entities.remove(entity)
+        '''Removes an an entity and updates all systems
+
+        Removal is O(1), the entity handle becomes stale and its index is
+        recycled by a later entity
+        '''
+        if not self.has_entity(entity):
+            raise ValueError("Entity is not in the engine")
+        if self.storage.changes.enabled:
+            self.storage.changes.mark_removed(entity.id, entity, entity.signature)
+        self.storage.discard(entity)
+        self.handles.release(entity.id)
         if notify_change:
             self.notify_entity_change()
 
-    def update(self) -> None:
-        '''Updates all systems'''
+    def snapshot(self, delta: bool = False) -> bytes:
+        '''Serializes the component storage column by column
+
+        Record columns are written as raw arrays, other columns are pickled.
+        A delta snapshot only holds the rows and columns that changed since
+        the previous snapshot and must be restored on top of it. Archetype
+        tables, sparse sets and, for DICT_STORAGE, the components of each
+        type are written as separate groups of columns.
+        '''
+        return self.storage.snapshot(self.handles, delta)
+
+    def restore(self, data) -> None:
+        '''Restores a snapshot and updates all systems
+
+        data can be any buffer, such as an mmap of a saved snapshot. Entities
+        keep their handles and objects, entities created since are emptied.
+        Deltas apply on top of the state they were taken from, take a full
+        snapshot again before the next delta. Change tracking starts over,
+        systems see every restored entity as added.
+        '''
+        self.storage.restore(self.handles, Snapshot(data))
+        self.storage.changes.clear()
         for s in self.systems:
-            s.update(self)
+            s.last_run = 0
+        self.notify_entity_change()
+
+    def spawn(self, *components) -> int:
+        '''Creates an entity from its components and returns its handle
+
+        Doesn't notify the systems, on SPARSE_STORAGE no EntityObject is made
+        '''
+        handle = self.handles.allocate()
+        self.storage.spawn(handle, components)
+        if self.storage.changes.enabled:
+            self.storage.changes.mark_added(handle, None, None, [type(c) for c in components])
+        return handle
+
+    def despawn(self, handle: int) -> None:
+        '''Removes the entity of a handle, doesn't notify the systems'''
+        if not self.handles.alive(handle):
+            raise ValueError("Stale entity handle")
+        if self.storage.changes.enabled:
+            entity = self.storage.entity(handle & INDEX_MASK)
+            self.storage.changes.mark_removed(handle, entity, entity.signature)
+        self.storage.despawn(handle & INDEX_MASK)
+        self.handles.release(handle)
+
+    def has_entity(self, entity: EntityObject) -> bool:
+        '''Checks if the entity belongs to the engine'''
+        return entity._storage is self.storage and self.handles.alive(entity.id)
+
+    def get_entity(self, handle: int) -> Optional[EntityObject]:
+        '''Returns the entity of a handle, None if the handle is stale'''
+        if not self.handles.alive(handle):
+            return None
+        return self.storage.entity(handle & INDEX_MASK)
+
+    def flush(self) -> None:
+        '''Applies the queued commands and updates all systems once'''
+        if len(self.commands) == 0:
+            return
+        commands = self.commands.commands
+        self.commands.commands = []
+        for command, entity, argument in commands:
+            if command == "spawn":
+                self.add_entity(entity, False)
+            elif command == "destroy":
+                # Several systems may queue the destruction of one entity
+                if self.has_entity(entity):
+                    self.remove_entity(entity, False)
+            elif command == "attach":
+                entity.attach(argument)
+            else:
+                entity.remove(argument)
+        self.notify_entity_change()
+
+    def schedule(self) -> List[List[EntitySystem]]:
+        '''Returns the phases the systems run in
+
+        A system goes on the phase after the last earlier system it conflicts
+        with, so conflicting systems keep their relative order while the
+        systems of a phase can run concurrently
+        '''
+        systems = tuple(self.systems)
+        if self._schedule[0] == systems:
+            return self._schedule[1]
+
+        phases: List[List[EntitySystem]] = []
+        phase_of: List[int] = []
+        for i, system in enumerate(systems):
+            phase = 0
+            for j in range(i):
+                if phase_of[j] >= phase and system.conflicts(systems[j]):
+                    phase = phase_of[j] + 1
+            if phase == len(phases):
+                phases.append([])
+            phases[phase].append(system)
+            phase_of.append(phase)
+
+        self._schedule = (systems, phases)
+        return phases
+
+    def _react(self, system: EntitySystem, since: int) -> None:
+        '''Calls on_added and on_removed for the query changes since a tick'''
+        query = system.entities
+        if not isinstance(query, EntityQuery):
+            return
+        if since == 0:
+            for entity in list(query):
+                system.on_added(self, entity)
+            return
+
+        # The signature before the first change tells if it used to match
+        first: Dict[int, tuple] = {}
+        for tick, handle, entity, signature in list(self.storage.changes.moves):
+            if tick > since and handle not in first:
+                first[handle] = (entity, signature)
+        matches = query.family.matches_signature
+        for handle, (entity, signature) in first.items():
+            was = signature is not None and matches(signature)
+            current = self.get_entity(handle)
+            now = current is not None and matches(current.signature)
+            if now and not was:
+                system.on_added(self, current)
+            elif was and not now:
+                system.on_removed(self, current or entity)
+
+    def _run(self, system: EntitySystem) -> None:
+        changes = self.storage.changes
+        since = system.last_run
+        system.last_run = changes.begin(since)
+        try:
+            if system.reactive():
+                changes.enabled = True
+                self._react(system, since)
+
+            profiler = self.profiler
+            if profiler is None:
+                system.update(self)
+                return
+            start = time.perf_counter()
+            processed = system.update(self)
+            profiler.record_system(system, start, time.perf_counter() - start, processed)
+        finally:
+            changes.end()
+
+    def _due(self, system: EntitySystem) -> bool:
+        '''Checks if a system runs on the current step and prepares its timing'''
+        if system.tick_rate is not None:
+            # Tolerance for the rounding of the accumulated step times
+            if system.next_run > self.time + 1e-9:
+                return False
+            system.next_run = max(system.next_run + 1 / system.tick_rate, self.time)
+        if system.last_time is None:
+            system.delta_time = self.timestep if system.tick_rate is None else 1 / system.tick_rate
+        else:
+            system.delta_time = self.time - system.last_time
+            system.slice = (system.slice + 1) % system.slices
+        system.last_time = self.time
+        return True
+
+    def update(self) -> None:
+        '''Runs one fixed step of the due systems then applies the queued commands'''
+        if self.profiler is not None:
+            self.profiler.begin_frame()
+
+        if self.workers <= 1:
+            for s in self.systems:
+                if self._due(s):
+                    self._run(s)
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers)
+            for phase in self.schedule():
+                phase = [s for s in phase if self._due(s)]
+                if len(phase) == 0:
+                    continue
+                if len(phase) == 1:
+                    self._run(phase[0])
+                    continue
+                # Waiting on every future is the barrier between phases
+                futures = [self._executor.submit(self._run, s) for s in phase]
+                for future in futures:
+                    future.result()
+        self.flush()
+
+        changes = self.storage.changes
+        if changes.enabled:
+            # Keep what the system that ran the longest ago hasn't seen yet
+            ticks = [s.last_run for s in self.systems if s.last_run > 0]
+            changes.prune(min(ticks, default=changes.tick))
+
+        self.frame += 1
+        self.time += self.timestep
+        if self.profiler is not None:
+            self.profiler.end_frame()
+
+    def advance(self, elapsed: float) -> int:
+        '''Runs as many fixed steps as fit in the elapsed real time
+
+        The remainder carries over to the next call. Past max_steps the
+        backlog is dropped so a slow frame doesn't snowball into slower ones.
+        Returns the number of steps run.
+        '''
+        self.accumulator += elapsed
+        steps = 0
+        while self.accumulator >= self.timestep and steps < self.max_steps:
+            self.update()
+            self.accumulator -= self.timestep
+            steps += 1
+        if self.accumulator >= self.timestep:
+            self.accumulator %= self.timestep
+        return steps
+
+    @property
+    def alpha(self) -> float:
+        '''Fraction of a step left in the accumulator, to interpolate rendering'''
+        return self.accumulator / self.timestep
+
+    def map_chunks(self, function, query: EntityQuery, chunk_size: int) -> None:
+        '''Calls function over chunks of the record columns of a query
+
+        With processes the chunks run on the process pool, this returns once
+        every chunk is done
+        '''
+        if not isinstance(query, TableQuery):
+            raise TypeError("Chunked processing requires an archetype storage engine")
+
+        if self.processes <= 0:
+            for table in query.tables:
+                columns = table.record_columns()
+                for start in range(0, len(table), chunk_size):
+                    stop = min(start + chunk_size, len(table))
+                    function({t: c.view(start, stop) for t, c in columns.items()})
+            return
+
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(self.processes)
+        futures = []
+        for table in query.tables:
+            layout = {t: c.layout() for t, c in table.record_columns().items()}
+            for start in range(0, len(table), chunk_size):
+                stop = min(start + chunk_size, len(table))
+                futures.append(self._process_pool.submit(_process_chunk, function, layout, start, stop))
+        for future in futures:
+            future.result()
+
+    def close(self) -> None:
+        '''Shuts down the worker threads and processes and frees shared memory'''
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+            self._process_pool = None
+        if self.processes > 0:
+            self.storage.release()
@@ -1,11 +1,23 @@
 '''A simple calculator parser using RPN to parse a string
 '''
 
+import ast
+from collections import OrderedDict
+from functools import lru_cache
+import keyword
 import re
 from math import *
 
+try:
+    import numpy as np
+except ImportError:  # Only evaluating over arrays needs numpy
+    np = None
+
 
 def is_float(string):
+    # Numbers are written with digits, names such as nan or inf are variables
+    if string.isidentifier():
+        return False
     try:
         float(string)
         return True
@@ -13,32 +25,30 @@ def is_float(string):
         return False
 
 
+@lru_cache(maxsize=64)
+def _token_regex(keys):
+    """Compiles the tokenizer regex of an operations table, given its keys
+    """
+
+    # Regex shortcut to split the string using the operations as the separators
+    float_regex = r"\d*\.?\d+|[\(\)]"
+    # Longest symbols first so a symbol isn't split on another one it starts with
+    for key in sorted(keys, key=len, reverse=True):
+        if not key.isidentifier():
+            float_regex += "|" + re.escape(key)
+    # Names are matched whole, then told apart as operations or variables,
+    # so a variable like cost isn't split into the cos operation and t
+    float_regex += r"|[A-Za-z_]\w*"
+    return re.compile(float_regex)
+
+
 def tokenize(string, operations):
     """Splits a string into a list using the operations as the separators
     """
 
     # Just removing whitespace
     string = string.replace(" ", "")
-
-    # What the fuck?
-    # Regex shortcut to split the string using the operations as the separators
-    float_regex = "\d*\.?\d+|[\(\)]"
-    for key in operations.keys():
-        value = operations[key]
-        if len(key) == 1:
-            float_regex += "|" + "[\\" + key + "]"
-        else:
-            float_regex += "|" + key
-        # "|".join(operations)
-        # pass
-    rgx = re.compile(float_regex)
-
-    results = rgx.finditer(string)
-    exprList = []
-    for reg in results:
-        start, end = reg.span()
-        exprList.append(string[start: end])
-    return exprList
+    return _token_regex(tuple(operations)).findall(string)
 
 
 def to_rpn(tokens, operations):
@@ -57,13 +67,16 @@ def to_rpn(tokens, operations):
             while op_stack[-1] != "(":
                 out_queue.append(op_stack.pop())
             op_stack.pop()
-        elif token in list(operations.keys()):
+        elif token in operations:
             if operations[token].priority >= 0:
                 while len(op_stack) >= 1 and op_stack[-1] != "(" and (
                         operations[op_stack[-1]].priority >= operations[token].priority):
                     # If brackets are unbalanced, popping the stack will throw an error
                     out_queue.append(op_stack.pop())
             op_stack.append(token)
+        elif token.isidentifier():
+            # Variables are values like the numbers
+            out_queue.append(token)
 
     while len(op_stack) != 0:
         out_queue.append(op_stack.pop())
@@ -76,7 +89,7 @@ def calculate(rpn_tokens, operations):
     for token in rpn_tokens:
         if(is_float(token)):
             val_stack.append(token)
-        elif token in list(operations.keys()):
+        elif token in operations:
             args = []
             for x in range(operations[token].lmbd.__code__.co_argcount):
                 # If this throws an error user didn't give enough args for a function
@@ -96,3 +109,328 @@ def calculate_string(string, operations):
     tokenized = tokenize(string, operations)
     rpn = to_rpn(tokenized, operations)
     return calculate(rpn, operations)
+
+
+# Types ast.Constant can hold, other folded values are bound like the operations
+_LITERALS = (int, float, complex, bool)
+
+# Deepest call nesting left in a generated expression, deeper calls go through locals
+# as the compiler recurses on nested expressions
+_MAX_NESTING = 64
+
+
+def _build_tree(rpn, operations):
+    """Turns RPN into a table of hash consed nodes, folding calls on constants
+
+    ("c", repr, value) is a number, ("v", name) a variable and
+    ("f", function, arguments) an operation call on the table indices of its
+    arguments, equal subtrees share an index. Calls without arguments are
+    never folded or shared. Returns the table and the root index
+    """
+
+    nodes = []
+    indices = {}
+
+    def add(node, key):
+        index = indices.get(key)
+        if index is None:
+            index = indices[key] = len(nodes)
+            nodes.append(node)
+        return index
+
+    def constant(value):
+        # Keyed on the repr, folded values may not be hashable
+        return add(("c", repr(value), value), ("c", type(value), repr(value)))
+
+    stack = []
+    for token in rpn:
+        if token in operations:
+            function = operations[token].lmbd
+            count = function.__code__.co_argcount
+            if not count:
+                # Nothing to fold or share, each call may give a new value
+                stack.append(len(nodes))
+                nodes.append(("f", function, ()))
+                continue
+            # The first argument is the top of the stack
+            args = tuple(reversed(stack[-count:]))
+            del stack[-count:]
+            if all(nodes[arg][0] == "c" for arg in args):
+                try:
+                    stack.append(constant(function(*(nodes[arg][2] for arg in args))))
+                    continue
+                except Exception:
+                    # Left for the call to raise at run time
+                    pass
+            node = ("f", function, args)
+            stack.append(add(node, node))
+        elif token.isidentifier():
+            node = ("v", token)
+            stack.append(add(node, node))
+        else:
+            stack.append(constant(float(token)))
+
+    # If the value stack is bigger than one we probably made an error
+    assert len(stack) == 1
+    return nodes, stack[0]
+
+
+def to_function(rpn, operations, variables=None):
+    """Generates a Python function computing the RPN from to_rpn
+
+    Calls on constants are folded and repeated subtrees are computed once
+    into locals. The operations are bound as closure constants and the
+    parameters are the variables, in order of first appearance by default.
+    """
+
+    nodes, root = _build_tree(rpn, operations)
+    if variables is None:
+        variables = []
+        for token in rpn:
+            if token not in operations and token.isidentifier() and token not in variables:
+                variables.append(token)
+
+    # Calls reached more than once become locals
+    uses = [0] * len(nodes)
+    pending = [root]
+    while pending:
+        index = pending.pop()
+        uses[index] += 1
+        if nodes[index][0] == "f" and uses[index] == 1:
+            pending.extend(nodes[index][2])
+
+    bound = {}
+    parameters = {name: name if name.isidentifier() and not keyword.iskeyword(name) and not name.startswith("_")
+                  else f"_v{i}" for i, name in enumerate(variables)}
+    body = []
+    assigned = {}
+
+    def bind(value):
+        key = id(value)
+        if key not in bound:
+            bound[key] = (f"_b{len(bound)}", value)
+        return ast.Name(bound[key][0], ast.Load())
+
+    def emit(root):
+        # Walks the table in post order with a stack, long formulas nest too
+        # deep to recurse. Results are expressions and their nesting depth
+        results = []
+        pending = [(root, False)]
+        while pending:
+            index, ready = pending.pop()
+            node = nodes[index]
+            if node[0] == "c":
+                value = node[2]
+                results.append((ast.Constant(value) if type(value) in _LITERALS else bind(value), 1))
+            elif node[0] == "v":
+                results.append((ast.Name(parameters[node[1]], ast.Load()), 1))
+            elif index in assigned:
+                results.append((ast.Name(assigned[index], ast.Load()), 1))
+            elif not ready:
+                # The call is built once its arguments are on the results
+                pending.append((index, True))
+                pending.extend((arg, False) for arg in reversed(node[2]))
+            else:
+                start = len(results) - len(node[2])
+                args = results[start:]
+                del results[start:]
+                call = ast.Call(bind(node[1]), [arg for arg, _ in args], [])
+                depth = 1 + max((depth for _, depth in args), default=0)
+                if uses[index] < 2 and depth < _MAX_NESTING:
+                    results.append((call, depth))
+                    continue
+                assigned[index] = name = f"_t{len(assigned)}"
+                body.append(ast.Assign([ast.Name(name, ast.Store())], call))
+                results.append((ast.Name(name, ast.Load()), 1))
+        return results[0][0]
+
+    body.append(ast.Return(emit(root)))
+    arguments = ast.arguments(posonlyargs=[], args=[ast.arg(parameters[name]) for name in variables],
+                              kwonlyargs=[], kw_defaults=[], defaults=[])
+    inner = ast.FunctionDef("expression", arguments, body, [], lineno=1)
+    names = [name for name, _ in bound.values()]
+    outer = ast.FunctionDef("make", ast.arguments(posonlyargs=[], args=[ast.arg(name) for name in names],
+                                                  kwonlyargs=[], kw_defaults=[], defaults=[]),
+                            [inner, ast.Return(ast.Name("expression", ast.Load()))], [], lineno=1)
+    module = ast.Module([outer], type_ignores=[])
+    # Like ast.fix_missing_locations, which recurses
+    for node in ast.walk(module):
+        if "lineno" in node._attributes:
+            node.lineno = node.end_lineno = 1
+            node.col_offset = node.end_col_offset = 0
+
+    namespace = {}
+    exec(compile(module, "<expression>", "exec"), namespace)
+    return namespace["make"](*(value for _, value in bound.values()))
+
+
+class Expression:
+    """A parsed string kept as a ready to run RPN program
+
+    Numbers are parsed and operations looked up once, so evaluating only
+    runs the stack machine. Names that aren't operations are variables,
+    given by keyword or positionally in order of first appearance.
+
+    Given NumPy arrays for its variables the program runs once over whole
+    arrays. An operation can supply an array version of its lambda in a
+    vectorized field, otherwise its lambda is called with the arrays and
+    falls back to running element by element if that fails.
+
+    Examples:
+        area = compile_expression("pi * r ^ 2", operations)
+        area(pi=3.14159, r=2)
+        area(pi=3.14159, r=np.linspace(0, 1, 1000))
+
+        OpBehaviour = namedtuple('OpBehaviour', 'priority lmbd vectorized', defaults=(None,))
+        operations["sin"] = OpBehaviour(99, lambda x: sin(x), np.sin)
+    """
+
+    def __init__(self, string, operations):
+        self.source = string
+        self.operations = operations
+        self.rpn = to_rpn(tokenize(string, operations), operations)
+
+        variables = []
+        # (function, argument count) for operations, (None, value) for numbers, (None, None) for variables
+        self.program = []
+        # Array versions of the operations by program index, resolved on the first array evaluation
+        self._vectorized = {}
+        self._array_program = None
+        self._function = None
+        for token in self.rpn:
+            if token in operations:
+                function = operations[token].lmbd
+                vectorized = getattr(operations[token], "vectorized", None)
+                if vectorized is not None:
+                    self._vectorized[len(self.program)] = vectorized
+                self.program.append((function, function.__code__.co_argcount, None))
+            elif token.isidentifier():
+                if token not in variables:
+                    variables.append(token)
+                self.program.append((None, None, token))
+            else:
+                self.program.append((None, float(token), None))
+        self.variables = tuple(variables)
+
+    def evaluate(self, variables):
+        """Runs the program with the variables mapping names to values
+        """
+
+        return self._run(self.program, variables)
+
+    @property
+    def function(self):
+        """The program as a generated Python function of the variables, see to_function
+        """
+
+        if self._function is None:
+            self._function = to_function(self.rpn, self.operations, self.variables)
+        return self._function
+
+    def evaluate_array(self, variables):
+        """Runs the program once over the arrays the variables map names to
+        """
+
+        if np is None:
+            raise ImportError("Evaluating over arrays requires numpy")
+        if self._array_program is None:
+            self._array_program = [
+                (self._vectorized.get(index) or _broadcasting(function, value), value, name)
+                if function is not None else (function, value, name)
+                for index, (function, value, name) in enumerate(self.program)]
+
+        arrays = {name: np.asarray(variables[name], dtype=np.float64) for name in self.variables}
+        result = self._run(self._array_program, arrays)
+        return np.broadcast_to(result, np.broadcast_shapes(*(a.shape for a in arrays.values()))).copy()
+
+    @staticmethod
+    def _run(program, variables):
+        stack = []
+        push = stack.append
+        for function, value, name in program:
+            if function is None:
+                push(value if name is None else variables[name])
+            elif value == 0:
+                # stack[-0:] would be the whole stack
+                push(function())
+            elif value == 1:
+                stack[-1] = function(stack[-1])
+            elif value == 2:
+                right = stack.pop()
+                stack[-1] = function(right, stack[-1])
+            else:
+                # The first argument is the top of the stack
+                args = stack[-value:]
+                del stack[-value:]
+                push(function(*reversed(args)))
+
+        # If the value stack is bigger than one we probably made an error
+        assert len(stack) == 1
+        return stack[0]
+
+    def __call__(self, *args, **kwargs):
+        """Evaluates with values given positionally in the order of the variables or by name
+
+        Names that aren't variables are ignored. NumPy arrays run the program
+        over whole arrays, other values run the generated function
+        """
+
+        variables = self.variables
+        if len(args) > len(variables):
+            raise TypeError(f"{self!r} takes {len(variables)} values but {len(args)} were given")
+        values = dict(kwargs)
+        for name, value in zip(variables, args):
+            if name in values:
+                raise TypeError(f"{self!r} got multiple values for {name!r}")
+            values[name] = value
+        missing = [name for name in variables if name not in values]
+        if missing:
+            raise TypeError(f"{self!r} is missing values for {', '.join(missing)}")
+
+        arguments = [values[name] for name in variables]
+        if np is not None and any(isinstance(value, np.ndarray) for value in arguments):
+            return self.evaluate_array(values)
+        return self.function(*arguments)
+
+    def __repr__(self):
+        return f"Expression({self.source!r})"
+
+
+def _broadcasting(function, argument_count):
+    """Wraps a scalar operation to take arrays, element by element when it can't take them whole
+    """
+
+    elementwise = np.frompyfunc(function, argument_count, 1)
+
+    def call(*args):
+        try:
+            return function(*args)
+        except (TypeError, ValueError):
+            return elementwise(*args).astype(np.float64)
+    return call
+
+
+# Most recently used expressions, keyed on the source and the operations table
+COMPILE_CACHE_SIZE = 4096
+_compiled = OrderedDict()
+
+
+def compile_expression(string, operations):
+    """Returns the Expression of the string, reusing it if it was compiled recently
+
+    The operations table is resolved when compiling, changes to it
+    aren't seen by the expressions already compiled with it
+    """
+
+    key = (string, id(operations))
+    expression = _compiled.get(key)
+    # The cached expression keeps its table alive, so a matching id is the same table
+    if expression is not None:
+        _compiled.move_to_end(key)
+        return expression
+
+    expression = Expression(string, operations)
+    _compiled[key] = expression
+    while len(_compiled) > COMPILE_CACHE_SIZE:
+        _compiled.popitem(last=False)
+    return expression
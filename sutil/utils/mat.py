@@ -0,0 +1,305 @@
+'''Square matrices for 2D/3D transforms
+
+Matrices act on column vectors, `m * v` transforms v and `a * b` applies b
+then a, so world = parent * local. The entries live in a NumPy array, dat,
+so unlike the vector types this module can't be used without NumPy.
+'''
+
+from __future__ import annotations
+from math import tan
+from typing import Optional, Union
+
+import numpy as np
+
+from sutil.math.vector import Quaternion, QuaternionArray, Vector3, Vector3Array
+
+
+class _Matrix:
+    '''Shared behaviour of the square matrix types'''
+
+    size = 0
+
+    def __init__(self, dat=None) -> None:
+        if dat is None:
+            self.dat = np.identity(self.size)
+        else:
+            self.dat = np.array(dat, dtype=np.float64)
+            if self.dat.shape != (self.size, self.size):
+                raise ValueError(f"Expected a {self.size}x{self.size} matrix")
+
+    @classmethod
+    def identity(cls):
+        return cls()
+
+    @classmethod
+    def _wrap(cls, dat: np.ndarray):
+        matrix = cls.__new__(cls)
+        matrix.dat = dat
+        return matrix
+
+    @property
+    def determinant(self) -> float:
+        return float(np.linalg.det(self.dat))
+
+    def transpose(self):
+        return self._wrap(self.dat.T.copy())
+
+    def inverse(self):
+        '''Raises numpy.linalg.LinAlgError for singular matrices'''
+        return self._wrap(np.linalg.inv(self.dat))
+
+    def copy(self):
+        return self._wrap(self.dat.copy())
+
+    def __mul__(self, other):
+        if isinstance(other, type(self)):
+            return self._wrap(self.dat @ other.dat)
+        if isinstance(other, Vector3):
+            return self.transform_point(other)
+        if isinstance(other, Vector3Array):
+            return self.transform_points(other)
+        if isinstance(other, (int, float)):
+            return self._wrap(self.dat * other)
+        return NotImplemented
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, type(self)):
+            return NotImplemented
+        return bool(np.array_equal(self.dat, other.dat))
+
+    def almost_equal(self, other, tolerance: float = 1e-9) -> bool:
+        return bool(np.allclose(self.dat, other.dat, rtol=0, atol=tolerance))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.dat.tolist()})"
+
+
+class Matrix33(_Matrix):
+    '''3x3 matrix for rotations and scales of 3D points'''
+
+    size = 3
+
+    @classmethod
+    def from_quaternion(cls, rotation: Quaternion) -> Matrix33:
+        return cls(rotation.rotation_matrix())
+
+    @classmethod
+    def from_scale(cls, scale: Vector3) -> Matrix33:
+        return cls._wrap(np.diag([scale.x, scale.y, scale.z]).astype(np.float64))
+
+    def transform_point(self, point: Vector3) -> Vector3:
+        return Vector3(*(self.dat @ (point.x, point.y, point.z)).tolist())
+
+    def transform_points(self, points: Vector3Array) -> Vector3Array:
+        return Vector3Array._make(np.tensordot(self.dat, np.stack(points._arrays()), axes=1))
+
+
+class Matrix44(_Matrix):
+    '''4x4 matrix for affine and projective transforms of 3D points
+
+    Examples:
+        model = Matrix44.from_trs(Vector3(1, 0, 0), Quaternion(), Vector3(2, 2, 2))
+        view = Matrix44.look_at(Vector3(0, 0, 5), Vector3(), Vector3(0, 1, 0))
+        projection = Matrix44.perspective(radians(60), 16 / 9, 0.1, 100)
+        clip = (projection * view * model).transform_points(vertices)
+    '''
+
+    size = 4
+
+    @classmethod
+    def from_translation(cls, translation: Vector3) -> Matrix44:
+        matrix = cls()
+        matrix.dat[:3, 3] = (translation.x, translation.y, translation.z)
+        return matrix
+
+    @classmethod
+    def from_rotation(cls, rotation: Quaternion) -> Matrix44:
+        return cls.from_trs(Vector3(), rotation, Vector3(1, 1, 1))
+
+    @classmethod
+    def from_scale(cls, scale: Vector3) -> Matrix44:
+        return cls._wrap(np.diag([scale.x, scale.y, scale.z, 1.0]).astype(np.float64))
+
+    @classmethod
+    def from_trs(cls, translation: Vector3, rotation: Quaternion, scale: Vector3) -> Matrix44:
+        '''Scales, then rotates, then translates'''
+        matrix = cls()
+        matrix.dat[:3, :3] = np.array(rotation.rotation_matrix()) * (scale.x, scale.y, scale.z)
+        matrix.dat[:3, 3] = (translation.x, translation.y, translation.z)
+        return matrix
+
+    @classmethod
+    def perspective(cls, fov_y: float, aspect: float, near: float, far: float) -> Matrix44:
+        '''Right handed perspective projection to [-1, 1] clip space, fov_y in radians'''
+        f = 1 / tan(fov_y / 2)
+        return cls([[f / aspect, 0, 0, 0],
+                    [0, f, 0, 0],
+                    [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+                    [0, 0, -1, 0]])
+
+    @classmethod
+    def orthographic(cls, left: float, right: float, bottom: float, top: float,
+                     near: float, far: float) -> Matrix44:
+        '''Right handed orthographic projection to [-1, 1] clip space'''
+        return cls([[2 / (right - left), 0, 0, -(right + left) / (right - left)],
+                    [0, 2 / (top - bottom), 0, -(top + bottom) / (top - bottom)],
+                    [0, 0, -2 / (far - near), -(far + near) / (far - near)],
+                    [0, 0, 0, 1]])
+
+    @classmethod
+    def look_at(cls, eye: Vector3, target: Vector3, up: Vector3) -> Matrix44:
+        '''View matrix of a camera at eye looking at target, the camera looks down -z'''
+        forward = (target - eye).normalized()
+        side = forward.cross(up).normalized()
+        up = side.cross(forward)
+        return cls([[side.x, side.y, side.z, -side.dot(eye)],
+                    [up.x, up.y, up.z, -up.dot(eye)],
+                    [-forward.x, -forward.y, -forward.z, forward.dot(eye)],
+                    [0, 0, 0, 1]])
+
+    @property
+    def translation(self) -> Vector3:
+        return Vector3(*self.dat[:3, 3].tolist())
+
+    @property
+    def affine(self) -> bool:
+        return bool(np.array_equal(self.dat[3], (0, 0, 0, 1)))
+
+    def normal_matrix(self) -> Matrix33:
+        '''Inverse transpose of the upper 3x3, transforms normals'''
+        return Matrix33._wrap(np.linalg.inv(self.dat[:3, :3]).T)
+
+    def transform_point(self, point: Vector3) -> Vector3:
+        '''Transforms a point, dividing by w for projective matrices
+
+        Raises ZeroDivisionError for a point mapped to infinity, such as one
+        on the eye plane of a perspective projection
+        '''
+        x, y, z, w = (self.dat @ (point.x, point.y, point.z, 1.0)).tolist()
+        if w == 0.0:
+            raise ZeroDivisionError("The point is mapped to infinity, w is 0")
+        if w != 1.0:
+            return Vector3(x / w, y / w, z / w)
+        return Vector3(x, y, z)
+
+    def transform_direction(self, direction: Vector3) -> Vector3:
+        '''Transforms a direction, ignoring the translation'''
+        return Vector3(*(self.dat[:3, :3] @ (direction.x, direction.y, direction.z)).tolist())
+
+    def transform_points(self, points: Vector3Array) -> Vector3Array:
+        '''Transforms every point of an array, dividing by w for projective matrices
+
+        Points mapped to infinity, where w is 0, come out as inf or nan
+        without a warning, a single one doesn't fail the whole array
+        '''
+        dat = self.dat
+        transformed = np.tensordot(dat[:3, :3], np.stack(points._arrays()), axes=1)
+        transformed += dat[:3, 3].reshape((3,) + (1,) * (transformed.ndim - 1))
+        if not self.affine:
+            w = np.tensordot(dat[3, :3], np.stack(points._arrays()), axes=1) + dat[3, 3]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                transformed /= w
+        return Vector3Array._make(transformed)
+
+
+class Matrix44Array:
+    '''A stack of Matrix44 held in one (n, 4, 4) array
+
+    Products, inverses and point transforms run for every matrix at once,
+    a single Matrix44 operand applies to all of them
+    '''
+
+    def __init__(self, dat) -> None:
+        self.dat = np.array(dat, dtype=np.float64)
+        if self.dat.ndim != 3 or self.dat.shape[1:] != (4, 4):
+            raise ValueError("Expected an array of shape (n, 4, 4)")
+
+    @classmethod
+    def _wrap(cls, dat: np.ndarray) -> Matrix44Array:
+        matrices = cls.__new__(cls)
+        matrices.dat = dat
+        return matrices
+
+    @classmethod
+    def identity(cls, count: int) -> Matrix44Array:
+        return cls._wrap(np.tile(np.identity(4), (count, 1, 1)))
+
+    @classmethod
+    def from_trs(cls, translations: Vector3Array, rotations: QuaternionArray, scales: Vector3Array) -> Matrix44Array:
+        dat = cls.identity(len(translations)).dat
+        dat[:, :3, :3] = rotations.rotation_matrices() * np.stack(scales._arrays(), axis=-1)[:, None, :]
+        dat[:, :3, 3] = np.stack(translations._arrays(), axis=-1)
+        return cls._wrap(dat)
+
+    def __len__(self) -> int:
+        return len(self.dat)
+
+    def __getitem__(self, key) -> Union[Matrix44, Matrix44Array]:
+        if isinstance(key, (int, np.integer)):
+            return Matrix44._wrap(self.dat[key])
+        return Matrix44Array._wrap(self.dat[key])
+
+    def __setitem__(self, key, value: Union[Matrix44, Matrix44Array]) -> None:
+        self.dat[key] = value.dat
+
+    def __mul__(self, other):
+        if isinstance(other, (Matrix44Array, Matrix44)):
+            return Matrix44Array._wrap(np.matmul(self.dat, other.dat))
+        if isinstance(other, Vector3Array):
+            return self.transform_points(other)
+        return NotImplemented
+
+    def __rmul__(self, other):
+        if isinstance(other, Matrix44):
+            return Matrix44Array._wrap(np.matmul(other.dat, self.dat))
+        return NotImplemented
+
+    def inverse(self) -> Matrix44Array:
+        return Matrix44Array._wrap(np.linalg.inv(self.dat))
+
+    def transpose(self) -> Matrix44Array:
+        return Matrix44Array._wrap(self.dat.transpose(0, 2, 1).copy())
+
+    def transform_points(self, points: Vector3Array) -> Vector3Array:
+        '''Transforms the point of each matrix, dividing by w for projective matrices
+
+        As with Matrix44.transform_points, points where w is 0 come out as
+        inf or nan
+        '''
+        dat = self.dat
+        stacked = np.stack(points._arrays())
+        transformed = np.einsum("nij,jn->in", dat[:, :3, :3], stacked) + dat[:, :3, 3].T
+        w = np.einsum("nj,jn->n", dat[:, 3, :3], stacked) + dat[:, 3, 3]
+        if not np.all(w == 1.0):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                transformed /= w
+        return Vector3Array._make(transformed)
+
+
+def world_matrices(local: Matrix44Array, parents, out: Optional[Matrix44Array] = None) -> Matrix44Array:
+    '''Computes the world matrices of a scene graph from the local ones
+
+    parents holds the index of the parent of every node, -1 for roots.
+    Nodes are grouped by depth so each level of the hierarchy is a single
+    stacked product, whatever the order of the nodes.
+    '''
+    parents = np.asarray(parents, dtype=np.intp)
+    depth = np.zeros(len(parents), dtype=np.intp)
+    ancestors = parents.copy()
+    # Walk every node up to its root at once, one level per step
+    while True:
+        has_parent = ancestors >= 0
+        if not has_parent.any():
+            break
+        depth += has_parent
+        ancestors = np.where(has_parent, parents[ancestors], -1)
+        if depth.max(initial=0) > len(parents):
+            raise ValueError("The scene graph has a cycle")
+
+    world = out if out is not None else Matrix44Array._wrap(np.empty_like(local.dat))
+    roots = depth == 0
+    world.dat[roots] = local.dat[roots]
+    for level in range(1, int(depth.max(initial=0)) + 1):
+        nodes = np.flatnonzero(depth == level)
+        world.dat[nodes] = np.matmul(world.dat[parents[nodes]], local.dat[nodes])
+    return world
@@ -0,0 +1,572 @@
+import pickle
+
+import pytest
+
+from sutil.utils.ecs import *
+
+
+class Position():
+    def __init__(self, x=0, y=0) -> None:
+        self.x = x
+        self.y = y
+
+
+class Velocity():
+    def __init__(self, dx=0, dy=0) -> None:
+        self.dx = dx
+        self.dy = dy
+
+
+class Tag():
+    pass
+
+
+def make_entity(*components):
+    e = EntityObject()
+    for c in components:
+        e.attach(c)
+    return e
+
+
+def test_archetype_groups_entities():
+    engine = EntityEngine(ARCHETYPE_STORAGE)
+    for i in range(3):
+        engine.add_entity(make_entity(Position(i), Velocity()), False)
+    engine.add_entity(make_entity(Position()), False)
+
+    tables = engine.storage.fetch_tables(EntityFamily().all(Position))
+    assert sorted(len(t) for t in tables) == [1, 3]
+    assert len(list(engine.fetch(EntityFamily().all(Velocity)))) == 3
+
+
+def test_archetype_attach_remove_moves_entity():
+    engine = EntityEngine(ARCHETYPE_STORAGE)
+    a = make_entity(Position(1, 2))
+    b = make_entity(Position(3, 4))
+    engine.add_entity(a, False)
+    engine.add_entity(b, False)
+
+    a.attach(Velocity(5, 6))
+    assert a.contains(Velocity)
+    assert a.get(Velocity).dx == 5
+    assert a.get(Position).x == 1
+    # b was swapped into the freed row
+    assert b.get(Position).x == 3
+
+    assert a.remove(Velocity)
+    assert not a.remove(Velocity)
+    assert not a.contains(Velocity)
+    assert list(engine.fetch(EntityFamily().all(Velocity))) == []
+
+
+def test_remove_entity_gives_components_back():
+    engine = EntityEngine(ARCHETYPE_STORAGE)
+    e = make_entity(Position(7), Tag())
+    engine.add_entity(e, False)
+    engine.remove_entity(e, False)
+    assert e.get(Position).x == 7
+    assert e.component_types() == {Position, Tag}
+
+
+def test_fetch_is_live_and_reiterable():
+    for storage in (DICT_STORAGE, ARCHETYPE_STORAGE):
+        engine = EntityEngine(storage)
+        family = EntityFamily().all(Position, Velocity)
+        a = make_entity(Position(), Velocity())
+        engine.add_entity(a, False)
+        query = engine.fetch(family)
+        assert engine.fetch(EntityFamily().all(Velocity, Position)) is query
+        assert list(query) == [a]
+        assert list(query) == [a]
+
+        b = make_entity(Position())
+        engine.add_entity(b, False)
+        assert len(query) == 1
+        b.attach(Velocity())
+        assert set(query) == {a, b}
+        a.remove(Velocity)
+        assert list(query) == [b]
+        engine.remove_entity(b, False)
+        assert list(query) == []
+
+
+def test_family_signature_matching():
+    e = make_entity(Position(), Tag())
+    assert e.signature == component_registry.mask([Position, Tag])
+    assert EntityFamily().all(Position).matches(e)
+    assert not EntityFamily().all(Position).exclude(Tag).matches(e)
+    assert EntityFamily().elective(Velocity, Tag).matches(e)
+    assert not EntityFamily().all(Velocity).elective(Tag).matches(e)
+    e.remove(Tag)
+    assert e.signature == component_registry.bit(Position)
+
+
+class Body(RecordComponent):
+    fields = {"x": "f8", "dx": "f8"}
+
+
+class DriftSystem(VectorizedSystem):
+    def on_engine_change(self, engine):
+        self.entities = engine.fetch(EntityFamily().all(Body))
+
+    def update_columns(self, engine, columns):
+        body = columns[Body]
+        body.x = body.x + body.dx
+
+
+def test_record_components_live_in_columns():
+    engine = EntityEngine(ARCHETYPE_STORAGE)
+    engine.systems = [DriftSystem()]
+    entities = [make_entity(Body(i, dx=1)) for i in range(100)]
+    entities[0].attach(Tag())
+    for e in entities:
+        engine.add_entity(e, False)
+    engine.notify_entity_change()
+
+    engine.update()
+    engine.update()
+    assert [e.get(Body).x for e in entities] == [i + 2 for i in range(100)]
+
+    column = entities[1].get(Body)._column
+    assert len(column) == 99
+    assert column.arrays["x"].dtype.name == "float64"
+
+    entities[1].get(Body).dx = 5
+    engine.remove_entity(entities[1], False)
+    assert entities[1].get(Body).dx == 5
+    assert entities[99].get(Body).x == 101
+
+
+class ReadBody(EntitySystem):
+    reads = (Body,)
+
+
+class WriteBody(EntitySystem):
+    writes = (Body,)
+
+
+class WriteTag(EntitySystem):
+    writes = (Tag,)
+
+
+def test_schedule_phases():
+    engine = EntityEngine(workers=2)
+    systems = [ReadBody(), WriteTag(), WriteBody(), ReadBody(), EntitySystem(), WriteTag()]
+    engine.systems = systems
+    assert engine.schedule() == [systems[0:2], systems[2:3], [systems[3]], [systems[4]], [systems[5]]]
+
+
+class DeclaredDriftSystem(DriftSystem):
+    writes = (Body,)
+
+
+def test_parallel_update_matches_sequential():
+    engine = EntityEngine(ARCHETYPE_STORAGE, workers=4)
+    engine.systems = [DeclaredDriftSystem(), WriteTag()]
+    entities = [make_entity(Body(i, dx=2)) for i in range(10)]
+    for e in entities:
+        engine.add_entity(e, False)
+    engine.notify_entity_change()
+    assert len(engine.schedule()) == 1
+    engine.update()
+    engine.close()
+    assert [e.get(Body).x for e in entities] == [i + 2 for i in range(10)]
+
+
+class SquareSystem(ChunkedSystem):
+    chunk_size = 16
+
+    def on_engine_change(self, engine):
+        self.entities = engine.fetch(EntityFamily().all(Body))
+
+    @staticmethod
+    def process_chunk(columns):
+        body = columns[Body]
+        for i in range(len(body.x)):
+            body.x[i] = body.x[i] * body.x[i]
+
+
+def test_chunked_system_in_processes():
+    for processes in (0, 2):
+        engine = EntityEngine(ARCHETYPE_STORAGE, processes=processes)
+        engine.systems = [SquareSystem()]
+        # Enough entities to grow the shared columns a few times
+        entities = [make_entity(Body(i)) for i in range(300)]
+        entities[0].attach(Tag())
+        for e in entities:
+            engine.add_entity(e, False)
+        engine.notify_entity_change()
+        engine.update()
+        assert [e.get(Body).x for e in entities] == [i * i for i in range(300)]
+        engine.close()
+
+
+class SpawnerSystem(EntitySystem):
+    def __init__(self):
+        super().__init__()
+        self.changes = 0
+
+    def on_engine_change(self, engine):
+        self.changes += 1
+        self.entities = engine.fetch(EntityFamily().all(Position))
+
+    def update(self, engine):
+        for e in self.entities:
+            if e.get(Position).x < 0:
+                engine.commands.destroy(e)
+                engine.commands.destroy(e)
+            else:
+                engine.commands.attach(e, Tag())
+        engine.commands.spawn(Position(-1))
+
+
+def test_command_buffer_applies_at_sync_point():
+    engine = EntityEngine(ARCHETYPE_STORAGE)
+    system = SpawnerSystem()
+    engine.systems = [system]
+    kept = make_entity(Position(1))
+    engine.add_entity(kept)
+    assert system.changes == 1
+
+    engine.update()
+    assert len(engine.entities) == 2
+    assert system.changes == 2
+    assert kept.contains(Tag)
+
+    spawned = next(e for e in engine.entities if e is not kept)
+    assert engine.get_entity(spawned.id) is spawned
+    engine.update()
+    assert not engine.has_entity(spawned)
+    assert engine.get_entity(spawned.id) is None
+    assert engine.get_entity(kept.id) is kept
+    assert len(engine.entities) == 2
+
+
+def test_handles_detect_stale_entities():
+    handles = EntityHandles()
+    a = handles.allocate()
+    b = handles.allocate()
+    handles.release(a)
+    c = handles.allocate()
+    assert c & INDEX_MASK == a & INDEX_MASK
+    assert c != a
+    assert not handles.alive(a)
+    assert handles.alive(b) and handles.alive(c)
+    assert len(handles) == 2
+
+
+def test_sparse_storage():
+    engine = EntityEngine(SPARSE_STORAGE)
+    handles = [engine.spawn(Body(i, dx=1), Position(i)) for i in range(10)]
+    for h in handles[::2]:
+        engine.get_entity(h).remove(Position)
+    engine.despawn(handles[1])
+    assert engine.get_entity(handles[1]) is None
+    recycled = engine.spawn(Tag())
+    assert recycled & INDEX_MASK == handles[1] & INDEX_MASK
+    assert engine.get_entity(recycled).contains(Tag)
+
+    query = engine.fetch(EntityFamily().all(Body).exclude(Position))
+    assert sorted(e.get(Body).x for e in query) == [0, 2, 4, 6, 8]
+    assert sorted(e.get(Position).x for e in engine.fetch(EntityFamily().all(Position))) == [3, 5, 7, 9]
+    assert len(engine.entities) == 10
+
+    e = make_entity(Velocity(3))
+    engine.add_entity(e)
+    assert e.get(Velocity).dx == 3
+    engine.remove_entity(e)
+    assert e.get(Velocity).dx == 3
+    assert not engine.has_entity(e)
+
+
+def test_stale_facades_and_double_add():
+    engine = EntityEngine(SPARSE_STORAGE)
+    handle = engine.spawn(Position(1))
+    facade = engine.get_entity(handle)
+    engine.despawn(handle)
+    recycled = engine.spawn(Position(2))
+    assert recycled & INDEX_MASK == handle & INDEX_MASK
+    # The old facade doesn't reach the entity reusing its index
+    for access in (lambda: facade.get(Position), lambda: facade.contains(Position),
+                   lambda: facade.attach(Velocity()), lambda: facade.remove(Position)):
+        with pytest.raises(ValueError):
+            access()
+    assert engine.get_entity(recycled).get(Position).x == 2
+
+    for storage in (DICT_STORAGE, ARCHETYPE_STORAGE, SPARSE_STORAGE):
+        engine = EntityEngine(storage)
+        e = make_entity(Position())
+        engine.add_entity(e)
+        with pytest.raises(ValueError):
+            engine.add_entity(e)
+        assert len(engine.entities) == 1
+        engine.remove_entity(e)
+        engine.add_entity(e)
+        assert engine.has_entity(e)
+
+
+def test_snapshot_restore_and_deltas(tmp_path):
+    import mmap
+
+    for storage in (DICT_STORAGE, ARCHETYPE_STORAGE, SPARSE_STORAGE):
+        engine = EntityEngine(storage)
+        entities = [make_entity(Body(i, dx=1)) for i in range(50)]
+        entities[0].attach(Position(5))
+        for e in entities:
+            engine.add_entity(e, False)
+
+        full = engine.snapshot()
+        entities[3].get(Body).x = 100
+        delta = engine.snapshot(delta=True)
+        entities[3].get(Body).x = 200
+        entities[0].get(Position).x = 6
+        engine.remove_entity(entities[4])
+        late = make_entity(Tag())
+        engine.add_entity(late)
+        delta2 = engine.snapshot(delta=True)
+        assert len(delta) < len(full)
+
+        engine.restore(full)
+        assert entities[3].get(Body).x == 3
+        # Removed entities come back under their handle with a new object
+        assert engine.get_entity(entities[4].id).get(Body).x == 4
+        assert not engine.has_entity(late)
+        assert len(engine.entities) == 50
+
+        engine.restore(delta)
+        assert entities[3].get(Body).x == 100
+        engine.restore(delta2)
+        assert entities[3].get(Body).x == 200
+        assert entities[0].get(Position).x == 6
+        assert engine.get_entity(entities[4].id) is None
+        assert engine.get_entity(late.id).contains(Tag)
+        assert sorted(e.get(Body).x for e in engine.fetch(EntityFamily().all(Body).exclude(Position)))[-1] == 200
+
+        path = tmp_path / "world.snap"
+        path.write_bytes(full)
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            engine.restore(mapped)
+        assert entities[3].get(Body).x == 3
+        assert len(list(engine.fetch(EntityFamily().all(Tag)))) == 0
+
+
+def test_delta_needs_its_base_rows():
+    for storage in (DICT_STORAGE, ARCHETYPE_STORAGE, SPARSE_STORAGE):
+        engine = EntityEngine(storage)
+        entities = [make_entity(Body(i)) for i in range(3)]
+        for e in entities:
+            engine.add_entity(e, False)
+        full = engine.snapshot()
+        entities[1].get(Body).x = 10
+        delta = engine.snapshot(delta=True)
+
+        engine.restore(full)
+        # Same number of rows, other entities
+        engine.remove_entity(entities[0], False)
+        engine.add_entity(make_entity(Body(7)), False)
+        handles = bytes(engine.handles.generations)
+        with pytest.raises(ValueError):
+            engine.restore(delta)
+        # Nothing was restored
+        assert bytes(engine.handles.generations) == handles
+        assert entities[1].get(Body).x == 1
+
+        engine.restore(full)
+        engine.restore(delta)
+        assert entities[1].get(Body).x == 10
+
+
+def test_sparse_snapshot_keeps_spawned_handles():
+    engine = EntityEngine(SPARSE_STORAGE)
+    handles = [engine.spawn(Body(i), Position(i)) for i in range(10)]
+    engine.despawn(handles[2])
+    data = engine.snapshot()
+    engine.get_entity(handles[0]).remove(Position)
+    extra = engine.spawn(Tag())
+
+    engine.restore(data)
+    assert engine.get_entity(extra) is None
+    assert engine.get_entity(handles[2]) is None
+    assert engine.get_entity(handles[0]).get(Position).x == 0
+    assert sorted(e.get(Body).x for e in engine.fetch(EntityFamily().all(Body, Position))) == \
+        [i for i in range(10) if i != 2]
+    assert engine.spawn(Tag()) & INDEX_MASK in (handles[2] & INDEX_MASK, extra & INDEX_MASK)
+
+
+def test_profiler_records_systems(tmp_path):
+    import json
+
+    frames = []
+    engine = EntityEngine(ARCHETYPE_STORAGE)
+    engine.systems = [DriftSystem()]
+    engine.profiler = EngineProfiler(window=3, callback=frames.append)
+    for i in range(5):
+        engine.add_entity(make_entity(Body(i)))
+    for _ in range(4):
+        engine.update()
+
+    assert len(frames) == 4 and len(engine.profiler.frames) == 3
+    sample = frames[-1].systems[0]
+    assert sample.name == "DriftSystem" and sample.entities == 5
+    assert frames[0].rebuilds["DriftSystem"] > 0
+    assert engine.profiler.percentile(99, "DriftSystem") >= engine.profiler.percentile(50, "DriftSystem")
+    assert "DriftSystem" in engine.profiler.report()
+
+    path = tmp_path / "trace.json"
+    engine.profiler.export_chrome_trace(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+    assert sum(e["cat"] == "system" for e in events) == 3
+
+
+def test_percentile_and_histogram():
+    assert percentile(range(1, 101), 50) == 51
+    assert percentile(range(1, 101), 99) == 100
+    edges, counts = histogram([0, 1, 2, 3], bins=2)
+    assert edges == [0, 1.5, 3] and counts == [2, 2]
+
+
+class ReactiveSystem(EntitySystem):
+    def __init__(self):
+        super().__init__()
+        self.added = []
+        self.removed = []
+        self.changed = []
+
+    def on_engine_change(self, engine):
+        self.entities = engine.fetch(EntityFamily().all(Position))
+        self.changes = engine.fetch(EntityFamily().changed(Position))
+
+    def on_added(self, engine, entity):
+        self.added.append(entity.id)
+
+    def on_removed(self, engine, entity):
+        self.removed.append(entity.id)
+
+    def update(self, engine):
+        self.changed = sorted(e.id for e in self.changes)
+
+
+def test_change_detection():
+    for storage in (DICT_STORAGE, ARCHETYPE_STORAGE, SPARSE_STORAGE):
+        engine = EntityEngine(storage)
+        system = ReactiveSystem()
+        engine.systems = [system]
+        entities = [make_entity(Position(i)) for i in range(5)]
+        for e in entities:
+            engine.add_entity(e)
+        ids = [e.id for e in entities]
+
+        engine.update()
+        assert system.added == ids and system.changed == ids
+
+        system.added.clear()
+        engine.update()
+        assert system.added == [] and system.changed == []
+
+        engine.get_entity(ids[1]).get_mut(Position).x = 10
+        engine.get_entity(ids[2]).attach(Position(20))
+        engine.get_entity(ids[3]).remove(Position)
+        engine.remove_entity(engine.get_entity(ids[4]))
+        late = engine.spawn(Position(), Tag())
+        engine.update()
+        assert system.added == [late]
+        assert sorted(system.removed) == ids[3:]
+        assert system.changed == sorted([ids[1], ids[2], late])
+
+        engine.update()
+        assert system.changed == []
+        assert engine.storage.changes.moves == []
+
+        # Storages with tracking on still pickle
+        changes = pickle.loads(pickle.dumps(engine.storage)).changes
+        assert changes.enabled and changes.tick == engine.storage.changes.tick
+
+
+class CountingSystem(EntitySystem):
+    def __init__(self, tick_rate=None, slices=1):
+        super().__init__()
+        self.tick_rate = tick_rate
+        self.slices = slices
+        self.seen = []
+        self.deltas = []
+
+    def on_engine_change(self, engine):
+        self.entities = engine.fetch(EntityFamily().all(Position))
+
+    def update(self, engine):
+        self.seen.append(sorted(e.get(Position).x for e in self.sliced()))
+        self.deltas.append(round(self.delta_time, 6))
+
+
+def test_tick_rates_and_fixed_steps():
+    engine = EntityEngine(timestep=0.1)
+    every, slow = CountingSystem(), CountingSystem(tick_rate=4)
+    engine.systems = [every, slow]
+    engine.add_entity(make_entity(Position()))
+
+    assert engine.advance(0.25) == 2
+    assert abs(engine.alpha - 0.5) < 1e-9
+    assert engine.advance(0.8) == 5
+    assert engine.frame == 7 and engine.accumulator < engine.timestep
+    assert len(every.seen) == 7 and every.deltas[1:] == [0.1] * 6
+    # 4 Hz on 10 Hz steps runs at 0, 0.3, 0.5
+    assert len(slow.seen) == 3 and slow.deltas == [0.25, 0.3, 0.2]
+
+
+def test_time_sliced_systems():
+    for storage in (DICT_STORAGE, ARCHETYPE_STORAGE):
+        engine = EntityEngine(storage)
+        system = CountingSystem(slices=3)
+        engine.systems = [system]
+        for i in range(7):
+            engine.add_entity(make_entity(Position(i), Tag() if i % 2 else Velocity()))
+        for _ in range(3):
+            engine.update()
+        assert sorted(x for seen in system.seen for x in seen) == list(range(7))
+        assert [len(seen) for seen in system.seen] == [2, 2, 3]
+
+
+class SlicedDriftSystem(DriftSystem):
+    slices = 2
+
+
+def test_time_sliced_vectorized_system():
+    engine = EntityEngine(ARCHETYPE_STORAGE)
+    engine.systems = [SlicedDriftSystem()]
+    entities = [make_entity(Body(i, dx=1), Tag()) if i < 3 else make_entity(Body(i, dx=1)) for i in range(5)]
+    for e in entities:
+        engine.add_entity(e, False)
+    engine.notify_entity_change()
+    engine.update()
+    assert sum(e.get(Body).x for e in entities) == sum(range(5)) + 2
+    engine.update()
+    assert [e.get(Body).x for e in entities] == [i + 1 for i in range(5)]
+
+
+class SparseCountingSystem(EntitySystem):
+    def on_engine_change(self, engine):
+        self.entities = engine.fetch(EntityFamily().all(Position))
+
+    def update(self, engine):
+        return sum(1 for _ in self.entities)
+
+
+def test_profiler_counts_processed_entities():
+    engine = EntityEngine(ARCHETYPE_STORAGE)
+    engine.systems = [SlicedDriftSystem()]
+    engine.profiler = EngineProfiler()
+    for i in range(5):
+        engine.add_entity(make_entity(Body(i)))
+    engine.update()
+    engine.update()
+    assert [f.systems[0].entities for f in engine.profiler.frames] == [2, 3]
+
+    engine = EntityEngine(SPARSE_STORAGE)
+    engine.systems = [SparseCountingSystem(), CountingSystem()]
+    engine.profiler = EngineProfiler()
+    for i in range(4):
+        engine.spawn(Position(i))
+    engine.notify_entity_change()
+    engine.update()
+    # Sparse queries aren't walked by the profiler, only returned counts show
+    assert [s.entities for s in engine.profiler.frames[0].systems] == [4, -1]
@@ -0,0 +1,160 @@
+from collections import namedtuple
+from math import gamma, isclose, sin, sqrt
+
+import pytest
+
+from sutil.utils import expr_parser
+from sutil.utils.expr_parser import Expression, calculate_string, compile_expression
+
+OpBehaviour = namedtuple('OpBehaviour', 'priority lmbd')
+
+operations = {
+    "+": OpBehaviour(0, lambda x, y: y + x),
+    "-": OpBehaviour(0, lambda x, y: y - x),
+    "/": OpBehaviour(1, lambda x, y: y / x),
+    "*": OpBehaviour(1, lambda x, y: y * x),
+    "!": OpBehaviour(2, lambda x: gamma(1 + x)),
+    "^": OpBehaviour(2, lambda x, y: y ** x),
+    "sin": OpBehaviour(99, lambda x: sin(x)),
+    "sqrt": OpBehaviour(99, lambda x: sqrt(x)),
+    "clamp": OpBehaviour(99, lambda x, lo, hi: min(max(x, lo), hi)),
+}
+
+FORMULAS = ["1+25/5*3^10", "sin(1)! + 4! - sqrt(4)", "(2 + 3) * (7 - 1) / 4", "2 ^ 0.5 * 10"]
+
+
+def test_compiled_expressions_match_calculate_string():
+    for formula in FORMULAS:
+        assert isclose(compile_expression(formula, operations)(), calculate_string(formula, operations))
+
+
+def test_names_are_read_whole():
+    from sutil.utils.expr_parser import is_float, tokenize
+
+    assert tokenize("sint * 2", operations) == ["sint", "*", "2"]
+    assert tokenize("sqrt(x2)+sin(sine)", operations) == ["sqrt", "(", "x2", ")", "+", "sin", "(", "sine", ")"]
+    expression = compile_expression("sint * 2 + sin(0) - sine", operations)
+    assert expression.variables == ("sint", "sine")
+    assert expression(sint=3, sine=1) == 5
+    # nan and inf are names for calculate as they are for expressions
+    assert not is_float("nan") and not is_float("inf") and is_float("2.5")
+    assert compile_expression("nan + inf", operations).variables == ("nan", "inf")
+
+
+def test_zero_argument_operations():
+    import numpy as np
+
+    constants = dict(operations, pi=OpBehaviour(99, lambda: 3.14159))
+    assert isclose(calculate_string("2*pi", constants), 6.28318)
+    expression = Expression("2*pi + x", constants)
+    assert isclose(expression.evaluate({"x": 1}), 7.28318)
+    assert np.allclose(expression.evaluate_array({"x": np.array([0.0, 1.0])}), [6.28318, 7.28318])
+
+
+def test_variables():
+    expression = compile_expression("a * x ^ 2 + b * x - 3", operations)
+    assert expression.variables == ("a", "x", "b")
+    assert expression(2, 3, b=1) == 2 * 3 ** 2 + 3 - 3
+    assert expression(a=1, x=2, b=0) == 1
+    # Like calculate, the last argument written is the first one given to the operation
+    assert compile_expression("clamp(3, 1, x)", operations)(x=5) == 3
+    assert calculate_string("clamp(3, 1, 5)", operations) == 3
+
+
+def test_compile_cache():
+    expression = compile_expression("x + 1", operations)
+    assert compile_expression("x + 1", operations) is expression
+    assert compile_expression("x + 1", dict(operations)) is not expression
+    assert isinstance(expression, Expression) and expression.rpn == ["x", "1", "+"]
+
+    size = expr_parser.COMPILE_CACHE_SIZE
+    expr_parser.COMPILE_CACHE_SIZE = 2
+    try:
+        compile_expression("x + 2", operations)
+        compile_expression("x + 3", operations)
+        assert compile_expression("x + 1", operations) is not expression
+    finally:
+        expr_parser.COMPILE_CACHE_SIZE = size
+
+
+def test_array_evaluation():
+    import numpy as np
+
+    Vectorized = namedtuple('Vectorized', 'priority lmbd vectorized', defaults=(None,))
+    table = dict(operations, sinv=Vectorized(99, lambda x: sin(x), np.sin))
+    x = np.linspace(0, 3, 50)
+    y = np.linspace(-1, 1, 50)
+    for formula in ("a * x ^ 2 + sin(y) - 3", "sinv(x) * sqrt(x) + x! - y"):
+        expression = compile_expression(formula, table)
+        values = expression(a=2.0, x=x, y=y)
+        assert values.shape == (50,)
+        assert np.allclose(values, [expression(a=2.0, x=float(i), y=float(j)) for i, j in zip(x, y)])
+    # Scalars and arrays broadcast together
+    assert compile_expression("x * 2", table).evaluate_array({"x": 1.5}).shape == ()
+    assert compile_expression("x * y", table)(x=x[:, None], y=y).shape == (50, 50)
+
+
+def test_generated_functions():
+    from sutil.utils.expr_parser import to_function, tokenize, to_rpn
+
+    calls = []
+    counted = dict(operations, f=OpBehaviour(99, lambda x: calls.append(x) or x + 1))
+    function = compile_expression("f(x) * f(x) + f(2) * y", counted).function
+    # f(2) runs once when folding
+    assert calls == [2]
+    assert function(3, 4) == 4 * 4 + 3 * 4
+    # f(x) runs once per call
+    assert calls == [2, 3]
+
+    for formula in FORMULAS + ["a * x ^ 2 + sin(y) - 3", "clamp(3, 1, x) * (x + 1) / (x + 1)"]:
+        expression = compile_expression(formula, operations)
+        values = dict(a=1.5, x=0.75, y=2.0)
+        assert expression(**values) == expression.evaluate(values)
+    function = to_function(to_rpn(tokenize("sqrt(2) * b", operations), operations), operations)
+    assert function(b=2) == sqrt(2) * 2
+
+
+
+
+def test_calls_without_arguments():
+    counter = iter(range(100))
+    impure = dict(operations, pi=OpBehaviour(99, lambda: 3.0), rnd=OpBehaviour(99, lambda: next(counter)))
+    assert compile_expression("2*pi", impure)() == 6.0
+
+    # Each rnd runs on every call, neither folded nor merged
+    expression = compile_expression("rnd + rnd", impure)
+    assert next(counter) == 0
+    assert expression() == 1 + 2
+    assert expression() == 3 + 4
+
+def test_call_dispatch():
+    calls = []
+    counted = dict(operations, f=OpBehaviour(99, lambda x: calls.append(x) or x + 1))
+    expression = compile_expression("f(x) + y", counted)
+    # Extra names are ignored and side effects happen once
+    assert expression(2, y=3, unused=5) == 6
+    assert calls == [2]
+
+    def fail(x):
+        calls.append(x)
+        raise TypeError("bad value")
+
+    failing = compile_expression("g(x)", dict(operations, g=OpBehaviour(99, fail)))
+    with pytest.raises(TypeError, match="bad value"):
+        failing(7)
+    assert calls == [2, 7]
+
+    with pytest.raises(TypeError):
+        expression(1)
+    with pytest.raises(TypeError):
+        expression(1, 2, 3)
+    with pytest.raises(TypeError):
+        expression(1, 2, x=3)
+
+def test_long_formulas():
+    for terms in (1000, 3000):
+        assert compile_expression("+".join(["x"] * terms), operations)(x=1.0) == terms
+        formula = "+".join(f"sin(x) * {i}" for i in range(terms))
+        expression = compile_expression(formula, operations)
+        assert isclose(expression(x=0.5), expression.evaluate({"x": 0.5}))
+        assert isclose(expression(x=0.5), sin(0.5) * terms * (terms - 1) / 2)
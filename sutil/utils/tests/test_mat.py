@@ -0,0 +1,91 @@
+from math import radians
+
+import numpy as np
+import pytest
+
+from sutil.math.vector import Quaternion, QuaternionArray, Vector3, Vector3Array
+from sutil.utils.mat import Matrix33, Matrix44, Matrix44Array, world_matrices
+
+
+def approx_vector(a, b, tolerance=1e-9):
+    return all(abs(getattr(a, f) - getattr(b, f)) < tolerance for f in ("x", "y", "z"))
+
+
+def test_trs_and_inverse():
+    rotation = Quaternion(0.1, 0.2, 0.3, 0.9).normalized()
+    model = Matrix44.from_trs(Vector3(1, 2, 3), rotation, Vector3(2, 3, 4))
+    assert model.almost_equal(Matrix44.from_translation(Vector3(1, 2, 3)) * Matrix44.from_rotation(rotation)
+                              * Matrix44.from_scale(Vector3(2, 3, 4)))
+
+    point = Vector3(0.5, -1, 2)
+    expected = rotation * Vector3(1, -3, 8) + Vector3(1, 2, 3)
+    assert approx_vector(model * point, expected)
+    assert approx_vector(model.inverse() * expected, point)
+    assert (model * model.inverse()).almost_equal(Matrix44())
+    assert approx_vector(Matrix33.from_quaternion(rotation) * point, rotation * point)
+    assert abs(model.determinant - 24) < 1e-9
+
+
+def test_projections():
+    view = Matrix44.look_at(Vector3(0, 0, 5), Vector3(), Vector3(0, 1, 0))
+    assert approx_vector(view * Vector3(), Vector3(0, 0, -5))
+
+    projection = Matrix44.perspective(radians(90), 1, 1, 10)
+    assert approx_vector(projection * Vector3(0, 0, -1), Vector3(0, 0, -1))
+    assert approx_vector(projection * Vector3(10, 10, -10), Vector3(1, 1, 1))
+
+    ortho = Matrix44.orthographic(0, 800, 0, 600, 0, 1)
+    assert approx_vector(ortho * Vector3(800, 600, -1), Vector3(1, 1, 1))
+
+    rng = np.random.default_rng(0)
+    points = Vector3Array(*rng.normal(size=(3, 20)))
+    clip = projection * view
+    for transformed, point in zip(clip.transform_points(points), points):
+        assert approx_vector(transformed, clip * point)
+
+    # The eye plane of a perspective projection maps to infinity
+    eye_plane = Vector3(1, 0, 0)
+    with pytest.raises(ZeroDivisionError):
+        projection * eye_plane
+    with np.errstate(all="raise"):
+        transformed = projection.transform_points(Vector3Array([1.0, 0.0], [0.0, 0.0], [0.0, -1.0]))
+        stacked = Matrix44Array(np.stack([projection.dat] * 2)).transform_points(
+            Vector3Array([1.0, 0.0], [0.0, 0.0], [0.0, -1.0]))
+    for result in (transformed, stacked):
+        assert np.isinf(result.x[0]) and approx_vector(result[1], Vector3(0, 0, -1))
+
+
+def test_matrix_arrays_match_scalars():
+    rng = np.random.default_rng(0)
+    n = 20
+    translations = Vector3Array(*rng.normal(size=(3, n)))
+    rotations = QuaternionArray(*rng.normal(size=(4, n))).normalized()
+    scales = Vector3Array(*rng.uniform(0.5, 2, size=(3, n)))
+    matrices = Matrix44Array.from_trs(translations, rotations, scales)
+    points = Vector3Array(*rng.normal(size=(3, n)))
+
+    products = matrices * matrices.inverse()
+    transformed = matrices * points
+    for i in range(n):
+        matrix = Matrix44.from_trs(translations[i], rotations[i], scales[i])
+        assert matrices[i].almost_equal(matrix)
+        assert products[i].almost_equal(Matrix44())
+        assert approx_vector(transformed[i], matrix * points[i])
+
+
+def test_world_matrices():
+    rng = np.random.default_rng(0)
+    # Children listed before their parents on purpose
+    parents = [2, 0, -1, 1, -1, 2]
+    local = Matrix44Array.from_trs(Vector3Array(*rng.normal(size=(3, 6))),
+                                   QuaternionArray(*rng.normal(size=(4, 6))).normalized(),
+                                   Vector3Array(*rng.uniform(0.5, 2, size=(3, 6))))
+    world = world_matrices(local, parents)
+
+    def expected(node):
+        if parents[node] < 0:
+            return local[node]
+        return expected(parents[node]) * local[node]
+
+    for node in range(6):
+        assert world[node].almost_equal(expected(node))
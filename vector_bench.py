@@ -0,0 +1,254 @@
+from functools import singledispatchmethod
+from math import sqrt
+from typing import SupportsFloat
+import time
+import timeit
+
+import numpy as np
+
+from sutil.math.interpolate import QuaternionTrack, TrackSet
+from sutil.math.vector import *
+from sutil.utils.mat import Matrix44, Matrix44Array, world_matrices
+
+
+class LegacyVector2:
+    '''Vector2 as it was before slots, with properties and singledispatch operators'''
+
+    def __init__(self, x: SupportsFloat = 0, y: SupportsFloat = 0) -> None:
+        self._x = x
+        self._y = y
+
+    @property
+    def x(self):
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        self._x = value
+
+    @property
+    def y(self):
+        return self._y
+
+    @y.setter
+    def y(self, value) -> float:
+        self._y = value
+
+    @property
+    def sqr_magnitude(self) -> float:
+        return pow(self.x, 2) + pow(self.y, 2)
+
+    @property
+    def magnitude(self) -> float:
+        return sqrt(self.sqr_magnitude)
+
+    def lerp(self, other, t: SupportsFloat):
+        return LegacyVector2(
+            x=self.x + (other.x - self.x) * t,
+            y=self.y + (other.y - self.y) * t
+        )
+
+    def dot(self, other) -> float:
+        return self.x * other.x + self.y * other.y
+
+    def __add__(self, other):
+        return LegacyVector2(self.x + other.x, self.y + other.y)
+
+    @singledispatchmethod
+    def __mul__(self, other):
+        return NotImplemented
+
+
+@LegacyVector2.__mul__.register
+def _(self, other: LegacyVector2):
+    return LegacyVector2(self.x * other.x, self.y * other.y)
+
+
+@LegacyVector2.__mul__.register
+def _(self, other: SupportsFloat):
+    return LegacyVector2(self.x * other, self.y * other)
+
+
+class LegacyVector3:
+    def __init__(self, x=0, y=0, z=0) -> None:
+        self._x = x
+        self._y = y
+        self._z = z
+
+    x = property(lambda self: self._x)
+    y = property(lambda self: self._y)
+    z = property(lambda self: self._z)
+
+
+class LegacyQuaternion:
+    def __init__(self, x=0, y=0, z=0, w=1) -> None:
+        self._x = x
+        self._y = y
+        self._z = z
+        self._w = w
+
+    x = property(lambda self: self._x)
+    y = property(lambda self: self._y)
+    z = property(lambda self: self._z)
+    w = property(lambda self: self._w)
+
+    @singledispatchmethod
+    def __mul__(self, other):
+        return NotImplemented
+
+
+@LegacyQuaternion.__mul__.register
+def _(self, other: LegacyQuaternion):
+    x = self.w * other.x + self.x * other.w + self.y * other.z - self.z * other.y
+    y = self.w * other.y + self.y * other.w + self.z * other.x - self.x * other.z
+    z = self.w * other.z + self.z * other.w + self.x * other.y - self.y * other.x
+    w = self.w * other.w - self.x * other.x - self.y * other.y - self.z * other.z
+    return LegacyQuaternion(x, y, z, w)
+
+
+@LegacyQuaternion.__mul__.register
+def _(self, point: LegacyVector3):
+    x = self.x * 2.0
+    y = self.y * 2.0
+    z = self.z * 2.0
+    xx = self.x * x
+    yy = self.y * y
+    zz = self.z * z
+    xy = self.x * y
+    xz = self.x * z
+    yz = self.y * z
+    wx = self.w * x
+    wy = self.w * y
+    wz = self.w * z
+
+    px = (1.0 - (yy + zz)) * point.x + \
+        (xy - wz) * point.y + (xz + wy) * point.z
+    py = (xy + wz) * point.x + (1.0 - (xx + zz)) * \
+        point.y + (yz - wx) * point.z
+    pz = (xz - wy) * point.x + (yz + wx) * \
+        point.y + (1.0 - (xx + yy)) * point.z
+    return LegacyVector3(px, py, pz)
+
+
+def per_op(statement, namespace, number=200_000, repeat=5):
+    '''Best time of one execution of the statement in nanoseconds'''
+    times = timeit.repeat(statement, globals=namespace, number=number, repeat=repeat)
+    return min(times) / number * 1e9
+
+
+# Operation name -> statement timed against both implementations
+OPERATIONS = {
+    "construct": "V(1.0, 2.0)",
+    "read x": "a.x",
+    "a + b": "a + b",
+    "a * 2.0": "a * 2.0",
+    "a * b": "a * b",
+    "a += b": "c = a; c += b",
+    "magnitude": "a.magnitude",
+    "dot": "a.dot(b)",
+    "lerp": "a.lerp(b, 0.5)",
+    "q * q": "q * q",
+    "q * point": "q * p",
+}
+
+
+def bench_scalar_ops():
+    legacy = {"V": LegacyVector2, "a": LegacyVector2(1.0, 2.0), "b": LegacyVector2(3.0, 4.0),
+              "q": LegacyQuaternion(0.1, 0.2, 0.3, 0.9), "p": LegacyVector3(1.0, 2.0, 3.0)}
+    slotted = {"V": Vector2, "a": Vector2(1.0, 2.0), "b": Vector2(3.0, 4.0),
+               "q": Quaternion(0.1, 0.2, 0.3, 0.9), "p": Vector3(1.0, 2.0, 3.0)}
+
+    print(f"{'operation':<12}{'before ns':>12}{'after ns':>12}{'speedup':>10}")
+    for name, statement in OPERATIONS.items():
+        before = per_op(statement, legacy)
+        after = per_op(statement, slotted)
+        print(f"{name:<12}{before:>12.1f}{after:>12.1f}{before / after:>9.1f}x")
+
+    # Operations that didn't work before
+    for name, statement in {"a / 2.0": "a / 2.0", "2.0 * a": "2.0 * a", "normalized": "a.normalized()"}.items():
+        print(f"{name:<12}{'-':>12}{per_op(statement, slotted):>12.1f}")
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_batched_rotation(n=500_000):
+    rng = np.random.default_rng(0)
+    rotation = Quaternion(0.1, 0.2, 0.3, 0.9).normalized()
+    points = Vector3Array(*rng.normal(size=(3, n)))
+    scalar_points = list(points)
+    rotations = QuaternionArray(*rng.normal(size=(4, n))).normalized()
+    scalar_rotations = list(rotations)
+
+    print(f"Rotating {n} points")
+    loop = timed(lambda: [rotation * p for p in scalar_points], 1)
+    batch = timed(lambda: rotation * points)
+    print(f"  one quaternion   : loop {loop * 1000:8.1f} ms  batch {batch * 1000:6.2f} ms  {loop / batch:6.0f}x")
+    loop = timed(lambda: [q * p for q, p in zip(scalar_rotations, scalar_points)], 1)
+    batch = timed(lambda: rotations * points)
+    print(f"  n quaternions    : loop {loop * 1000:8.1f} ms  batch {batch * 1000:6.2f} ms  {loop / batch:6.0f}x")
+    loop = timed(lambda: [q * rotation for q in scalar_rotations], 1)
+    batch = timed(lambda: rotations * rotation)
+    print(f"  compose          : loop {loop * 1000:8.1f} ms  batch {batch * 1000:6.2f} ms  {loop / batch:6.0f}x")
+    loop = timed(lambda: [q.to_euler_angles() for q in scalar_rotations], 1)
+    batch = timed(rotations.to_euler_angles)
+    print(f"  to_euler_angles  : loop {loop * 1000:8.1f} ms  batch {batch * 1000:6.2f} ms  {loop / batch:6.0f}x")
+
+
+def bench_animation_sampling(bones=2000, keys=30, frames=60):
+    rng = np.random.default_rng(0)
+    tracks = []
+    for _ in range(bones):
+        rotations = rng.normal(size=(keys, 4))
+        tracks.append(QuaternionTrack(np.linspace(0, 2, keys), rotations / np.linalg.norm(rotations, axis=1)[:, None]))
+    skeleton = TrackSet(tracks)
+    times = [i / 60 for i in range(frames)]
+
+    def per_track():
+        for time in times:
+            for track in tracks:
+                track.sample(time)
+
+    def batched():
+        for time in times:
+            skeleton.sample(time)
+
+    loop = timed(per_track, 1)
+    batch = timed(batched)
+    print(f"Sampling {bones} bones with {keys} keys over {frames} frames")
+    print(f"  per track : {loop * 1000 / frames:8.2f} ms/frame")
+    print(f"  track set : {batch * 1000 / frames:8.2f} ms/frame  {loop / batch:.0f}x")
+
+
+def bench_scene_graph(nodes=5000, branching=4):
+    rng = np.random.default_rng(0)
+    parents = np.array([-1] + [(i - 1) // branching for i in range(1, nodes)])
+    local = Matrix44Array.from_trs(Vector3Array(*rng.normal(size=(3, nodes))),
+                                   QuaternionArray(*rng.normal(size=(4, nodes))).normalized(),
+                                   Vector3Array(*rng.uniform(0.5, 2, size=(3, nodes))))
+    scalar_local = [local[i] for i in range(nodes)]
+
+    def per_node():
+        world = []
+        for matrix, parent in zip(scalar_local, parents):
+            world.append(matrix if parent < 0 else world[parent] * matrix)
+        return world
+
+    loop = timed(per_node, 1)
+    batch = timed(lambda: world_matrices(local, parents))
+    print(f"World matrices of {nodes} nodes")
+    print(f"  per node : {loop * 1000:8.2f} ms")
+    print(f"  stacked  : {batch * 1000:8.2f} ms  {loop / batch:.0f}x")
+
+
+if __name__ == "__main__":
+    bench_scalar_ops()
+    bench_batched_rotation()
+    bench_animation_sampling()
+    bench_scene_graph()